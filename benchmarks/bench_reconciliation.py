@@ -0,0 +1,210 @@
+"""End-to-end reconciliation benchmark on a synthetic ledger.
+
+    python benchmarks/bench_reconciliation.py --receipts 10000
+    python benchmarks/bench_reconciliation.py --receipts 100000 --engines table --no-memory
+    python benchmarks/bench_reconciliation.py --receipts 5000 --engines semantic,cascade --json results.json
+
+Generates receipts and bank statements with known ground truth (see
+``synthetic_ledger``), runs each engine end to end and reports wall time,
+receipts per second, peak traced memory, precision and recall. Semantic
+engines talk to a local stub embedding server, so no API key is needed.
+
+Engines:
+    rules     AdvancedReconciliationEngine, exact and fuzzy tiers, on dicts
+    table     the same tiers through reconcile_tables on columnar tables
+    parallel  ParallelReconciliationEngine, exact and fuzzy tiers
+    semantic  IntelligentReconciliation.find_matches, best neighbour per receipt
+    cascade   AdvancedReconciliationEngine with exact, fuzzy and semantic tiers
+    split     SplitPaymentMatcher on what the table engine leaves unmatched,
+              as incremental runs do, scored against the planted split groups
+
+The stub server's hashed n-gram vectors put true pairs around 0.5 cosine,
+well below the engine's semantic threshold, so semantic precision and recall
+describe the stub rather than the production model; lower
+--semantic-threshold to exercise the matching itself.
+
+Peak memory comes from a second, tracemalloc-traced run (skip it with
+--no-memory). It covers the main process only, so pool workers of the
+parallel engine are not included.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import AppSettings
+from models.transaction_table import InternTable, TransactionTable
+from services.reconciliation import AdvancedReconciliationEngine
+from services.parallel_reconciliation import ParallelReconciliationEngine
+from services.split_matching import SplitPaymentMatcher
+from services.vendor_registry import VendorRegistry
+from benchmarks.synthetic_ledger import generate_ledger, score_pairs, score_splits
+from benchmarks.embedding_stub import EmbeddingStubServer
+
+ENGINES = ('rules', 'table', 'parallel', 'semantic', 'cascade', 'split')
+SEMANTIC_ENGINES = ('semantic', 'cascade')
+
+
+def _matched_ids(matches: List[Dict]) -> List[Tuple[str, str]]:
+    return [(m['receipt']['transaction_id'], m['bank_transaction']['transaction_id']) for m in matches]
+
+
+def _engine_runner(name: str, args, registry: VendorRegistry) -> Callable[[List[Dict], List[Dict]], Dict]:
+    """A callable taking (receipts, bank) and returning {'pairs': ...} or {'groups': ...}."""
+    if name == 'rules':
+        def run(receipts, bank):
+            engine = AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), strategy=args.strategy, vendor_registry=registry)
+            return {'pairs': _matched_ids(engine.reconcile_transactions(receipts, bank)['matches'])}
+    elif name == 'table':
+        def run(receipts, bank):
+            engine = AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), strategy=args.strategy, vendor_registry=registry)
+            tokens = InternTable()
+            ledger = TransactionTable.from_documents('receipt', receipts, tokens)
+            statement = TransactionTable.from_documents('bank', bank, tokens)
+            result = engine.reconcile_tables(ledger, statement)
+            return {'pairs': [(ledger.transaction_id(r), statement.transaction_id(b)) for r, b, _, _ in result['matches']]}
+    elif name == 'parallel':
+        def run(receipts, bank):
+            engine = ParallelReconciliationEngine(max_workers=args.workers, min_parallel_pairs=0, tiers=('exact', 'fuzzy'),
+                                                  strategy=args.strategy, vendor_registry=registry)
+            return {'pairs': _matched_ids(engine.reconcile_transactions(receipts, bank)['matches'])}
+    elif name == 'semantic':
+        def run(receipts, bank):
+            from services.intelligent_reconciliation import IntelligentReconciliation
+            matcher = IntelligentReconciliation(index_type=AppSettings.VECTOR_INDEX_TYPE, index_path='', embedding_backend='remote')
+            threshold = args.semantic_threshold or AdvancedReconciliationEngine(vendor_registry=registry).semantic_threshold
+            pairs, seen = [], set()
+            for m in matcher.find_matches(receipts, bank, top_k=1, threshold=threshold):
+                if m['receipt']['transaction_id'] not in seen:
+                    seen.add(m['receipt']['transaction_id'])
+                    pairs.append((m['receipt']['transaction_id'], m['bank_transaction']['transaction_id']))
+            return {'pairs': pairs}
+    elif name == 'cascade':
+        def run(receipts, bank):
+            engine = AdvancedReconciliationEngine(tiers=AdvancedReconciliationEngine.TIERS, strategy=args.strategy, vendor_registry=registry)
+            if args.semantic_threshold:
+                engine.semantic_threshold = args.semantic_threshold
+            return {'pairs': _matched_ids(engine.reconcile_transactions(receipts, bank)['matches'])}
+    elif name == 'split':
+        def run(receipts, bank):
+            engine = AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), strategy=args.strategy, vendor_registry=registry)
+            tokens = InternTable()
+            ledger = TransactionTable.from_documents('receipt', receipts, tokens)
+            statement = TransactionTable.from_documents('bank', bank, tokens)
+            result = engine.reconcile_tables(ledger, statement)
+            groups = SplitPaymentMatcher(max_group_size=AppSettings.SPLIT_MATCH_MAX_GROUP_SIZE,
+                                         time_limit_seconds=args.split_time_limit).match(
+                [receipts[r] for r in result['unmatched_ledger']], [bank[b] for b in result['unmatched_bank']]
+            )
+            return {'groups': [([r['transaction_id'] for r in g['receipts']], [b['transaction_id'] for b in g['bank_transactions']])
+                               for g in groups]}
+    else:
+        raise ValueError(f"Unknown engine '{name}', expected one of {ENGINES}")
+    return run
+
+
+def measure(name: str, run: Callable, receipts: List[Dict], bank: List[Dict], truth: Dict, trace_memory: bool) -> Dict:
+    # Database helpers print when there is no MongoDB connection (stored
+    # embeddings, vendor aliases); the benchmark runs without one on purpose.
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = run(receipts, bank)
+        elapsed = time.perf_counter() - started
+
+        peak_mb = None
+        if trace_memory:
+            tracemalloc.start()
+            run(receipts, bank)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+
+    scores = score_splits(result['groups'], truth) if 'groups' in result else score_pairs(result['pairs'], truth)
+    return dict(
+        scores,
+        engine=name,
+        seconds=elapsed,
+        receipts_per_second=len(receipts) / elapsed if elapsed else float('inf'),
+        peak_mb=peak_mb,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--receipts', type=int, default=10000, help='receipts to generate (1k to 1M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engines', default='rules,table,split', help=f"comma-separated subset of {','.join(ENGINES)}")
+    parser.add_argument('--strategy', choices=AdvancedReconciliationEngine.STRATEGIES, default='greedy')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='pool size for the parallel engine')
+    parser.add_argument('--duplicate-rate', type=float, default=0.02)
+    parser.add_argument('--split-rate', type=float, default=0.03)
+    parser.add_argument('--tip-rate', type=float, default=0.6)
+    parser.add_argument('--bank-only-rate', type=float, default=0.15)
+    parser.add_argument('--split-time-limit', type=float, default=60.0)
+    parser.add_argument('--semantic-threshold', type=float, help='override the engine\'s semantic threshold')
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0, help='added delay per embedding request')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run used for peak memory')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown:
+        parser.error(f"unknown engines {unknown}, expected a subset of {ENGINES}")
+
+    logging.basicConfig(level=logging.WARNING)
+    started = time.perf_counter()
+    receipts, bank, truth = generate_ledger(
+        args.receipts, seed=args.seed, duplicate_rate=args.duplicate_rate, split_rate=args.split_rate,
+        tip_rate=args.tip_rate, bank_only_rate=args.bank_only_rate
+    )
+    print(f"{len(receipts)} receipts x {len(bank)} bank transactions "
+          f"({len(set(truth['pairs'].values()))} one-to-one, {len(truth['splits'])} split) "
+          f"generated in {time.perf_counter() - started:.1f}s")
+
+    # Seed vendors only: the benchmark must not depend on aliases learned in a database.
+    registry = VendorRegistry()
+    # Every semantic run starts cold: no on-disk embedding cache, no stored vectors.
+    AppSettings.ENABLE_EMBEDDING_CACHE = False
+    AppSettings.STORE_EMBEDDINGS_ON_INGEST = False
+
+    stub = None
+    if any(e in SEMANTIC_ENGINES for e in engines):
+        stub = EmbeddingStubServer(dim=AppSettings.EMBEDDING_DIM, latency_ms=args.stub_latency_ms)
+        os.environ['EMBEDDING_API_URL'] = stub.start()
+        os.environ.setdefault('MODELS_API_KEY', 'benchmark')
+
+    rows = []
+    try:
+        print(f"{'engine':<10}{'seconds':>10}{'rcpt/s':>11}{'peak MB':>10}{'matches':>9}{'precision':>11}{'recall':>9}")
+        for name in engines:
+            row = measure(name, _engine_runner(name, args, registry), receipts, bank, truth, not args.no_memory)
+            rows.append(row)
+            peak = f"{row['peak_mb']:.1f}" if row['peak_mb'] is not None else '-'
+            print(f"{name:<10}{row['seconds']:>10.2f}{row['receipts_per_second']:>11.0f}{peak:>10}{row['matches']:>9}"
+                  f"{row['precision']:>11.3f}{row['recall']:>9.3f}")
+    finally:
+        if stub is not None:
+            stub.stop()
+            print(f"stub embedding server: {stub.requests} requests, {stub.texts} texts")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'receipts': len(receipts),
+                'bank_transactions': len(bank),
+                'seed': args.seed,
+                'strategy': args.strategy,
+                'results': rows,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
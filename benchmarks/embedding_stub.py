@@ -0,0 +1,82 @@
+"""Local stand-in for the embedding API, for benchmarks without network access.
+
+Serves ``POST /embeddings`` in the format ``ReconciliationEmbeddings`` expects,
+with ``HashedNgramEmbedding`` vectors of the configured dimension, so
+similar descriptions still land near each other.
+
+    with EmbeddingStubServer(dim=AppSettings.EMBEDDING_DIM) as url:
+        os.environ['EMBEDDING_API_URL'] = url
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+import numpy as np
+from models.local_embedding import HashedNgramEmbedding
+
+
+class EmbeddingStubServer:
+    def __init__(self, dim: int, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.model = HashedNgramEmbedding(dim=dim)
+        self.requests = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip('/') != '/embeddings':
+                    self.send_error(404)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                texts = payload.get('input') or []
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                vectors = np.round(stub.model.embed_array(texts), 6)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.texts += len(texts)
+                body = json.dumps({
+                    'data': [{'index': i, 'embedding': vector} for i, vector in enumerate(vectors.tolist())],
+                    'model': payload.get('model'),
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._server.serve_forever, name='embedding-stub', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
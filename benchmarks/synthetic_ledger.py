@@ -0,0 +1,172 @@
+"""Synthetic receipts and bank statements with known ground truth.
+
+Receipts carry a merchant name the way extraction produces it (case, suffix
+and typo noise); their bank lines carry the processor's descriptor, a posting
+lag of a few days, tips on restaurant and ride bills, and the odd currency
+drift. Some receipts are uploaded twice, some bank lines pay several receipts
+at once, and both sides get unrelated rows.
+"""
+import random
+import string
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+# receipt name, category, bank descriptor templates, whether a tip is usual
+MERCHANTS = [
+    ('AMAZON', 'retail', ['AMAZON.COM*{code}', 'AMZN MKTP US*{code}', 'AMAZON MKTPLACE PMTS'], False),
+    ('WALMART', 'groceries', ['WALMART SUPERCENTER #{store}', 'WAL-MART #{store}', 'WM SUPERCENTER #{store}'], False),
+    ('SHELL', 'fuel', ['SHELL OIL {store}', 'SHELL SERVICE STATION #{store}'], False),
+    ('CVS PHARMACY', 'pharmacy', ['CVS/PHARMACY #{store}'], False),
+    ('TARGET', 'retail', ['TARGET T-{store}', 'TARGET {store}'], False),
+    ("MCDONALD'S", 'dining', ['MCDONALDS #{store}', "MCDONALD'S F{store}"], False),
+    ('STARBUCKS', 'dining', ['STARBUCKS STORE {store}', 'SBUX {store}'], False),
+    ('OLIVE GARDEN', 'dining', ['OLIVE GARDEN {store}', 'OLIVEGARDEN#{store}'], True),
+    ('UBER', 'travel', ['UBER *TRIP {code}', 'UBER TRIP HELP.UBER.COM'], True),
+    ('HOME DEPOT', 'home', ['THE HOME DEPOT #{store}', 'HOMEDEPOT.COM'], False),
+    ('COSTCO', 'groceries', ['COSTCO WHSE #{store}'], False),
+    ('WHOLE FOODS', 'groceries', ['WHOLEFDS MKT {store}', 'WHOLE FOODS MARKET #{store}'], False),
+    ('CHIPOTLE', 'dining', ['CHIPOTLE {store}', 'CHIPOTLE ONLINE'], True),
+    ('BEST BUY', 'electronics', ['BEST BUY {store}', 'BESTBUY.COM {code}'], False),
+    ('DELTA AIR LINES', 'travel', ['DELTA AIR {code}'], False),
+    ('OFFICE DEPOT', 'office', ['OFFICE DEPOT #{store}', 'ODP {store}'], False),
+]
+
+BANK_ONLY_DESCRIPTIONS = [
+    'PAYROLL DEPOSIT ACME CORP', 'MONTHLY SERVICE FEE', 'ATM WITHDRAWAL {store}', 'ONLINE TRANSFER TO SAV {code}',
+    'NETFLIX.COM', 'SPOTIFY USA', 'COMCAST CABLE {code}', 'CITY WATER UTIL {code}',
+]
+RECEIPT_ONLY_VENDORS = ['JOE\'S DINER', 'FARMERS MARKET', 'PARKING METER', 'CORNER BAKERY CAFE', 'LOCAL HARDWARE']
+
+
+def _vendor_noise(rng: random.Random, name: str) -> str:
+    """A receipt vendor as extraction might return it."""
+    roll = rng.random()
+    if roll < 0.35:
+        name = name.title()
+    elif roll < 0.45:
+        name = f"{name} {rng.choice(['INC', 'STORE', 'LLC', '#' + str(rng.randint(10, 999))])}"
+    if rng.random() < 0.08 and len(name) > 4:
+        i = rng.randrange(1, len(name) - 1)
+        name = name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name
+
+
+def _descriptor(rng: random.Random, template: str) -> str:
+    return template.format(
+        store=rng.randint(100, 9999),
+        code=''.join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(6))
+    )
+
+
+def generate_ledger(n_receipts: int, seed: int = 0, start: datetime = datetime(2024, 1, 1), days: int = 365,
+                    duplicate_rate: float = 0.02, split_rate: float = 0.03, tip_rate: float = 0.6,
+                    drift_rate: float = 0.05, receipt_only_rate: float = 0.05,
+                    bank_only_rate: float = 0.15) -> Tuple[List[Dict], List[Dict], Dict]:
+    """Return ``(receipts, bank_transactions, truth)``.
+
+    ``truth['pairs']`` maps each receipt transaction id to the bank
+    transaction id that paid it (both copies of a duplicated receipt map to
+    the same bank line). ``truth['splits']`` maps a bank transaction id to
+    the receipts it paid together; those receipts have no one-to-one pair.
+    """
+    rng = random.Random(seed)
+    receipts: List[Dict] = []
+    bank: List[Dict] = []
+    pairs: Dict[str, str] = {}
+    splits: Dict[str, List[str]] = {}
+
+    def add_receipt(vendor: str, category: str, amount: float, day: datetime) -> Dict:
+        receipt = {
+            'transaction_id': f'receipt_{len(receipts):07d}',
+            'transaction_date': day,
+            'vendor_name': vendor,
+            'amount': round(amount, 2),
+            'category': category,
+        }
+        receipts.append(receipt)
+        return receipt
+
+    def add_bank(description: str, amount: float, day: datetime, transaction_type: str = 'debit') -> Dict:
+        txn = {
+            'transaction_id': f'bank_{len(bank):07d}',
+            'transaction_date': day,
+            'description': description,
+            'amount': round(amount, 2),
+            'transaction_type': transaction_type,
+        }
+        bank.append(txn)
+        return txn
+
+    while len(receipts) < n_receipts:
+        name, category, templates, tipped = rng.choice(MERCHANTS)
+        day = start + timedelta(days=rng.randrange(days))
+        posted = day + timedelta(days=min(rng.choice([0, 1, 1, 2, 2, 3, 4]) + (2 if day.weekday() >= 5 else 0), 6))
+        description = _descriptor(rng, rng.choice(templates))
+        roll = rng.random()
+
+        if roll < receipt_only_rate:
+            add_receipt(_vendor_noise(rng, rng.choice(RECEIPT_ONLY_VENDORS)), 'other', rng.uniform(2, 80), day)
+            continue
+
+        if roll < receipt_only_rate + split_rate:
+            parts = [rng.uniform(3, 150) for _ in range(rng.randint(2, 3))]
+            group = [add_receipt(_vendor_noise(rng, name), category, part, day) for part in parts]
+            paid = add_bank(description, -sum(r['amount'] for r in group), posted)
+            splits[paid['transaction_id']] = [r['transaction_id'] for r in group]
+            continue
+
+        amount = rng.lognormvariate(3.3, 0.9)
+        receipt = add_receipt(_vendor_noise(rng, name), category, amount, day)
+        charged = receipt['amount']
+        if tipped and rng.random() < tip_rate:
+            charged *= 1 + rng.choice([0.1, 0.15, 0.18, 0.2, 0.22])
+        elif rng.random() < drift_rate:
+            charged *= rng.uniform(0.985, 1.015)
+        paid = add_bank(description, -charged, posted)
+        pairs[receipt['transaction_id']] = paid['transaction_id']
+
+        if rng.random() < duplicate_rate and len(receipts) < n_receipts:
+            copy = add_receipt(receipt['vendor_name'], category, receipt['amount'], day)
+            pairs[copy['transaction_id']] = paid['transaction_id']
+
+    for _ in range(int(len(bank) * bank_only_rate)):
+        description = _descriptor(rng, rng.choice(BANK_ONLY_DESCRIPTIONS))
+        day = start + timedelta(days=rng.randrange(days))
+        if description.startswith('PAYROLL'):
+            add_bank(description, rng.uniform(1500, 4000), day, 'credit')
+        else:
+            add_bank(description, -rng.lognormvariate(3.3, 0.9), day)
+
+    # Statements are ordered by posting date, not by purchase.
+    bank.sort(key=lambda txn: txn['transaction_date'])
+    return receipts, bank, {'pairs': pairs, 'splits': splits}
+
+
+def score_pairs(matched: List[Tuple[str, str]], truth: Dict) -> Dict[str, float]:
+    """Precision and recall of one-to-one ``(receipt_id, bank_id)`` matches.
+
+    Recall is measured against the bank lines that have a one-to-one receipt,
+    so a duplicated receipt counts once.
+    """
+    pairs = truth['pairs']
+    correct = sum(1 for receipt_id, bank_id in matched if pairs.get(receipt_id) == bank_id)
+    matchable = len(set(pairs.values()))
+    return {
+        'matches': len(matched),
+        'correct': correct,
+        'precision': correct / len(matched) if matched else 0.0,
+        'recall': correct / matchable if matchable else 0.0,
+    }
+
+
+def score_splits(groups: List[Tuple[List[str], List[str]]], truth: Dict) -> Dict[str, float]:
+    """Precision and recall of ``(receipt_ids, bank_ids)`` split groups; a group is correct only if exact."""
+    expected = {bank_id: sorted(receipt_ids) for bank_id, receipt_ids in truth['splits'].items()}
+    correct = sum(1 for receipt_ids, bank_ids in groups
+                  if len(bank_ids) == 1 and expected.get(bank_ids[0]) == sorted(receipt_ids))
+    return {
+        'matches': len(groups),
+        'correct': correct,
+        'precision': correct / len(groups) if groups else 0.0,
+        'recall': correct / len(expected) if expected else 0.0,
+    }
@@ -10,6 +10,41 @@ class AppSettings:
     
     LLM_MAX_TOKENS = int(os.getenv('LLM_MAX_TOKENS', '4096'))
     LLM_TEMPERATURE = float(os.getenv('LLM_TEMPERATURE', '0.1'))
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+    LLM_HTTP2 = os.getenv('LLM_HTTP2', 'true').lower() == 'true'
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '10'))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '5'))
+    LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('LLM_KEEPALIVE_EXPIRY_SECONDS', '60'))
+    ENABLE_EXTRACTION_CACHE = os.getenv('ENABLE_EXTRACTION_CACHE', 'true').lower() == 'true'
+    EXTRACTION_CACHE_TTL_DAYS = float(os.getenv('EXTRACTION_CACHE_TTL_DAYS', '90'))
+    EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', '50000'))
+    ENABLE_PACKED_EXTRACTION = os.getenv('ENABLE_PACKED_EXTRACTION', 'false').lower() == 'true'
+    LLM_PACK_TOKEN_BUDGET = int(os.getenv('LLM_PACK_TOKEN_BUDGET', '6000'))
+    LLM_PACK_MAX_RECEIPTS = int(os.getenv('LLM_PACK_MAX_RECEIPTS', '8'))
+    
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'remote')
+    LOCAL_EMBEDDING_DIM = int(os.getenv('LOCAL_EMBEDDING_DIM', '512'))
+    EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '1024'))
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', '4'))
+    EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', '3'))
+    STORE_EMBEDDINGS_ON_INGEST = os.getenv('STORE_EMBEDDINGS_ON_INGEST', 'false').lower() == 'true'
+    EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float16')
+    ENABLE_EMBEDDING_CACHE = os.getenv('ENABLE_EMBEDDING_CACHE', 'true').lower() == 'true'
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'embedding_cache'))
+    
+    VECTOR_INDEX_TYPE = os.getenv('VECTOR_INDEX_TYPE', 'exact')
+    VECTOR_INDEX_PATH = os.getenv('VECTOR_INDEX_PATH', os.path.join(os.path.dirname(__file__), '..', 'data', 'vector_index', 'bank_index.npz'))
+    
+    RECONCILIATION_WORKERS = int(os.getenv('RECONCILIATION_WORKERS', '1'))
+    RECONCILIATION_STRATEGY = os.getenv('RECONCILIATION_STRATEGY', 'greedy')
+    ENABLE_SPLIT_MATCHING = os.getenv('ENABLE_SPLIT_MATCHING', 'true').lower() == 'true'
+    SPLIT_MATCH_MAX_GROUP_SIZE = int(os.getenv('SPLIT_MATCH_MAX_GROUP_SIZE', '4'))
+    SPLIT_MATCH_TIME_LIMIT_SECONDS = float(os.getenv('SPLIT_MATCH_TIME_LIMIT_SECONDS', '5'))
+    SUGGESTION_TOP_K = int(os.getenv('SUGGESTION_TOP_K', '3'))
+    SUGGESTION_MIN_SCORE = float(os.getenv('SUGGESTION_MIN_SCORE', '0.5'))
+    RECONCILIATION_TIERS = [tier.strip() for tier in os.getenv('RECONCILIATION_TIERS', 'exact,fuzzy').split(',') if tier.strip()]
+    ONLINE_MATCH_POLL_SECONDS = float(os.getenv('ONLINE_MATCH_POLL_SECONDS', '2'))
     
     ENABLE_FILE_VALIDATION = os.getenv('ENABLE_FILE_VALIDATION', 'true').lower() == 'true'
     ENABLE_RATE_LIMITING = True
@@ -23,4 +58,23 @@ class AppSettings:
             'max_concurrent_processing': cls.MAX_CONCURRENT_PROCESSING,
             'llm_max_tokens': cls.LLM_MAX_TOKENS,
             'llm_temperature': cls.LLM_TEMPERATURE,
+            'llm_http2': cls.LLM_HTTP2,
+            'llm_max_connections': cls.LLM_MAX_CONNECTIONS,
+            'enable_extraction_cache': cls.ENABLE_EXTRACTION_CACHE,
+            'enable_packed_extraction': cls.ENABLE_PACKED_EXTRACTION,
+            'llm_pack_token_budget': cls.LLM_PACK_TOKEN_BUDGET,
+            'embedding_backend': cls.EMBEDDING_BACKEND,
+            'embedding_batch_size': cls.EMBEDDING_BATCH_SIZE,
+            'embedding_max_concurrency': cls.EMBEDDING_MAX_CONCURRENCY,
+            'store_embeddings_on_ingest': cls.STORE_EMBEDDINGS_ON_INGEST,
+            'embedding_storage_dtype': cls.EMBEDDING_STORAGE_DTYPE,
+            'enable_embedding_cache': cls.ENABLE_EMBEDDING_CACHE,
+            'embedding_cache_dir': cls.EMBEDDING_CACHE_DIR,
+            'vector_index_type': cls.VECTOR_INDEX_TYPE,
+            'reconciliation_workers': cls.RECONCILIATION_WORKERS,
+            'reconciliation_tiers': cls.RECONCILIATION_TIERS,
+            'reconciliation_strategy': cls.RECONCILIATION_STRATEGY,
+            'enable_split_matching': cls.ENABLE_SPLIT_MATCHING,
+            'suggestion_top_k': cls.SUGGESTION_TOP_K,
+            'online_match_poll_seconds': cls.ONLINE_MATCH_POLL_SECONDS,
         }
\ No newline at end of file
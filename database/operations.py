@@ -1,10 +1,44 @@
-from models.schema import ReceiptTransaction, BankTransaction, ReconciliationMatch, ProcessedEmail
+from models.schema import ReceiptTransaction, BankTransaction, ReconciliationMatch, ReconciliationRun, ProcessedEmail, VendorAlias, ReconciliationSummary, ExtractionCacheEntry
+from models.reconciliation_embeddings import ReconciliationEmbeddings
+from models.embedding_codec import encode_embedding
+from models.transaction_table import TransactionTable
+from config.settings import AppSettings
 from mongoengine.errors import NotUniqueError
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson.binary import Binary
+from utils.helpers import GeneralHelpers
+from datetime import datetime, timedelta
+
+EMBEDDING_QUERY_CHUNK = 10000
+
+_ingest_embeddings = None
+
+def _get_ingest_embeddings():
+    global _ingest_embeddings
+    if _ingest_embeddings is None:
+        _ingest_embeddings = ReconciliationEmbeddings()
+    return _ingest_embeddings
+
+def attach_transaction_embeddings(records, text_fn):
+    if not records or not AppSettings.STORE_EMBEDDINGS_ON_INGEST:
+        return records
+    try:
+        embeddings = _get_ingest_embeddings()
+        vectors = embeddings.embed_transactions([text_fn(record) for record in records])
+        for record, vector in zip(records, vectors):
+            record['embedding'] = encode_embedding(vector, AppSettings.EMBEDDING_STORAGE_DTYPE)
+            record['embedding_model'] = embeddings.model
+    except Exception as e:
+        print(f"Could not compute transaction embeddings at ingestion: {e}")
+    return records
 
 def add_receipt_transaction(transaction_data):
     try:
-        transaction = ReceiptTransaction(**transaction_data)
+        record = attach_transaction_embeddings([dict(transaction_data)], ReconciliationEmbeddings.receipt_text)[0]
+        transaction = ReceiptTransaction(**record)
         transaction.save()
+        _record_ingested(ReceiptTransaction, [transaction.to_mongo()])
         return transaction
     except NotUniqueError:
         print(f"Transaction with id {transaction_data.get('transaction_id')} already exists.")
@@ -27,10 +61,30 @@ def get_all_receipt_transactions():
         print(f"An error occurred while retrieving all receipt transactions: {e}")
         return []
 
+RECEIPT_RECONCILIATION_FIELDS = {
+    'transaction_id': 1, 'transaction_date': 1, 'vendor_name': 1, 'amount': 1,
+    'category': 1, 'extraction_confidence': 1, 'receipt_filename': 1, 'reconciliation_status': 1, 'updated_at': 1,
+}
+
+BANK_RECONCILIATION_FIELDS = {
+    'transaction_id': 1, 'transaction_date': 1, 'description': 1, 'amount': 1,
+    'transaction_type': 1, 'account_number': 1, 'reconciliation_status': 1, 'updated_at': 1,
+}
+
+def iter_receipt_transactions_by_date(projection=None, batch_size=1000, open_only=True):
+    try:
+        collection = ReceiptTransaction._get_collection()
+        return collection.find(OPEN_TRANSACTIONS_QUERY if open_only else {}, projection or RECEIPT_RECONCILIATION_FIELDS).sort('transaction_date', 1).batch_size(batch_size)
+    except Exception as e:
+        print(f"An error occurred while streaming receipt transactions: {e}")
+        return iter([])
+
 def add_bank_transaction(transaction_data):
     try:
-        transaction = BankTransaction(**transaction_data)
+        record = attach_transaction_embeddings([dict(transaction_data)], ReconciliationEmbeddings.bank_text)[0]
+        transaction = BankTransaction(**record)
         transaction.save()
+        _record_ingested(BankTransaction, [transaction.to_mongo()])
         return transaction
     except NotUniqueError:
         print(f"Transaction with id {transaction_data.get('transaction_id')} already exists.")
@@ -39,6 +93,25 @@ def add_bank_transaction(transaction_data):
         print(f"An error occurred while adding bank transaction: {e}")
         return []
 
+def add_bank_transactions(transactions_data):
+    try:
+        records = attach_transaction_embeddings([dict(t) for t in transactions_data], ReconciliationEmbeddings.bank_text)
+        documents = [BankTransaction(**record) for record in records]
+        for document in documents:
+            document.validate()
+        records = [d.to_mongo() for d in documents]
+        result = BankTransaction._get_collection().insert_many(records, ordered=False)
+        _record_ingested(BankTransaction, records)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        print(f"{len(e.details.get('writeErrors', []))} bank transactions already exist or failed to insert.")
+        # Which rows made it in is not reported, so recount.
+        refresh_reconciliation_summary()
+        return e.details.get('nInserted', 0)
+    except Exception as e:
+        print(f"An error occurred while adding bank transactions: {e}")
+        return 0
+
 def get_bank_transaction(transaction_id):
     try:
         return BankTransaction.objects(transaction_id=transaction_id).first()
@@ -53,6 +126,14 @@ def get_all_bank_transactions():
         print(f"An error occurred while retrieving all bank transactions: {e}")
         return None
 
+def iter_bank_transactions_by_date(projection=None, batch_size=1000, open_only=True):
+    try:
+        collection = BankTransaction._get_collection()
+        return collection.find(OPEN_TRANSACTIONS_QUERY if open_only else {}, projection or BANK_RECONCILIATION_FIELDS).sort('transaction_date', 1).batch_size(batch_size)
+    except Exception as e:
+        print(f"An error occurred while streaming bank transactions: {e}")
+        return iter([])
+
 def add_reconciliation_match(match_data):
     try:
         match = ReconciliationMatch(**match_data)
@@ -95,4 +176,582 @@ def is_email_processed(message_id: str) -> bool:
         return ProcessedEmail.objects(message_id=message_id).count() > 0
     except Exception as e:
         print(f"An error occurred while checking if email was processed: {e}")
-        return False
\ No newline at end of file
+        return False
+
+OPEN_TRANSACTIONS_QUERY = {'reconciliation_status': {'$ne': 'matched'}}
+
+def get_open_receipt_transactions(projection=None):
+    try:
+        collection = ReceiptTransaction._get_collection()
+        return list(collection.find(OPEN_TRANSACTIONS_QUERY, projection or RECEIPT_RECONCILIATION_FIELDS))
+    except Exception as e:
+        print(f"An error occurred while retrieving open receipt transactions: {e}")
+        return []
+
+def get_open_bank_transactions(projection=None):
+    try:
+        collection = BankTransaction._get_collection()
+        return list(collection.find(OPEN_TRANSACTIONS_QUERY, projection or BANK_RECONCILIATION_FIELDS))
+    except Exception as e:
+        print(f"An error occurred while retrieving open bank transactions: {e}")
+        return []
+
+def get_open_transactions_changed_since(document_cls, since, projection=None):
+    if projection is None:
+        projection = RECEIPT_RECONCILIATION_FIELDS if document_cls is ReceiptTransaction else BANK_RECONCILIATION_FIELDS
+    try:
+        query = dict(OPEN_TRANSACTIONS_QUERY, updated_at={'$gte': since})
+        return list(document_cls._get_collection().find(query, projection).sort('updated_at', 1))
+    except Exception as e:
+        print(f"An error occurred while polling for changed transactions: {e}")
+        return []
+
+def watch_transaction_inserts(resume_after=None, max_await_time_ms=1000):
+    """Change stream of inserts into the receipt and bank collections, or None
+    where change streams are unavailable (standalone servers, local stand-ins)."""
+    try:
+        collections = [ReceiptTransaction._get_collection_name(), BankTransaction._get_collection_name()]
+        pipeline = [{'$match': {'operationType': 'insert', 'ns.coll': {'$in': collections}}}]
+        return ReceiptTransaction._get_db().watch(pipeline, resume_after=resume_after, max_await_time_ms=max_await_time_ms)
+    except Exception as e:
+        print(f"Change streams are not available: {e}")
+        return None
+
+OBJECT_ID_QUERY_CHUNK = 10000
+
+def _transaction_kind(document_cls):
+    return 'receipt' if document_cls is ReceiptTransaction else 'bank'
+
+def load_transaction_table(document_cls, query=None, tokens=None, batch_size=5000):
+    kind = _transaction_kind(document_cls)
+    try:
+        cursor = document_cls._get_collection().find(query or {}, TransactionTable.projection(kind)).batch_size(batch_size)
+        return TransactionTable.from_documents(kind, cursor, tokens)
+    except Exception as e:
+        print(f"An error occurred while loading the {kind} transaction table: {e}")
+        return TransactionTable.from_documents(kind, [], tokens)
+
+def load_open_transaction_table(document_cls, tokens=None):
+    return load_transaction_table(document_cls, OPEN_TRANSACTIONS_QUERY, tokens)
+
+def get_transactions_by_object_ids(document_cls, object_ids, projection=None):
+    object_ids = list(object_ids)
+    found = {}
+    if projection is None:
+        projection = RECEIPT_RECONCILIATION_FIELDS if document_cls is ReceiptTransaction else BANK_RECONCILIATION_FIELDS
+    try:
+        collection = document_cls._get_collection()
+        for start in range(0, len(object_ids), OBJECT_ID_QUERY_CHUNK):
+            for doc in collection.find({'_id': {'$in': object_ids[start:start + OBJECT_ID_QUERY_CHUNK]}}, projection):
+                found[doc['_id']] = doc
+        return found
+    except Exception as e:
+        print(f"An error occurred while retrieving transactions by id: {e}")
+        return found
+
+def set_reconciliation_status(document_cls, transaction_ids, status):
+    if not transaction_ids:
+        return 0
+    try:
+        collection = document_cls._get_collection()
+        transaction_ids = list(transaction_ids)
+        # Only documents moving into or out of 'matched' change the summary.
+        moving = {'$ne': 'matched'} if status == 'matched' else 'matched'
+        moved = list(collection.find({'transaction_id': {'$in': transaction_ids}, 'reconciliation_status': moving}, {'amount': 1}))
+        result = collection.update_many(
+            {'transaction_id': {'$in': transaction_ids}},
+            {'$set': {'reconciliation_status': status}}
+        )
+        if moved:
+            _record_matched(document_cls, moved, 1 if status == 'matched' else -1)
+        return result.modified_count
+    except Exception as e:
+        print(f"An error occurred while updating reconciliation status: {e}")
+        return 0
+
+def _claim_transactions(document_cls, transaction_ids, claim):
+    """Mark the open ones among ``transaction_ids`` matched under ``claim``.
+
+    Each document is claimed atomically, so of two writers matching the same
+    transaction only one gets it. Returns {transaction_id: document} for the
+    claimed ones, with the status each had before and its amount.
+    """
+    collection = document_cls._get_collection()
+    previous = {
+        d['transaction_id']: d.get('reconciliation_status')
+        for d in collection.find(dict(OPEN_TRANSACTIONS_QUERY, transaction_id={'$in': list(transaction_ids)}), {'transaction_id': 1, 'reconciliation_status': 1})
+    }
+    if not previous:
+        return {}
+    collection.update_many(
+        dict(OPEN_TRANSACTIONS_QUERY, transaction_id={'$in': list(previous)}),
+        {'$set': {'reconciliation_status': 'matched', 'match_claim': claim}}
+    )
+    return {
+        d['transaction_id']: dict(d, reconciliation_status=previous.get(d['transaction_id']))
+        for d in collection.find({'match_claim': claim}, {'transaction_id': 1, 'amount': 1})
+    }
+
+def _release_transactions(document_cls, claimed, claim):
+    """Put claimed transactions back to the status they had before the claim."""
+    by_status = {}
+    for transaction_id, document in claimed.items():
+        by_status.setdefault(document.get('reconciliation_status') or 'unmatched', []).append(transaction_id)
+    for status, transaction_ids in by_status.items():
+        document_cls._get_collection().update_many(
+            {'match_claim': claim, 'transaction_id': {'$in': transaction_ids}},
+            {'$set': {'reconciliation_status': status}, '$unset': {'match_claim': ''}}
+        )
+
+def _store_claimed_matches(units):
+    """Write the match documents of every unit whose transactions are all still open.
+
+    ``units`` are (receipts, bank transactions, ReconciliationMatch documents)
+    triples. Every transaction is claimed before anything is written, so a
+    concurrent run or the online matcher cannot match one twice; units that
+    lose any transaction are released and skipped, and if the insert fails
+    every claim is released, leaving neither orphan matches nor transactions
+    marked matched without one. Returns the units stored.
+    """
+    claim = GeneralHelpers.generate_unique_id("claim")
+    claimed = {ReceiptTransaction: {}, BankTransaction: {}}
+    try:
+        claimed[ReceiptTransaction] = _claim_transactions(ReceiptTransaction, [r['transaction_id'] for u in units for r in u[0]], claim)
+        claimed[BankTransaction] = _claim_transactions(BankTransaction, [b['transaction_id'] for u in units for b in u[1]], claim)
+        stored = [
+            u for u in units
+            if all(r['transaction_id'] in claimed[ReceiptTransaction] for r in u[0])
+            and all(b['transaction_id'] in claimed[BankTransaction] for b in u[1])
+        ]
+        for document_cls, side in ((ReceiptTransaction, 0), (BankTransaction, 1)):
+            kept = {t['transaction_id'] for u in stored for t in u[side]}
+            lost = {tid: d for tid, d in claimed[document_cls].items() if tid not in kept}
+            _release_transactions(document_cls, lost, claim)
+            claimed[document_cls] = {tid: d for tid, d in claimed[document_cls].items() if tid in kept}
+        if stored:
+            discard_pending_suggestions([r['_id'] for u in stored for r in u[0]], [b['_id'] for u in stored for b in u[1]])
+            ReconciliationMatch.objects.insert([d for u in stored for d in u[2]], load_bulk=False)
+    except Exception:
+        for document_cls, documents in claimed.items():
+            _release_transactions(document_cls, documents, claim)
+        raise
+    for document_cls, documents in claimed.items():
+        if documents:
+            document_cls._get_collection().update_many({'match_claim': claim}, {'$unset': {'match_claim': ''}})
+            _record_matched(document_cls, list(documents.values()), 1)
+    return stored
+
+def bulk_add_reconciliation_matches(matches, run_id=None, match_type='automatic'):
+    """Store one-to-one matches; returns how many were stored, fewer when some
+    transaction was matched elsewhere in the meantime."""
+    if not matches:
+        return 0
+    try:
+        units = [
+            ([match['receipt']], [match['bank_transaction']], [ReconciliationMatch(
+                match_id=GeneralHelpers.generate_unique_id("match"),
+                ledger_transaction=match['receipt']['_id'],
+                bank_transaction=match['bank_transaction']['_id'],
+                match_confidence=round(float(match['confidence']), 2),
+                match_type=match_type,
+                match_criteria={'engine_match_type': match.get('match_type'), 'confidence': float(match['confidence'])},
+                run_id=run_id
+            )])
+            for match in matches
+        ]
+        return len(_store_claimed_matches(units))
+    except Exception as e:
+        print(f"An error occurred while saving reconciliation matches: {e}")
+        return 0
+
+def bulk_add_split_matches(groups, run_id=None, match_type='automatic'):
+    if not groups:
+        return 0
+    try:
+        units = [
+            (group['receipts'], group['bank_transactions'], [
+                ReconciliationMatch(
+                    match_id=GeneralHelpers.generate_unique_id("match"),
+                    ledger_transaction=receipt['_id'],
+                    bank_transaction=bank_txn['_id'],
+                    match_confidence=round(float(group['confidence']), 2),
+                    match_type=match_type,
+                    match_criteria={
+                        'engine_match_type': group.get('match_type'),
+                        'direction': group.get('direction'),
+                        'group_size': len(group['receipts']) + len(group['bank_transactions']),
+                        'confidence': float(group['confidence'])
+                    },
+                    run_id=run_id,
+                    group_id=group['group_id']
+                )
+                for receipt in group['receipts']
+                for bank_txn in group['bank_transactions']
+            ])
+            for group in groups
+        ]
+        return len(_store_claimed_matches(units))
+    except Exception as e:
+        print(f"An error occurred while saving split matches: {e}")
+        return 0
+
+def _suggestion_source_field(direction):
+    return 'ledger_transaction' if direction == 'receipt' else 'bank_transaction'
+
+def discard_pending_suggestions(receipt_object_ids=(), bank_object_ids=()):
+    try:
+        result = ReconciliationMatch._get_collection().delete_many({
+            'match_type': 'suggested',
+            'status': 'pending',
+            '$or': [
+                {'ledger_transaction': {'$in': list(receipt_object_ids)}},
+                {'bank_transaction': {'$in': list(bank_object_ids)}}
+            ]
+        })
+        return result.deleted_count
+    except Exception as e:
+        print(f"An error occurred while discarding suggestions: {e}")
+        return 0
+
+def replace_suggestions(direction, source_object_ids, suggestions, run_id=None):
+    """Swap the pending suggestions of every listed source for ``suggestions``."""
+    source_field = _suggestion_source_field(direction)
+    try:
+        ReconciliationMatch._get_collection().delete_many({
+            'match_type': 'suggested',
+            'status': 'pending',
+            'suggestion_direction': direction,
+            source_field: {'$in': list(source_object_ids)}
+        })
+        documents = []
+        for suggestion in suggestions:
+            for rank, candidate in enumerate(suggestion['candidates'], start=1):
+                receipt, bank_txn = (suggestion['source'], candidate['transaction']) if direction == 'receipt' else (candidate['transaction'], suggestion['source'])
+                documents.append(ReconciliationMatch(
+                    match_id=GeneralHelpers.generate_unique_id("suggestion"),
+                    ledger_transaction=receipt['_id'],
+                    bank_transaction=bank_txn['_id'],
+                    match_confidence=round(float(candidate['confidence']), 2),
+                    match_type='suggested',
+                    match_criteria={'breakdown': candidate['breakdown'], 'confidence': float(candidate['confidence'])},
+                    run_id=run_id,
+                    suggestion_direction=direction,
+                    suggestion_rank=rank
+                ))
+        if documents:
+            ReconciliationMatch.objects.insert(documents, load_bulk=False)
+        document_cls = ReceiptTransaction if direction == 'receipt' else BankTransaction
+        set_reconciliation_status(document_cls, [s['source']['transaction_id'] for s in suggestions], 'suggested')
+        return len(documents)
+    except Exception as e:
+        print(f"An error occurred while saving suggestions: {e}")
+        return 0
+
+def count_pending_suggestions(direction='receipt'):
+    try:
+        return ReconciliationMatch.objects(match_type='suggested', status='pending', suggestion_direction=direction).count()
+    except Exception as e:
+        print(f"An error occurred while counting suggestions: {e}")
+        return 0
+
+def get_suggestion_page(direction='receipt', page=0, page_size=20):
+    source_field = _suggestion_source_field(direction)
+    try:
+        documents = list(ReconciliationMatch._get_collection().find(
+            {'match_type': 'suggested', 'status': 'pending', 'suggestion_direction': direction}
+        ).sort([(source_field, 1), ('suggestion_rank', 1)]).skip(page * page_size).limit(page_size))
+
+        receipts = {r['_id']: r for r in ReceiptTransaction._get_collection().find(
+            {'_id': {'$in': [d['ledger_transaction'] for d in documents]}}, RECEIPT_RECONCILIATION_FIELDS)}
+        bank_transactions = {b['_id']: b for b in BankTransaction._get_collection().find(
+            {'_id': {'$in': [d['bank_transaction'] for d in documents]}}, BANK_RECONCILIATION_FIELDS)}
+        return [
+            {
+                'match_id': d['match_id'],
+                'direction': direction,
+                'rank': d.get('suggestion_rank'),
+                'confidence': float(d['match_confidence']),
+                'breakdown': d.get('match_criteria', {}).get('breakdown', {}),
+                'receipt': receipts.get(d['ledger_transaction']),
+                'bank_transaction': bank_transactions.get(d['bank_transaction'])
+            }
+            for d in documents
+        ]
+    except Exception as e:
+        print(f"An error occurred while retrieving suggestions: {e}")
+        return []
+
+def start_reconciliation_run(is_full_run=False):
+    try:
+        started_at = datetime.utcnow()
+        run = ReconciliationRun(
+            run_id=GeneralHelpers.generate_unique_id("run"),
+            started_at=started_at,
+            watermark=started_at,
+            is_full_run=is_full_run
+        )
+        run.save()
+        return run
+    except Exception as e:
+        print(f"An error occurred while starting reconciliation run: {e}")
+        return None
+
+def complete_reconciliation_run(run, status='completed', **counts):
+    try:
+        finished_at = datetime.utcnow()
+        run.update(set__status=status, set__finished_at=finished_at, **{f"set__{k}": v for k, v in counts.items()})
+        if status == 'completed':
+            refresh_reconciliation_summary(last_run_id=run.run_id, last_run_at=finished_at, last_run_matches=counts.get('matches_created', 0))
+        return True
+    except Exception as e:
+        print(f"An error occurred while completing reconciliation run: {e}")
+        return False
+
+def get_last_reconciliation_run():
+    try:
+        return ReconciliationRun.objects(status='completed').order_by('-watermark').first()
+    except Exception as e:
+        print(f"An error occurred while retrieving last reconciliation run: {e}")
+        return None
+
+def count_matched_receipts():
+    try:
+        return ReceiptTransaction.objects(reconciliation_status='matched').count()
+    except Exception as e:
+        print(f"An error occurred while counting matched receipts: {e}")
+        return 0
+
+SUMMARY_ID = 'global'
+
+def _amount(document):
+    amount = GeneralHelpers.parse_amount(document.get('amount'))
+    return abs(amount) if amount is not None and amount == amount else 0.0
+
+def _bump_reconciliation_summary(increments, **fields):
+    try:
+        ReconciliationSummary._get_collection().update_one(
+            {'summary_id': SUMMARY_ID},
+            {'$inc': increments, '$set': dict(fields, updated_at=datetime.utcnow())},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"An error occurred while updating the reconciliation summary: {e}")
+
+def _record_ingested(document_cls, records):
+    if document_cls is ReceiptTransaction:
+        increments = {'receipts': len(records), 'receipt_amount': sum(_amount(r) for r in records)}
+    else:
+        increments = {
+            'bank_transactions': len(records),
+            'bank_debits': sum(_amount(r) for r in records if r.get('transaction_type') == 'debit'),
+            'bank_credits': sum(_amount(r) for r in records if r.get('transaction_type') == 'credit'),
+        }
+    _bump_reconciliation_summary(increments, last_ingested_at=datetime.utcnow())
+
+def _record_matched(document_cls, documents, sign):
+    if document_cls is ReceiptTransaction:
+        increments = {'matched_receipts': sign * len(documents), 'matched_receipt_amount': sign * sum(_amount(d) for d in documents)}
+    else:
+        increments = {'matched_bank_transactions': sign * len(documents)}
+    _bump_reconciliation_summary(increments)
+
+def _summary_totals(document_cls):
+    """(count, absolute amount) per (matched, transaction_type), counted server-side."""
+    pipeline = [{'$group': {
+        '_id': {'matched': {'$eq': ['$reconciliation_status', 'matched']}, 'type': '$transaction_type'},
+        'count': {'$sum': 1},
+        'amount': {'$sum': {'$abs': '$amount'}},
+    }}]
+    return [(row['_id'].get('matched'), row['_id'].get('type'), row['count'], row['amount'] or 0.0)
+            for row in document_cls._get_collection().aggregate(pipeline)]
+
+def refresh_reconciliation_summary(**fields):
+    """Recount the summary from the transaction collections; ``fields`` are stored alongside."""
+    try:
+        receipts = _summary_totals(ReceiptTransaction)
+        bank = _summary_totals(BankTransaction)
+        now = datetime.utcnow()
+        counts = {
+            'receipts': sum(count for _, _, count, _ in receipts),
+            'matched_receipts': sum(count for matched, _, count, _ in receipts if matched),
+            'receipt_amount': float(sum(amount for _, _, _, amount in receipts)),
+            'matched_receipt_amount': float(sum(amount for matched, _, _, amount in receipts if matched)),
+            'bank_transactions': sum(count for _, _, count, _ in bank),
+            'matched_bank_transactions': sum(count for matched, _, count, _ in bank if matched),
+            'bank_debits': float(sum(amount for _, kind, _, amount in bank if kind == 'debit')),
+            'bank_credits': float(sum(amount for _, kind, _, amount in bank if kind == 'credit')),
+        }
+        collection = ReconciliationSummary._get_collection()
+        collection.update_one(
+            {'summary_id': SUMMARY_ID},
+            {'$set': dict(counts, refreshed_at=now, updated_at=now, **fields)},
+            upsert=True
+        )
+        return collection.find_one({'summary_id': SUMMARY_ID})
+    except Exception as e:
+        print(f"An error occurred while refreshing the reconciliation summary: {e}")
+        return None
+
+def get_reconciliation_summary():
+    try:
+        summary = ReconciliationSummary._get_collection().find_one({'summary_id': SUMMARY_ID})
+    except Exception as e:
+        print(f"An error occurred while retrieving the reconciliation summary: {e}")
+        return None
+    # Increments alone never saw documents stored before the summary existed.
+    if summary is None or summary.get('refreshed_at') is None:
+        summary = refresh_reconciliation_summary()
+    return summary
+
+def get_extraction_cache_entry(key, ttl_seconds):
+    """The live cache entry under ``key``, its expiry pushed back by ``ttl_seconds``."""
+    try:
+        now = datetime.utcnow()
+        return ExtractionCacheEntry._get_collection().find_one_and_update(
+            {'key': key, 'expires_at': {'$gt': now}},
+            {'$set': {'last_used_at': now, 'expires_at': now + timedelta(seconds=ttl_seconds)}, '$inc': {'hits': 1}},
+            projection={'result': 1, 'confidence': 1, 'layer': 1}
+        )
+    except Exception as e:
+        print(f"An error occurred while reading the extraction cache: {e}")
+        return None
+
+def put_extraction_cache_entries(keys_by_layer, extraction_version, result, confidence, ttl_seconds):
+    if not keys_by_layer:
+        return 0
+    try:
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'key': key},
+                {'$set': {
+                    'layer': layer, 'extraction_version': extraction_version, 'result': result, 'confidence': confidence,
+                    'last_used_at': now, 'expires_at': now + timedelta(seconds=ttl_seconds)
+                }, '$setOnInsert': {'created_at': now, 'hits': 0}},
+                upsert=True
+            )
+            for layer, key in keys_by_layer.items()
+        ]
+        result = ExtractionCacheEntry._get_collection().bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+    except Exception as e:
+        print(f"An error occurred while writing the extraction cache: {e}")
+        return 0
+
+def evict_extraction_cache(max_entries):
+    """Drop least recently used entries beyond ``max_entries``."""
+    try:
+        collection = ExtractionCacheEntry._get_collection()
+        excess = collection.estimated_document_count() - max_entries
+        if excess <= 0:
+            return 0
+        stale = [doc['_id'] for doc in collection.find({}, {'_id': 1}).sort('last_used_at', 1).limit(excess)]
+        return collection.delete_many({'_id': {'$in': stale}}).deleted_count
+    except Exception as e:
+        print(f"An error occurred while evicting extraction cache entries: {e}")
+        return 0
+
+def count_extraction_cache_entries():
+    try:
+        return ExtractionCacheEntry._get_collection().estimated_document_count()
+    except Exception as e:
+        print(f"An error occurred while counting extraction cache entries: {e}")
+        return 0
+
+def get_vendor_aliases():
+    try:
+        return list(VendorAlias._get_collection().find({}, {'_id': 0, 'alias': 1, 'vendor_id': 1, 'vendor_name': 1, 'whole_text': 1}))
+    except Exception as e:
+        print(f"An error occurred while retrieving vendor aliases: {e}")
+        return []
+
+def add_vendor_aliases(aliases):
+    if not aliases:
+        return 0
+    try:
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({'alias': alias['alias']}, {'$setOnInsert': dict(alias, created_at=now)}, upsert=True)
+            for alias in aliases
+        ]
+        result = VendorAlias._get_collection().bulk_write(operations, ordered=False)
+        return result.upserted_count
+    except Exception as e:
+        print(f"An error occurred while adding vendor aliases: {e}")
+        return 0
+
+def allocate_vendor_id(floor):
+    """Next id from the shared vendor id counter, always above ``floor``."""
+    try:
+        counters = VendorAlias._get_db()['counters']
+        counters.update_one({'_id': 'vendor_id'}, {'$max': {'seq': floor}}, upsert=True)
+        return counters.find_one_and_update({'_id': 'vendor_id'}, {'$inc': {'seq': 1}}, return_document=ReturnDocument.AFTER)['seq']
+    except Exception as e:
+        print(f"An error occurred while allocating a vendor id: {e}")
+        return None
+
+def claim_vendor_alias(alias):
+    """Store ``alias`` unless that alias exists already; returns the vendor id it is stored with."""
+    collection = VendorAlias._get_collection()
+    try:
+        try:
+            stored = collection.find_one_and_update(
+                {'alias': alias['alias']}, {'$setOnInsert': dict(alias, created_at=datetime.utcnow())},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another process inserted it between our lookup and insert.
+            stored = collection.find_one({'alias': alias['alias']})
+        return stored['vendor_id']
+    except Exception as e:
+        print(f"An error occurred while claiming vendor alias {alias.get('alias')}: {e}")
+        return None
+
+def get_confirmed_match_transactions(since=None):
+    """(receipt vendor name, bank description) of every confirmed match, optionally only those confirmed after ``since``."""
+    query = {'status': 'confirmed', 'ledger_transaction': {'$ne': None}, 'bank_transaction': {'$ne': None}}
+    if since is not None:
+        query['confirmed_at'] = {'$gt': since}
+    try:
+        pairs = [
+            (doc['ledger_transaction'], doc['bank_transaction'])
+            for doc in ReconciliationMatch._get_collection().find(query, {'ledger_transaction': 1, 'bank_transaction': 1})
+        ]
+        receipts = get_transactions_by_object_ids(ReceiptTransaction, {r for r, _ in pairs}, {'vendor_name': 1})
+        bank_transactions = get_transactions_by_object_ids(BankTransaction, {b for _, b in pairs}, {'description': 1})
+        return [
+            (receipts[r].get('vendor_name', ''), bank_transactions[b].get('description', ''))
+            for r, b in pairs if r in receipts and b in bank_transactions
+        ]
+    except Exception as e:
+        print(f"An error occurred while retrieving confirmed matches: {e}")
+        return []
+
+def load_transaction_embeddings(document_cls, transaction_ids, embedding_model):
+    transaction_ids = list(transaction_ids)
+    stored = {}
+    try:
+        collection = document_cls._get_collection()
+        for start in range(0, len(transaction_ids), EMBEDDING_QUERY_CHUNK):
+            cursor = collection.find(
+                {'transaction_id': {'$in': transaction_ids[start:start + EMBEDDING_QUERY_CHUNK]}, 'embedding_model': embedding_model},
+                {'_id': 0, 'transaction_id': 1, 'embedding': 1}
+            )
+            stored.update((doc['transaction_id'], doc['embedding']) for doc in cursor if doc.get('embedding'))
+        return stored
+    except Exception as e:
+        print(f"An error occurred while loading transaction embeddings: {e}")
+        return stored
+
+def store_transaction_embeddings(document_cls, embeddings_by_id, embedding_model):
+    if not embeddings_by_id:
+        return 0
+    try:
+        result = document_cls._get_collection().bulk_write([
+            UpdateOne({'transaction_id': transaction_id}, {'$set': {'embedding': Binary(blob), 'embedding_model': embedding_model}})
+            for transaction_id, blob in embeddings_by_id.items()
+        ], ordered=False)
+        return result.modified_count
+    except Exception as e:
+        print(f"An error occurred while storing transaction embeddings: {e}")
+        return 0
@@ -1,24 +1,39 @@
 import os
-import requests
 from dotenv import load_dotenv
 from langchain_core.embeddings import Embeddings
-from typing import List
+from typing import Any, List
+from .embedding_transport import EmbeddingTransport, EmbeddingShapeError, get_shared_transport
+from config.settings import AppSettings
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
+def parse_result_data_response(data: Any) -> List[List[float]]:
+    if not (isinstance(data, dict) and 'result' in data and 'data' in data['result']):
+        raise EmbeddingShapeError(f"Unexpected embedding API response format: {str(data)[:200]}")
+    return [[float(v) for v in item['embedding']] for item in data['result']['data']]
+
 class CustomEmbedding(Embeddings):
     def __init__(self, api_url: str, api_key: str, model: str = "usf1-embed"):
         self.api_url = api_url
         self.api_key = api_key
         self.model = model
+        self.embedding_dim = AppSettings.EMBEDDING_DIM
+        self.embed_batch_size = AppSettings.EMBEDDING_BATCH_SIZE
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        headers = {
-            "x-api-key": self.api_key,
-            "Content-Type": "application/json"
-        }
+    def _get_transport(self) -> EmbeddingTransport:
+        return get_shared_transport(
+            self.api_url,
+            {"x-api-key": self.api_key, "Content-Type": "application/json"},
+            self.model,
+            response_parser=parse_result_data_response,
+            batch_size=self.embed_batch_size,
+            max_concurrency=AppSettings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=AppSettings.EMBEDDING_MAX_RETRIES,
+            expected_dim=self.embedding_dim
+        )
 
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
         valid_texts = []
         valid_indices = []
         max_text_length = 8000
@@ -29,30 +44,15 @@ class CustomEmbedding(Embeddings):
                 valid_indices.append(i)
 
         if not valid_texts:
-            return [[0.0] * 1024 for _ in texts]
+            return [[0.0] * self.embedding_dim for _ in texts]
 
-        all_valid_embeddings = []
-        batch_size = 32
-        for i in range(0, len(valid_texts), batch_size):
-            batch = valid_texts[i:i + batch_size]
-            payload = {
-                "model": self.model,
-                "input": batch
-            }
-            try:
-                response = requests.post(self.api_url, headers=headers, json=payload, timeout=60)
-                response.raise_for_status()
-                data = response.json()
-                if not (isinstance(data, dict) and 'result' in data and 'data' in data['result']):
-                    raise RuntimeError(f"Unexpected embedding API response format: {data}")
-                
-                new_embeddings = [[float(v) for v in item['embedding']] for item in data['result']['data']]
-                all_valid_embeddings.extend(new_embeddings)
-            except requests.exceptions.RequestException as e:
-                print(f"Embedding API request failed. Error: {e}")
-                raise
+        try:
+            all_valid_embeddings = self._get_transport().embed(valid_texts)
+        except Exception as e:
+            print(f"Embedding API request failed. Error: {e}")
+            raise
 
-        final_embeddings = [[0.0] * 1024 for _ in texts]
+        final_embeddings = [[0.0] * self.embedding_dim for _ in texts]
         for i, original_index in enumerate(valid_indices):
             final_embeddings[original_index] = all_valid_embeddings[i]
             
@@ -60,11 +60,11 @@ class CustomEmbedding(Embeddings):
 
     def embed_query(self, text: str) -> List[float]:
         if not text or not text.strip():
-            return [0.0] * 1024 
+            return [0.0] * self.embedding_dim 
         
         embeddings = self.embed_documents([text])
         if not embeddings:
-            return [0.0] * 1024
+            return [0.0] * self.embedding_dim
         return embeddings[0]
 
 def get_embedding_model() -> CustomEmbedding:
@@ -77,5 +77,4 @@ def get_embedding_model() -> CustomEmbedding:
     return CustomEmbedding(
         api_url=api_url,
         api_key=api_key
-    )
-
+    )
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within the process
+    fcntl = None
+
+
+class EmbeddingCache:
+    """Content-addressed, disk-backed embedding store.
+
+    Vectors are appended as float32 rows to ``<model>.f32`` and read through a
+    memory map. ``<model>.idx`` holds one hex key per line, so line ``i`` names
+    row ``i``; both files are append-only. Appends hold an exclusive
+    ``flock`` on ``<model>.lock`` and first catch up with rows other
+    processes wrote, so row numbers always come from the files themselves.
+    Use ``get_embedding_cache`` for one instance per directory and model.
+    """
+
+    def __init__(self, cache_dir: str, model: str):
+        self.cache_dir = cache_dir
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        file_stem = os.path.join(cache_dir, "".join(c if c.isalnum() or c in '-_' else '_' for c in model))
+        self._vectors_path = f"{file_stem}.f32"
+        self._index_path = f"{file_stem}.idx"
+        self._meta_path = f"{file_stem}.meta.json"
+        self._lock_path = f"{file_stem}.lock"
+
+        self.dim: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        # Rows read so far and the byte offset in ``.idx`` just past them.
+        self._rows = 0
+        self._index_bytes = 0
+        self._vectors: Optional[np.memmap] = None
+        with self._lock:
+            self._sync()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode('utf-8')).hexdigest()
+
+    def _sync(self):
+        """Read index lines appended since the last sync, by any process.
+
+        A line only counts once it is complete and its vector row is on disk;
+        vectors are written before their keys, so an append still in progress
+        or cut short by a crash is left for the next sync.
+        """
+        if self.dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)['dim']
+
+        rows_on_disk = os.path.getsize(self._vectors_path) // (self.dim * 4) if os.path.exists(self._vectors_path) else 0
+        if rows_on_disk <= self._rows or not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, 'rb') as f:
+            f.seek(self._index_bytes)
+            for line in f:
+                if self._rows >= rows_on_disk or not line.endswith(b'\n'):
+                    break
+                self._index.setdefault(line.decode('ascii').strip(), self._rows)
+                self._rows += 1
+                self._index_bytes += len(line)
+        self._remap(self._rows)
+
+    def _remap(self, rows: int):
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim)) if rows else None
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            if any(key not in self._index for key in keys):
+                self._sync()
+            for key in keys:
+                row = self._index.get(key)
+                if row is not None:
+                    found[key] = np.array(self._vectors[row])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: Sequence[str], vectors) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(keys) == 0:
+            return
+        if vectors.ndim != 2 or vectors.shape[0] != len(keys):
+            raise ValueError(f"Expected {len(keys)} embedding rows, got array of shape {vectors.shape}")
+
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._meta_path, 'w') as f:
+                    json.dump({'model': self.model, 'dim': self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cached dimension {self.dim} for model {self.model}")
+
+            new_rows = [(k, v) for k, v in zip(keys, vectors) if k not in self._index]
+            new_rows = list({k: v for k, v in new_rows}.items())
+            if not new_rows:
+                return
+
+            # Drop whatever an interrupted append left past the last complete row.
+            for path, size in ((self._vectors_path, self._rows * self.dim * 4), (self._index_path, self._index_bytes)):
+                if os.path.exists(path) and os.path.getsize(path) != size:
+                    os.truncate(path, size)
+
+            with open(self._vectors_path, 'ab') as f:
+                f.write(np.stack([v for _, v in new_rows]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._index_path, 'ab') as f:
+                f.write(''.join(f"{k}\n" for k, _ in new_rows).encode('ascii'))
+
+            self._sync()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._index),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size_mb': len(self._index) * (self.dim or 0) * 4 / (1024 * 1024),
+        }
+
+
+_shared_caches: Dict[Tuple[str, str], EmbeddingCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache(cache_dir: str, model: str) -> EmbeddingCache:
+    """The process-wide cache for ``model`` in ``cache_dir``."""
+    key = (os.path.abspath(cache_dir), model)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = EmbeddingCache(cache_dir, model)
+        return cache
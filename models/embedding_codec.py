@@ -0,0 +1,31 @@
+import struct
+import numpy as np
+
+# One tag byte, then the payload. int8 vectors carry a float32 scale so that
+# vector ~= int8_values * scale.
+_FLOAT16_TAG = b'h'
+_INT8_TAG = b'q'
+EMBEDDING_STORAGE_DTYPES = ('float16', 'int8')
+
+
+def encode_embedding(vector, dtype: str = 'float16') -> bytes:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    if dtype == 'float16':
+        return _FLOAT16_TAG + vector.astype('<f2').tobytes()
+    if dtype == 'int8':
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return _INT8_TAG + struct.pack('<f', scale) + quantized.tobytes()
+    raise ValueError(f"Unknown embedding storage dtype '{dtype}', expected one of {EMBEDDING_STORAGE_DTYPES}")
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    blob = bytes(blob)
+    tag, payload = blob[:1], blob[1:]
+    if tag == _FLOAT16_TAG:
+        return np.frombuffer(payload, dtype='<f2').astype(np.float32)
+    if tag == _INT8_TAG:
+        scale = struct.unpack('<f', payload[:4])[0]
+        return np.frombuffer(payload[4:], dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"Unrecognized embedding encoding tag {tag!r}")
@@ -0,0 +1,125 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class EmbeddingShapeError(ValueError):
+    pass
+
+
+class TransientEmbeddingError(RuntimeError):
+    pass
+
+
+class EmbeddingTransport:
+    """Batched embedding client over a pooled keep-alive ``requests.Session``.
+
+    Batches are posted by a bounded thread pool, retried with exponential
+    backoff on connection errors and 429/5xx responses, and every response is
+    checked for the expected row count and vector dimension.
+    """
+
+    def __init__(self, url: str, headers: Dict[str, str], model: str,
+                 response_parser: Callable[[Any], List[List[float]]],
+                 batch_size: int = 32, max_concurrency: int = 4, max_retries: int = 3,
+                 backoff_seconds: float = 1.0, timeout: float = 60.0,
+                 expected_dim: Optional[int] = None, extra_payload: Optional[Dict[str, Any]] = None):
+        self.url = url
+        self.headers = headers
+        self.model = model
+        self.response_parser = response_parser
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.expected_dim = expected_dim
+        self.extra_payload = extra_payload or {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            results = [self._post_batch(batch) for batch in batches]
+        else:
+            results = list(self._get_executor().map(self._post_batch, batches))
+
+        embeddings = [vector for batch_vectors in results for vector in batch_vectors]
+        dims = {len(vector) for vector in embeddings}
+        if len(dims) > 1:
+            raise EmbeddingShapeError(f"Embedding API returned mixed vector dimensions: {sorted(dims)}")
+        return embeddings
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embedding")
+            return self._executor
+
+    def _post_batch(self, batch: List[str]) -> List[List[float]]:
+        payload = {"model": self.model, "input": batch, **self.extra_payload}
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_retries),
+            wait=wait_exponential(multiplier=self.backoff_seconds, max=30),
+            retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, TransientEmbeddingError)),
+            reraise=True
+        )
+        for attempt in retrying:
+            with attempt:
+                response = self.session.post(self.url, headers=self.headers, json=payload, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise TransientEmbeddingError(f"Embedding API returned {response.status_code}")
+                response.raise_for_status()
+                vectors = self.response_parser(response.json())
+
+        if len(vectors) != len(batch):
+            raise EmbeddingShapeError(f"Embedding API returned {len(vectors)} vectors for {len(batch)} inputs")
+        if self.expected_dim is not None:
+            bad = [len(v) for v in vectors if len(v) != self.expected_dim]
+            if bad:
+                raise EmbeddingShapeError(f"Embedding API returned dimension {bad[0]}, expected {self.expected_dim}")
+        return vectors
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+
+
+_shared_transports: Dict[Tuple, EmbeddingTransport] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_transport(url: str, headers: Dict[str, str], model: str, **kwargs) -> EmbeddingTransport:
+    key = (url, tuple(sorted(headers.items())), model, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+    with _shared_lock:
+        transport = _shared_transports.get(key)
+        if transport is None:
+            transport = EmbeddingTransport(url, headers, model, **kwargs)
+            _shared_transports[key] = transport
+        return transport
+
+
+def close_shared_transports():
+    with _shared_lock:
+        for transport in _shared_transports.values():
+            transport.close()
+        _shared_transports.clear()
@@ -1,12 +1,13 @@
 import os
 import json
-import httpx
-from typing import Any, Sequence, Generator, AsyncGenerator, Dict
+from typing import Any, Sequence, Generator, AsyncGenerator, Dict, Optional
 from dotenv import load_dotenv
 
 from llama_index.core.llms import CustomLLM, CompletionResponse, CompletionResponseGen
 from llama_index.core.llms.callbacks import llm_completion_callback
 from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.bridge.pydantic import PrivateAttr
+from .llm_transport import LLMClients, get_shared_llm_clients
 import asyncio
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')
@@ -17,10 +18,12 @@ class CustomLLMWrapper(CustomLLM):
     temperature: float = 0.1
     max_tokens: int = 4096
     system_message: str = ""
+    _clients: Optional[LLMClients] = PrivateAttr(default=None)
     
     def __init__(self):
         super().__init__()
-        pass
+        # Endpoint and key are resolved here once, not on every completion.
+        self._clients = get_shared_llm_clients(os.getenv('LLM_ENDPOINT'), os.getenv('MODELS_API_KEY'))
 
     @property
     def metadata(self) -> dict:
@@ -30,11 +33,10 @@ class CustomLLMWrapper(CustomLLM):
             "max_tokens": self.max_tokens,
         }
 
-    def _get_headers(self) -> Dict[str, str]:
-        return {
-            "Authorization": f"Bearer {os.getenv('MODELS_API_KEY')}",
-            "Content-Type": "application/json",
-        }
+    @property
+    def clients(self) -> LLMClients:
+        # Process-wide, so every ReceiptPDFProcessor reuses the same pooled connections.
+        return self._clients
 
     def _base_payload(self, prompt: str) -> Dict[str, Any]:
         return {
@@ -50,12 +52,12 @@ class CustomLLMWrapper(CustomLLM):
         with llm_completion_callback():
             payload = self._base_payload(prompt)
             try:
-                with httpx.Client(timeout=60.0) as client:
-                    resp = client.post(os.getenv('LLM_ENDPOINT'), headers=self._get_headers(), json=payload)
-                    resp.raise_for_status()
-                    data = resp.json()
-                    response_text = data["choices"][0]["message"]["content"]
-                    return CompletionResponse(text=response_text)
+                clients = self.clients
+                resp = clients.client.post(clients.endpoint, json=payload)
+                resp.raise_for_status()
+                data = resp.json()
+                response_text = data["choices"][0]["message"]["content"]
+                return CompletionResponse(text=response_text)
             except Exception as e:
                 return CompletionResponse(text=f"Error: {str(e)}")
 
@@ -65,7 +67,8 @@ class CustomLLMWrapper(CustomLLM):
             payload["stream"] = True
 
             def gen() -> Generator[CompletionResponse, None, None]:
-                with httpx.stream("POST", os.getenv('LLM_ENDPOINT'), headers=self._get_headers(), json=payload, timeout=60.0) as resp:
+                clients = self.clients
+                with clients.client.stream("POST", clients.endpoint, json=payload) as resp:
                     resp.raise_for_status()
                     for line in resp.iter_lines():
                         if not line or not line.startswith("data:"):
@@ -90,12 +93,12 @@ class CustomLLMWrapper(CustomLLM):
         try:
             async def _complete():
                 payload = self._base_payload(prompt)
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    resp = await client.post(os.getenv('LLM_ENDPOINT'), headers=self._get_headers(), json=payload)
-                    resp.raise_for_status()
-                    data = resp.json()
-                    response_text = data["choices"][0]["message"]["content"]
-                    return CompletionResponse(text=response_text)
+                clients = self.clients
+                resp = await clients.async_client.post(clients.endpoint, json=payload)
+                resp.raise_for_status()
+                data = resp.json()
+                response_text = data["choices"][0]["message"]["content"]
+                return CompletionResponse(text=response_text)
             
             return await asyncio.wait_for(_complete(), timeout=timeout)
 
@@ -0,0 +1,116 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+import httpx
+from config.settings import AppSettings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx needs it for HTTP/2)
+        return True
+    except ImportError:
+        return False
+
+
+class LLMClients:
+    """Long-lived keep-alive ``httpx`` clients for one LLM endpoint.
+
+    The sync client is shared by all threads. ``httpx.AsyncClient`` is tied
+    to the event loop it first runs on and Streamlit starts a new loop per
+    ``asyncio.run``, so async clients are kept per loop and dropped with it.
+    Connections are pooled with ``limits`` and negotiated as HTTP/2 when
+    ``h2`` is installed.
+    """
+
+    def __init__(self, endpoint: str, headers: Dict[str, str], timeout: float = 60.0, http2: bool = True,
+                 limits: Optional[httpx.Limits] = None):
+        self.endpoint = endpoint
+        self.headers = headers
+        self.timeout = timeout
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("HTTP/2 requested for the LLM client but 'h2' is not installed; using HTTP/1.1 keep-alive")
+        self.limits = limits or httpx.Limits()
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(headers=self.headers, timeout=self.timeout, http2=self.http2, limits=self.limits)
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """The async client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout, http2=self.http2, limits=self.limits)
+                self._async_clients[loop] = client
+            return client
+
+    async def aclose(self):
+        """Close the running loop's async client; call before that loop ends."""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+            async_clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        if client is not None:
+            client.close()
+        for loop, async_client in async_clients:
+            # A loop that is gone or busy cannot run aclose; its sockets go with it.
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(async_client.aclose())
+
+
+_shared_clients: Dict[Tuple, LLMClients] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_llm_clients(endpoint: Optional[str] = None, api_key: Optional[str] = None) -> LLMClients:
+    """Clients shared by every LLM wrapper in the process, keyed by endpoint and key."""
+    endpoint = endpoint or os.getenv('LLM_ENDPOINT')
+    api_key = api_key or os.getenv('MODELS_API_KEY')
+    key = (endpoint, api_key)
+    with _shared_lock:
+        clients = _shared_clients.get(key)
+        if clients is None:
+            if not _shared_clients:
+                atexit.register(close_shared_llm_clients)
+            clients = LLMClients(
+                endpoint,
+                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                timeout=AppSettings.LLM_TIMEOUT_SECONDS,
+                http2=AppSettings.LLM_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=AppSettings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=AppSettings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=AppSettings.LLM_KEEPALIVE_EXPIRY_SECONDS
+                )
+            )
+            _shared_clients[key] = clients
+        return clients
+
+
+def close_shared_llm_clients():
+    with _shared_lock:
+        for clients in _shared_clients.values():
+            clients.close()
+        _shared_clients.clear()
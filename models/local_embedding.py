@@ -0,0 +1,58 @@
+import math
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashedNgramEmbedding(Embeddings):
+    """Offline embedding: character n-grams and word tokens hashed into a fixed
+    number of signed buckets, sublinear TF weighted and L2-normalized.
+
+    Deterministic and dependency-free, so vectors can be cached and indexed
+    exactly like the remote model's.
+    """
+
+    VERSION = "v1"
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (2, 4), max_cached_features: int = 500000):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.model = f"local-hashed-ngram-{dim}-{ngram_range[0]}{ngram_range[1]}-{self.VERSION}"
+        self.max_cached_features = max_cached_features
+        self._feature_buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        bucket = self._feature_buckets.get(feature)
+        if bucket is None:
+            h = zlib.crc32(feature.encode('utf-8'))
+            bucket = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            if len(self._feature_buckets) < self.max_cached_features:
+                self._feature_buckets[feature] = bucket
+        return bucket
+
+    def _features(self, text: str) -> Counter:
+        text = " ".join(text.lower().split())
+        features = Counter(f"w:{token}" for token in text.split())
+        padded = f" {text} "
+        lo, hi = self.ngram_range
+        for n in range(lo, hi + 1):
+            features.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text or "").items():
+                index, sign = self._bucket(feature)
+                vectors[row, index] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
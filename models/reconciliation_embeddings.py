@@ -1,21 +1,84 @@
 import os
 import re
-from typing import List
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
 from .embedding import CustomEmbedding
+from .embedding_cache import get_embedding_cache
+from .local_embedding import HashedNgramEmbedding
+from .embedding_transport import EmbeddingShapeError, get_shared_transport
+from config.settings import AppSettings
+from utils.helpers import GeneralHelpers
+
+logger = logging.getLogger(__name__)
+
+def parse_data_response(data: Any) -> List[List[float]]:
+    if not (isinstance(data, dict) and isinstance(data.get('data'), list)):
+        raise EmbeddingShapeError(f"Unexpected embedding API response format: {str(data)[:200]}")
+    items = sorted(data['data'], key=lambda item: item.get('index', 0))
+    return [item['embedding'] for item in items]
 
 class ReconciliationEmbeddings(CustomEmbedding):    
-    def __init__(self):
+    BACKENDS = ('remote', 'local')
+
+    def __init__(self, backend: Optional[str] = None):
         super().__init__(
             api_url=os.getenv("EMBEDDING_API_URL"),
             api_key=os.getenv("MODELS_API_KEY"),
             model="usf1-embed"
         )
-        self.embed_batch_size = 16
+        self.backend = backend or AppSettings.EMBEDDING_BACKEND
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{self.backend}', expected one of {self.BACKENDS}")
         self.max_text_length = 500 
+        
+        self.local_model = None
+        if self.backend == 'local':
+            self.local_model = HashedNgramEmbedding(dim=AppSettings.LOCAL_EMBEDDING_DIM)
+            self.model = self.local_model.model
+            self.embedding_dim = self.local_model.dim
+        
+        # Local vectors are cheaper to recompute than to read back from disk.
+        use_cache = AppSettings.ENABLE_EMBEDDING_CACHE and self.local_model is None
+        self.cache = get_embedding_cache(AppSettings.EMBEDDING_CACHE_DIR, self.model) if use_cache else None
     
-    def embed_transactions(self, transactions: List[str]) -> List[List[float]]:
+    @staticmethod
+    def receipt_text(receipt: Dict) -> str:
+        vendor = receipt.get('vendor_name', receipt.get('vendor', ''))
+        return f"{vendor or ''} {ReconciliationEmbeddings._amount_text(receipt.get('amount'))}"
+    
+    @staticmethod
+    def bank_text(bank_transaction: Dict) -> str:
+        return f"{bank_transaction.get('description', '') or ''} {ReconciliationEmbeddings._amount_text(bank_transaction.get('amount'))}"
+    
+    @staticmethod
+    def _amount_text(amount) -> str:
+        value = GeneralHelpers.parse_amount(amount)
+        return f"{value:.2f}" if value is not None else ''
+    
+    def embed_transactions(self, transactions: List[str]) -> np.ndarray:
         processed = [self._preprocess_transaction(tx) for tx in transactions]
-        return self._embed(processed)
+        unique_texts = list(dict.fromkeys(processed))
+        
+        if self.cache is None:
+            vectors = dict(zip(unique_texts, np.asarray(self._embed(unique_texts), dtype=np.float32))) if unique_texts else {}
+        else:
+            keys = {text: self.cache.key(text) for text in unique_texts}
+            cached = self.cache.get_many(list(keys.values()))
+            missing = [text for text in unique_texts if keys[text] not in cached]
+            if missing:
+                fresh = np.asarray(self._embed(missing), dtype=np.float32)
+                self.cache.put_many([keys[text] for text in missing], fresh)
+                cached.update((keys[text], vector) for text, vector in zip(missing, fresh))
+            vectors = {text: cached[keys[text]] for text in unique_texts}
+            logger.info(f"Embedding cache: {len(unique_texts) - len(missing)}/{len(unique_texts)} unique texts served from cache ({len(processed)} requested)")
+        
+        if not processed:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[text] for text in processed])
+    
+    def cache_stats(self) -> Dict[str, float]:
+        return self.cache.stats() if self.cache else {}
     
     def _preprocess_transaction(self, transaction_text: str) -> str:
         text = re.sub(r'[^\w\s.-]', ' ', transaction_text.lower())
@@ -23,22 +86,19 @@ class ReconciliationEmbeddings(CustomEmbedding):
         return text[:self.max_text_length]
 
     def _embed(self, texts: List[str]) -> List[List[float]]:
-        import requests
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model,
-            "input": texts,
-            "encoding_format": "float"
-        }
-        
-        response = requests.post(f"{self.api_url}/embeddings",headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            return [item['embedding'] for item in response.json()["data"]]
-        else:
-            return [[0.1] * 128 for _ in texts]
\ No newline at end of file
+        if self.local_model is not None:
+            return self.local_model.embed_array(texts)
+        if not self.api_url:
+            raise ValueError("EMBEDDING_API_URL must be set to compute reconciliation embeddings")
+        transport = get_shared_transport(
+            f"{self.api_url}/embeddings",
+            {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            self.model,
+            response_parser=parse_data_response,
+            batch_size=self.embed_batch_size,
+            max_concurrency=AppSettings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=AppSettings.EMBEDDING_MAX_RETRIES,
+            expected_dim=self.embedding_dim,
+            extra_payload={"encoding_format": "float"}
+        )
+        return transport.embed(texts)
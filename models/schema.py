@@ -1,6 +1,8 @@
-from mongoengine import Document, StringField, DecimalField, DateTimeField, ListField, EmbeddedDocument, ReferenceField, DictField
+from mongoengine import Document, StringField, DecimalField, DateTimeField, ListField, EmbeddedDocument, ReferenceField, DictField, BooleanField, IntField, BinaryField, FloatField
 from datetime import datetime
 
+RECONCILIATION_STATUSES = ['unmatched', 'matched', 'suggested']
+
 class ReceiptTransaction(Document):
     transaction_id = StringField(unique=True, required=True)
     transaction_date = DateTimeField(required=True)
@@ -16,6 +18,10 @@ class ReceiptTransaction(Document):
     extraction_confidence = DecimalField(min_value=0, max_value=1, precision=2)
     extracted_data = DictField()
     processing_status = StringField(choices=['pending', 'processed', 'error'], default='pending')
+    reconciliation_status = StringField(choices=RECONCILIATION_STATUSES, default='unmatched')
+    match_claim = StringField()  # Set while a match for the transaction is being written
+    embedding = BinaryField()  # Encoded with models.embedding_codec
+    embedding_model = StringField(max_length=100)
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
@@ -27,7 +33,9 @@ class ReceiptTransaction(Document):
             'amount',
             'category',
             ('vendor_name', 'transaction_date'),
-            ('amount', 'transaction_date')
+            ('amount', 'transaction_date'),
+            ('reconciliation_status', 'updated_at'),
+            {'fields': ['match_claim'], 'sparse': True}
         ]
     }
 
@@ -41,7 +49,12 @@ class BankTransaction(Document):
     reference_number = StringField(max_length=100)
     balance_after = DecimalField(precision=2)
     upload_batch_id = StringField(required=True)
+    reconciliation_status = StringField(choices=RECONCILIATION_STATUSES, default='unmatched')
+    match_claim = StringField()  # Set while a match for the transaction is being written
+    embedding = BinaryField()  # Encoded with models.embedding_codec
+    embedding_model = StringField(max_length=100)
     uploaded_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
     
     meta = {
         'collection': 'bank_transactions',
@@ -51,7 +64,9 @@ class BankTransaction(Document):
             'account_number',
             'upload_batch_id',
             ('amount', 'transaction_date'),
-            ('description', 'transaction_date')
+            ('description', 'transaction_date'),
+            ('reconciliation_status', 'updated_at'),
+            {'fields': ['match_claim'], 'sparse': True}
         ]
     }
 
@@ -66,6 +81,10 @@ class ReconciliationMatch(Document):
     created_at = DateTimeField(default=datetime.utcnow)
     confirmed_by = StringField()  # User confirmation
     confirmed_at = DateTimeField()
+    run_id = StringField()  # ReconciliationRun that produced the match
+    group_id = StringField()  # Shared by every pair of a split-payment match
+    suggestion_direction = StringField(choices=['receipt', 'bank'])  # Which side the suggestion was made for
+    suggestion_rank = IntField()  # 1 = best candidate for that transaction
     
     meta = {
         'collection': 'reconciliation_matches',
@@ -73,7 +92,29 @@ class ReconciliationMatch(Document):
             'match_confidence',
             'match_type',
             'status',
-            'created_at'
+            'created_at',
+            'run_id',
+            'group_id',
+            ('match_type', 'suggestion_direction', 'ledger_transaction', 'suggestion_rank'),
+            ('match_type', 'suggestion_direction', 'bank_transaction', 'suggestion_rank')
+        ]
+    }
+
+class ReconciliationRun(Document):
+    run_id = StringField(unique=True, required=True)
+    started_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField()
+    watermark = DateTimeField(required=True)  # Transactions updated after this are picked up by the next run
+    is_full_run = BooleanField(default=False)
+    receipts_considered = IntField(default=0)
+    bank_transactions_considered = IntField(default=0)
+    matches_created = IntField(default=0)
+    status = StringField(choices=['running', 'completed', 'failed'], default='running')
+    
+    meta = {
+        'collection': 'reconciliation_runs',
+        'indexes': [
+            ('status', 'watermark')
         ]
     }
 
@@ -86,4 +127,60 @@ class ProcessedEmail(Document):
         'indexes': [
             'message_id'
         ]
-    }
\ No newline at end of file
+    }
+
+class VendorAlias(Document):
+    alias = StringField(unique=True, required=True, max_length=200)  # Upper-cased, whitespace-collapsed
+    vendor_id = IntField(required=True)
+    vendor_name = StringField(required=True, max_length=200)  # Canonical name of vendor_id
+    whole_text = BooleanField(default=False)  # Only matches when it is the entire vendor name
+    source = StringField(choices=['seed', 'confirmed', 'manual'], default='manual')
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'vendor_aliases',
+        'indexes': [
+            'vendor_id'
+        ]
+    }
+
+class ReconciliationSummary(Document):
+    # One document, kept current on ingestion and matching so the dashboard reads counts without scanning.
+    summary_id = StringField(unique=True, required=True, default='global')
+    receipts = IntField(default=0)
+    bank_transactions = IntField(default=0)
+    matched_receipts = IntField(default=0)
+    matched_bank_transactions = IntField(default=0)
+    receipt_amount = FloatField(default=0)
+    matched_receipt_amount = FloatField(default=0)
+    bank_debits = FloatField(default=0)  # Absolute amounts
+    bank_credits = FloatField(default=0)
+    last_run_id = StringField()
+    last_run_at = DateTimeField()
+    last_run_matches = IntField(default=0)
+    last_ingested_at = DateTimeField()
+    refreshed_at = DateTimeField()  # Last full recount; increments are applied in between
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'reconciliation_summary'
+    }
+
+class ExtractionCacheEntry(Document):
+    key = StringField(unique=True, required=True)  # sha256 of layer, extraction version and content
+    layer = StringField(choices=['file', 'text'], required=True)
+    extraction_version = StringField(required=True)
+    result = StringField(required=True)  # ReceiptData JSON
+    confidence = FloatField(default=0)
+    hits = IntField(default=0)
+    created_at = DateTimeField(default=datetime.utcnow)
+    last_used_at = DateTimeField(default=datetime.utcnow)
+    expires_at = DateTimeField(required=True)  # Pushed back on every hit; MongoDB's TTL monitor drops expired entries
+
+    meta = {
+        'collection': 'extraction_cache',
+        'indexes': [
+            'last_used_at',
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
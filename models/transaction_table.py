@@ -0,0 +1,151 @@
+import array
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from bson import ObjectId
+from utils.helpers import GeneralHelpers
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Sentinels for values that were missing or unparseable in the source document.
+MISSING_CENTS = np.iinfo(np.int64).min
+MISSING_DAYS = np.iinfo(np.int32).min
+
+
+class InternTable:
+    """Maps strings to dense integer ids, storing each distinct string once."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: str) -> int:
+        index = self.ids.get(value)
+        if index is None:
+            index = len(self.values)
+            self.ids[value] = index
+            self.values.append(value)
+        return index
+
+    def __getitem__(self, index: int) -> str:
+        return self.values[index]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class TransactionTable:
+    """Column-oriented, typed view of receipt or bank transactions.
+
+    Each column is one numpy array: ``amount_cents`` (int64), ``date_days``
+    (int32 days since 1970-01-01), ``updated_at`` (datetime64[ms]) and
+    ``text_ids`` (int32) into ``texts``, the distinct upper-cased vendor names
+    or descriptions. ``text_tokens[text_id]`` holds that text's whitespace
+    tokens as ids into ``tokens``, which can be shared between tables.
+    """
+
+    TEXT_FIELDS = {'receipt': 'vendor_name', 'bank': 'description'}
+
+    def __init__(self, kind: str, object_ids: np.ndarray, transaction_ids: np.ndarray, amount_cents: np.ndarray,
+                 date_days: np.ndarray, updated_at: np.ndarray, text_ids: np.ndarray,
+                 texts: InternTable, tokens: InternTable, text_tokens: List[np.ndarray]):
+        if kind not in self.TEXT_FIELDS:
+            raise ValueError(f"Unknown transaction table kind '{kind}', expected one of {list(self.TEXT_FIELDS)}")
+        self.kind = kind
+        self.text_field = self.TEXT_FIELDS[kind]
+        self.object_ids = object_ids
+        self.transaction_ids = transaction_ids
+        self.amount_cents = amount_cents
+        self.date_days = date_days
+        self.updated_at = updated_at
+        self.text_ids = text_ids
+        self.texts = texts
+        self.tokens = tokens
+        self.text_tokens = text_tokens
+
+    @classmethod
+    def projection(cls, kind: str) -> Dict[str, int]:
+        return {'_id': 1, 'transaction_id': 1, 'amount': 1, 'transaction_date': 1, 'updated_at': 1, cls.TEXT_FIELDS[kind]: 1}
+
+    @classmethod
+    def from_documents(cls, kind: str, documents: Iterable[Dict], tokens: Optional[InternTable] = None) -> "TransactionTable":
+        """Build from raw pymongo documents (see ``projection``) without keeping them."""
+        text_field = cls.TEXT_FIELDS[kind]
+        texts = InternTable()
+        tokens = tokens if tokens is not None else InternTable()
+        text_tokens: List[np.ndarray] = []
+
+        object_ids = bytearray()
+        transaction_ids: List[bytes] = []
+        amount_cents = array.array('q')
+        date_days = array.array('i')
+        updated_at = array.array('q')
+        text_ids = array.array('i')
+        not_a_time = np.datetime64('NaT', 'ms').astype(np.int64)
+
+        for doc in documents:
+            object_ids += doc['_id'].binary if isinstance(doc.get('_id'), ObjectId) else bytes(12)
+            transaction_ids.append(str(doc.get('transaction_id', '')).encode('utf-8'))
+
+            amount = GeneralHelpers.parse_amount(doc.get('amount', 0))
+            amount_cents.append(MISSING_CENTS if amount is None or amount != amount else int(round(amount * 100)))
+
+            txn_date = GeneralHelpers.parse_date(doc.get('transaction_date'))
+            date_days.append(MISSING_DAYS if txn_date is None else txn_date.date().toordinal() - EPOCH_ORDINAL)
+
+            changed = doc.get('updated_at')
+            updated_at.append(np.datetime64(changed, 'ms').astype(np.int64) if isinstance(changed, datetime) else not_a_time)
+
+            text = str(doc.get(text_field, '')).upper()
+            text_id = texts.intern(text)
+            if text_id == len(text_tokens):
+                text_tokens.append(np.array([tokens.intern(t) for t in text.split()], dtype=np.int32))
+            text_ids.append(text_id)
+
+        return cls(
+            kind,
+            np.frombuffer(bytes(object_ids), dtype='S12').copy(),
+            np.array(transaction_ids, dtype='S') if transaction_ids else np.zeros(0, dtype='S1'),
+            np.frombuffer(amount_cents, dtype=np.int64).copy(),
+            np.frombuffer(date_days, dtype=np.int32).copy(),
+            np.frombuffer(updated_at, dtype=np.int64).astype('datetime64[ms]'),
+            np.frombuffer(text_ids, dtype=np.int32).copy(),
+            texts, tokens, text_tokens
+        )
+
+    def __len__(self) -> int:
+        return len(self.amount_cents)
+
+    def take(self, rows: Sequence[int]) -> "TransactionTable":
+        """Row subset sharing this table's text and token vocabularies."""
+        rows = np.asarray(rows, dtype=np.intp)
+        return TransactionTable(
+            self.kind, self.object_ids[rows], self.transaction_ids[rows], self.amount_cents[rows],
+            self.date_days[rows], self.updated_at[rows], self.text_ids[rows],
+            self.texts, self.tokens, self.text_tokens
+        )
+
+    def changed_since(self, watermark: datetime) -> np.ndarray:
+        return self.updated_at > np.datetime64(watermark, 'ms')
+
+    def transaction_id(self, row: int) -> str:
+        return self.transaction_ids[row].decode('utf-8')
+
+    def row(self, row: int) -> Dict[str, Any]:
+        """Minimal dict view of one row, enough to persist or score it."""
+        cents = int(self.amount_cents[row])
+        days = int(self.date_days[row])
+        return {
+            # numpy drops trailing NUL bytes from 'S' items, so pad back to 12.
+            '_id': ObjectId(self.object_ids[row].ljust(12, b'\0')),
+            'transaction_id': self.transaction_id(row),
+            'amount': None if cents == MISSING_CENTS else cents / 100,
+            'transaction_date': None if days == MISSING_DAYS else datetime.fromordinal(days + EPOCH_ORDINAL),
+            self.text_field: self.texts[int(self.text_ids[row])],
+        }
+
+    def rows(self, rows: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.row(int(r)) for r in rows]
+
+    def nbytes(self) -> int:
+        columns = (self.object_ids, self.transaction_ids, self.amount_cents, self.date_days, self.updated_at, self.text_ids)
+        return sum(column.nbytes for column in columns)
@@ -1,11 +1,14 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional, Union
 from datetime import date, datetime
 import re
 
 class ReceiptData(BaseModel):
-    receipt_date: Optional[Union[str, date, datetime]] = None
+    model_config = ConfigDict(populate_by_name=True)
+
+    receipt_date: Optional[Union[str, date, datetime]] = Field(None, alias='date')  # The extraction prompt asks for "date"
     vendor: Optional[str] = None
+    vendor_id: Optional[int] = None  # Canonical id from services.vendor_registry
     amount: Optional[float] = Field(None, alias='amount')
     tax: Optional[float] = None
     category: Optional[str] = None
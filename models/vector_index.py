@@ -0,0 +1,205 @@
+from typing import Optional, Tuple
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2:
+        raise ValueError(f"Expected a 2-D array of embeddings, got shape {vectors.shape}")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _merge_top_k(scores: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        indices = np.take_along_axis(indices, part, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+class VectorIndex:
+    """Cosine-similarity top-k index over L2-normalized float32 vectors.
+
+    ``search`` returns ``(scores, indices)`` arrays of shape ``(n_queries, k)``
+    sorted best-first; slots with no neighbour above ``threshold`` hold
+    index ``-1`` and score ``-inf``.
+    """
+
+    kind = "base"
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.fingerprint: str = ""
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def build(self, vectors, fingerprint: str = "") -> "VectorIndex":
+        self.vectors = normalize_rows(vectors)
+        self.fingerprint = fingerprint
+        return self
+
+    def search(self, queries, k: int = 1, threshold: Optional[float] = None, query_block_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(queries)
+        k = max(1, min(k, len(self)))
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(self) == 0:
+            return all_scores, all_indices
+
+        for start in range(0, len(queries), query_block_size):
+            block = queries[start:start + query_block_size]
+            scores, indices = self._search_block(block, k)
+            all_scores[start:start + len(block), :scores.shape[1]] = scores
+            all_indices[start:start + len(block), :indices.shape[1]] = indices
+
+        # float32 round-off can push self-similarity just past 1.0
+        np.minimum(all_scores, 1.0, out=all_scores)
+        if threshold is not None:
+            below = ~(all_scores > threshold)
+            all_scores[below] = -np.inf
+            all_indices[below] = -1
+        return all_scores, all_indices
+
+    def _search_block(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def _state(self) -> dict:
+        return {}
+
+    def _load_state(self, state) -> None:
+        pass
+
+    def save(self, path: str) -> None:
+        np.savez(path, kind=self.kind, vectors=self.vectors, fingerprint=self.fingerprint, **self._state())
+
+    @staticmethod
+    def load(path: str) -> "VectorIndex":
+        with np.load(path, allow_pickle=False) as state:
+            index = create_vector_index(str(state['kind']))
+            index.vectors = state['vectors']
+            index.fingerprint = str(state['fingerprint'])
+            index._load_state(state)
+        return index
+
+
+class ExactVectorIndex(VectorIndex):
+    """Blocked brute-force search; memory is bounded by query_block_size x vector_block_size."""
+
+    kind = "exact"
+
+    def __init__(self, vector_block_size: int = 65536):
+        super().__init__()
+        self.vector_block_size = vector_block_size
+
+    def _search_block(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for start in range(0, len(self.vectors), self.vector_block_size):
+            scores = queries @ self.vectors[start:start + self.vector_block_size].T
+            indices = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_scores, best_indices = _merge_top_k(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_indices, indices], axis=1),
+                k
+            )
+        return best_scores, best_indices
+
+
+class IVFVectorIndex(VectorIndex):
+    """Inverted-file index: spherical k-means coarse quantizer, exact scoring
+    inside the ``n_probe`` closest lists only."""
+
+    kind = "ivf"
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, train_iterations: int = 10,
+                 max_train_samples: int = 50000, seed: int = 0):
+        super().__init__()
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.max_train_samples = max_train_samples
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.list_members: Optional[np.ndarray] = None
+
+    def build(self, vectors, fingerprint: str = "") -> "IVFVectorIndex":
+        super().build(vectors, fingerprint)
+        n = len(self.vectors)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, max(n, 1))
+        rng = np.random.default_rng(self.seed)
+
+        sample = self.vectors
+        if n > self.max_train_samples:
+            sample = self.vectors[rng.choice(n, self.max_train_samples, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)] if n else np.zeros((0, self.vectors.shape[1]), np.float32)
+        for _ in range(self.train_iterations if n else 0):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        self.centroids = centroids
+
+        assignment = self._assign(self.vectors) if n else np.zeros(0, dtype=np.int64)
+        self.list_members = np.argsort(assignment, kind='stable').astype(np.int64)
+        self.list_offsets = np.searchsorted(assignment[self.list_members], np.arange(n_lists + 1)).astype(np.int64)
+        return self
+
+    def _assign(self, vectors: np.ndarray, block_size: int = 4096) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[i:i + block_size] @ self.centroids.T, axis=1)
+            for i in range(0, len(vectors), block_size)
+        ])
+
+    def _search_block(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        for list_id in np.unique(probes):
+            members = self.list_members[self.list_offsets[list_id]:self.list_offsets[list_id + 1]]
+            if len(members) == 0:
+                continue
+            rows = np.flatnonzero((probes == list_id).any(axis=1))
+            scores = queries[rows] @ self.vectors[members].T
+            merged_scores = np.concatenate([best_scores[rows], scores], axis=1)
+            merged_indices = np.concatenate([best_indices[rows], np.broadcast_to(members, scores.shape)], axis=1)
+            best_scores[rows], best_indices[rows] = _merge_top_k(merged_scores, merged_indices, k)
+        return best_scores, best_indices
+
+    def _state(self) -> dict:
+        return {
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'list_members': self.list_members,
+            'n_probe': self.n_probe,
+        }
+
+    def _load_state(self, state) -> None:
+        self.centroids = state['centroids']
+        self.list_offsets = state['list_offsets']
+        self.list_members = state['list_members']
+        self.n_probe = int(state['n_probe'])
+
+
+VECTOR_INDEX_TYPES = {
+    ExactVectorIndex.kind: ExactVectorIndex,
+    IVFVectorIndex.kind: IVFVectorIndex,
+}
+
+
+def create_vector_index(kind: str, **kwargs) -> VectorIndex:
+    if kind not in VECTOR_INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type '{kind}', expected one of {list(VECTOR_INDEX_TYPES)}")
+    return VECTOR_INDEX_TYPES[kind](**kwargs)
@@ -0,0 +1,100 @@
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (row, col, weight); rows and cols are dense ids starting at 0
+Edge = Tuple[int, int, float]
+
+
+class _DisjointSet:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, node: int) -> int:
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+def connected_components(edges: Sequence[Edge], n_rows: int) -> List[List[Edge]]:
+    """Group edges by connected component of the bipartite candidate graph."""
+    n_cols = max((col for _, col, _ in edges), default=-1) + 1
+    nodes = _DisjointSet(n_rows + n_cols)
+    for row, col, _ in edges:
+        nodes.union(row, n_rows + col)
+
+    components: Dict[int, List[Edge]] = {}
+    for edge in edges:
+        components.setdefault(nodes.find(edge[0]), []).append(edge)
+    return list(components.values())
+
+
+def greedy_assignment(edges: Sequence[Edge]) -> List[Edge]:
+    """Heaviest edge first; ties go to the lower (row, col)."""
+    taken_rows, taken_cols = set(), set()
+    chosen = []
+    for row, col, weight in sorted(edges, key=lambda e: (-e[2], e[0], e[1])):
+        if row in taken_rows or col in taken_cols:
+            continue
+        chosen.append((row, col, weight))
+        taken_rows.add(row)
+        taken_cols.add(col)
+    return chosen
+
+
+def optimal_assignment(edges: Sequence[Edge], n_rows: int, max_component_cells: int = 4_000_000) -> Tuple[List[Edge], Dict[str, int]]:
+    """Maximum-total-weight bipartite matching over a sparse edge list.
+
+    Each connected component is solved independently with the Hungarian
+    method on a dense matrix of just its own rows and columns, so cost
+    follows the candidate edges rather than rows x cols. Components larger
+    than ``max_component_cells`` fall back to greedy.
+    """
+    stats = {"components": 0, "solved_optimal": 0, "solved_greedy": 0, "largest_component": 0}
+    chosen: List[Edge] = []
+
+    for component in connected_components(edges, n_rows):
+        stats["components"] += 1
+        if len(component) == 1:
+            chosen.append(component[0])
+            continue
+
+        rows = sorted({row for row, _, _ in component})
+        cols = sorted({col for _, col, _ in component})
+        cells = len(rows) * len(cols)
+        stats["largest_component"] = max(stats["largest_component"], cells)
+        if cells > max_component_cells:
+            logger.warning(f"Assignment component of {len(rows)}x{len(cols)} exceeds {max_component_cells} cells, using greedy")
+            chosen.extend(greedy_assignment(component))
+            stats["solved_greedy"] += 1
+            continue
+
+        row_offsets = {row: i for i, row in enumerate(rows)}
+        col_offsets = {col: j for j, col in enumerate(cols)}
+        # Weights are positive, so a missing edge scored 0 is never preferred
+        # over a real one and is dropped from the result below.
+        weights = np.zeros((len(rows), len(cols)), dtype=np.float64)
+        present = np.zeros((len(rows), len(cols)), dtype=bool)
+        for row, col, weight in component:
+            weights[row_offsets[row], col_offsets[col]] = weight
+            present[row_offsets[row], col_offsets[col]] = True
+
+        row_ind, col_ind = linear_sum_assignment(weights, maximize=True)
+        for i, j in zip(row_ind, col_ind):
+            if present[i, j]:
+                chosen.append((rows[i], cols[j], float(weights[i, j])))
+        stats["solved_optimal"] += 1
+
+    chosen.sort()
+    return chosen, stats
@@ -0,0 +1,105 @@
+import bisect
+import math
+from typing import Dict, Hashable, List, Sequence, Tuple
+from utils.helpers import GeneralHelpers
+
+
+class AmountCandidateIndex:
+    """Sorted index of transactions by absolute amount.
+
+    Returns the positions of every transaction whose amount can fall inside the
+    reconciliation tolerance window of a receipt amount, so scoring only visits
+    pairs that can pass ``_amounts_compatible``.
+    """
+
+    # Widens the bisect window so float rounding never drops a boundary pair;
+    # callers still apply the exact compatibility check.
+    WINDOW_EPSILON = 1e-6
+
+    def __init__(self, transactions: Sequence[Dict], amount_tolerance_percent: float = 0.1, min_variance: float = 1.0):
+        self.amount_tolerance_percent = amount_tolerance_percent
+        self.min_variance = min_variance
+
+        keyed = []
+        for position, txn in enumerate(transactions):
+            amount = GeneralHelpers.parse_amount(txn.get('amount', 0))
+            if amount is None or math.isnan(amount):
+                continue
+            keyed.append((abs(amount), position))
+        keyed.sort()
+
+        self._amounts = [amount for amount, _ in keyed]
+        self._positions = [position for _, position in keyed]
+
+    def __len__(self) -> int:
+        return len(self._amounts)
+
+    def candidates(self, receipt_amount) -> List[int]:
+        amount = GeneralHelpers.parse_amount(receipt_amount)
+        if not amount or math.isnan(amount):
+            return []
+
+        receipt_abs = abs(amount)
+        variance = max(receipt_abs * self.amount_tolerance_percent, self.min_variance) + self.WINDOW_EPSILON
+        lo = bisect.bisect_left(self._amounts, receipt_abs - variance)
+        hi = bisect.bisect_right(self._amounts, receipt_abs + variance)
+
+        # Input order matters to the greedy matcher's tie-breaking.
+        return sorted(self._positions[lo:hi])
+
+
+class DynamicAmountIndex:
+    """``AmountCandidateIndex`` over a changing set of keyed transactions.
+
+    Open items come and go while an online matcher runs, so entries are
+    inserted and removed in place (bisect on a sorted list) instead of being
+    rebuilt. ``candidates`` returns keys in insertion order, which stands in
+    for input order in tie-breaking.
+    """
+
+    WINDOW_EPSILON = AmountCandidateIndex.WINDOW_EPSILON
+
+    def __init__(self, amount_tolerance_percent: float = 0.1, min_variance: float = 1.0):
+        self.amount_tolerance_percent = amount_tolerance_percent
+        self.min_variance = min_variance
+        self._entries: List[Tuple[float, int]] = []  # (abs amount, insertion seq), sorted
+        self._entry_by_key: Dict[Hashable, Tuple[float, int]] = {}
+        self._key_by_seq: Dict[int, Hashable] = {}
+        self._next_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entry_by_key
+
+    def add(self, key: Hashable, amount) -> bool:
+        """Index ``key`` under ``amount``; returns False if the amount is unusable."""
+        amount = GeneralHelpers.parse_amount(amount)
+        if amount is None or math.isnan(amount):
+            return False
+        self.discard(key)
+        entry = (abs(amount), self._next_seq)
+        self._next_seq += 1
+        bisect.insort(self._entries, entry)
+        self._entry_by_key[key] = entry
+        self._key_by_seq[entry[1]] = key
+        return True
+
+    def discard(self, key: Hashable):
+        entry = self._entry_by_key.pop(key, None)
+        if entry is None:
+            return
+        del self._entries[bisect.bisect_left(self._entries, entry)]
+        del self._key_by_seq[entry[1]]
+
+    def candidates(self, amount) -> List[Hashable]:
+        amount = GeneralHelpers.parse_amount(amount)
+        if not amount or math.isnan(amount):
+            return []
+
+        target = abs(amount)
+        variance = max(target * self.amount_tolerance_percent, self.min_variance) + self.WINDOW_EPSILON
+        lo = bisect.bisect_left(self._entries, (target - variance, -1))
+        hi = bisect.bisect_right(self._entries, (target + variance, self._next_seq))
+        return [self._key_by_seq[seq] for seq in sorted(seq for _, seq in self._entries[lo:hi])]
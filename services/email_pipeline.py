@@ -1,5 +1,5 @@
 import asyncio
-from typing import List, Dict, Any
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from .email_service import EmailServiceManager
 from .pdf_processor import ReceiptPDFProcessor
 from database.operations import add_receipt_transaction, add_processed_email, is_email_processed
@@ -7,7 +7,6 @@ from utils.helpers import GeneralHelpers
 from config.settings import AppSettings
 import os
 from datetime import datetime 
-from asyncio_throttle import Throttler
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,6 +19,7 @@ class EmailProcessingPipeline:
         self.email_address = email_address
         self.password = password
         self.download_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'receipts')
+        self._downloaded = set()
         
         os.makedirs(self.download_path, exist_ok=True)
 
@@ -41,23 +41,40 @@ class EmailProcessingPipeline:
                 logger.info("No emails with PDF attachments found.")
                 return processed_receipts
 
-            throttler = Throttler(AppSettings.MAX_EMAILS_PER_BATCH, 60.0)
-
+            # Every pending email's attachments go to disk first and are then
+            # extracted as one batch, so MAX_CONCURRENT_PROCESSING (and packing)
+            # spans the whole batch rather than one email's attachments.
+            attachments = {}
+            remaining = {}
             for email in emails:
+                email_id = email.get("id")
                 try:
-                    email_id = email.get("id")
-                    if not is_email_processed(email_id):
-                        async with throttler:
-                            result = await self.process_single_email(email)
-                            if result:
-                                processed_receipts.append(result)
-                            add_processed_email(email_id)
-                    else:
+                    if is_email_processed(email_id):
                         logger.info(f"Skipping already processed email with ID: {email_id}")
+                        continue
+                    saved = self.download_attachments(email)
+                    if not saved:
+                        add_processed_email(email_id)
+                        continue
+                    for filepath, filename in saved.items():
+                        attachments[filepath] = (email_id, filename)
+                    remaining[email_id] = len(saved)
                 except Exception as e:
                     logger.error(f"Error processing email {email.get('id', 'unknown')}: {e}")
                     continue
 
+            stored = {}
+            async for filepath, extracted_data in self.extract_receipts(attachments):
+                email_id, filename = attachments[filepath]
+                receipt_data = self.store_receipt(filepath, filename, extracted_data)
+                if receipt_data:
+                    stored[email_id] = receipt_data
+                remaining[email_id] -= 1
+                if remaining[email_id] == 0:
+                    if email_id in stored:
+                        processed_receipts.append(stored.pop(email_id))
+                    add_processed_email(email_id)
+
         except Exception as e:
             logger.error(f"Error in email processing pipeline: {e}")
         finally:
@@ -65,57 +82,89 @@ class EmailProcessingPipeline:
                 await self.email_service.disconnect()
             except Exception as e:
                 logger.warning(f"Error during disconnect: {e}")
+            # The async LLM client belongs to this event loop, which ends with the run.
+            await self.pdf_processor.llm.clients.aclose()
         
         logger.info(f"Pipeline completed. Processed {len(processed_receipts)} receipts.")
+        cache_stats = self.pdf_processor.cache_stats()
+        if cache_stats:
+            logger.info(f"Extraction cache: {cache_stats['file_hits']} file hits, {cache_stats['text_hits']} text hits, "
+                        f"{cache_stats['misses']} misses (hit rate {cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries")
+        parse_stats = self.pdf_processor.response_parser.stats
+        logger.info(f"LLM responses: {parse_stats['fast']} parsed, {parse_stats['repaired']} repaired, "
+                    f"{parse_stats['failed'] + parse_stats['invalid']} fell back to text heuristics")
         return processed_receipts
 
     async def process_single_email(self, email: Dict[str, Any]) -> Dict[str, Any]:
         receipt_data = {}
-        
+        attachments = self.download_attachments(email)
+        async for filepath, extracted_data in self.extract_receipts(attachments):
+            receipt_data = self.store_receipt(filepath, attachments[filepath], extracted_data) or receipt_data
+        return receipt_data
+
+    def download_attachments(self, email: Dict[str, Any]) -> Dict[str, str]:
+        """Write an email's attachments to the download folder; returns {filepath: filename}."""
+        filenames = {}
         for attachment in email.get("attachments", []):
             try:
                 filename = GeneralHelpers.safe_filename(attachment["filename"])
                 filepath = os.path.join(self.download_path, filename)
-                
+                if filepath in self._downloaded:
+                    # Same name within the same second; every attachment of the batch is on disk before extraction starts.
+                    filename = f"{filename}_{len(self._downloaded)}"
+                    filepath = os.path.join(self.download_path, filename)
+
                 with open(filepath, "wb") as f:
                     f.write(attachment["data"])
                 logger.info(f"Downloaded attachment: {filename}")
-                
-                extracted_data = self.pdf_processor.process_receipt(filepath)
-                
-                if "error" not in extracted_data:
-                    transaction_id = GeneralHelpers.generate_unique_id("receipt")
-                    receipt_data = {
-                        "transaction_id": transaction_id,
-                        "transaction_date": extracted_data.get("date"),
-                        "vendor_name": extracted_data.get("vendor"),
-                        "amount": extracted_data.get("amount"),
-                        "tax_amount": extracted_data.get("tax"),
-                        "category": extracted_data.get("category"),
-                        "description": " ".join(extracted_data.get("items", [])),
-                        "receipt_filename": filename,
-                        "receipt_path": filepath,
-                        "extraction_confidence": extracted_data.get("confidence"),
-                        "processing_status": "processed",
-                        "extracted_data": extracted_data
-                    }
-                    
-                    if receipt_data.get("transaction_date"):
-                        if isinstance(receipt_data["transaction_date"], str):
-                            try:
-                                receipt_data["transaction_date"] = datetime.strptime(receipt_data["transaction_date"], "%Y-%m-%d")
-                            except:
-                                receipt_data["transaction_date"] = datetime.now()
-                    else:
-                        receipt_data["transaction_date"] = datetime.now()
-                    
-                    add_receipt_transaction(receipt_data)
-                    logger.info(f"Successfully processed and stored receipt: {filename}")
-                else:
-                    logger.error(f"Failed to process receipt: {filename}. Error: {extracted_data['error']}")
+                filenames[filepath] = filename
+                self._downloaded.add(filepath)
 
             except Exception as e:
                 logger.error(f"Error processing attachment {attachment.get('filename', 'unknown')}: {e}")
                 continue
-        
-        return receipt_data
\ No newline at end of file
+        return filenames
+
+    def extract_receipts(self, filepaths: Iterable[str]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        if AppSettings.ENABLE_PACKED_EXTRACTION:
+            return self.pdf_processor.process_receipts_packed(list(filepaths))
+        return self.pdf_processor.process_receipts(list(filepaths))
+
+    def store_receipt(self, filepath: str, filename: str, extracted_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            if "error" in extracted_data:
+                logger.error(f"Failed to process receipt: {filename}. Error: {extracted_data['error']}")
+                return None
+
+            transaction_id = GeneralHelpers.generate_unique_id("receipt")
+            receipt_data = {
+                "transaction_id": transaction_id,
+                "transaction_date": extracted_data.get("date"),
+                "vendor_name": extracted_data.get("vendor"),
+                "amount": extracted_data.get("amount"),
+                "tax_amount": extracted_data.get("tax"),
+                "category": extracted_data.get("category"),
+                "description": " ".join(extracted_data.get("items", [])),
+                "receipt_filename": filename,
+                "receipt_path": filepath,
+                "extraction_confidence": extracted_data.get("confidence"),
+                "processing_status": "processed",
+                "extracted_data": extracted_data
+            }
+
+            if receipt_data.get("transaction_date"):
+                if isinstance(receipt_data["transaction_date"], str):
+                    try:
+                        receipt_data["transaction_date"] = datetime.strptime(receipt_data["transaction_date"], "%Y-%m-%d")
+                    except:
+                        receipt_data["transaction_date"] = datetime.now()
+            else:
+                receipt_data["transaction_date"] = datetime.now()
+
+            add_receipt_transaction(receipt_data)
+            logger.info(f"Successfully processed and stored receipt: {filename}")
+            return receipt_data
+
+        except Exception as e:
+            logger.error(f"Error processing attachment {filename}: {e}")
+            return None
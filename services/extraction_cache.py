@@ -0,0 +1,110 @@
+import hashlib
+import re
+import threading
+from typing import Dict, Optional, Tuple
+from database.operations import (
+    get_extraction_cache_entry, put_extraction_cache_entries, evict_extraction_cache, count_extraction_cache_entries
+)
+from models.validation_models import ReceiptData
+from config.settings import AppSettings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ExtractionCache:
+    """Validated receipt extractions kept in MongoDB, looked up in two layers.
+
+    The ``file`` layer is keyed by the PDF's SHA-256 and answers before any
+    text is extracted; the ``text`` layer is keyed by the cleaned text with
+    whitespace and case normalized, so the same receipt arriving as a
+    different file still skips the LLM. Both keys include the extraction
+    version, so changing the prompt or model settings starts a fresh cache.
+
+    Entries expire ``ttl_seconds`` after their last use (a MongoDB TTL index),
+    and past ``max_entries`` the least recently used ones are evicted.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = {'file': 0, 'text': 0}
+        # A file-layer miss goes on to the text layer, so only text-layer misses count.
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return _WHITESPACE.sub(' ', text).strip().casefold()
+
+    @staticmethod
+    def file_key(file_hash: str, version: str, variant: str = '') -> Optional[str]:
+        if not file_hash:
+            return None
+        return hashlib.sha256(f"file\0{version}\0{variant}\0{file_hash}".encode('utf-8')).hexdigest()
+
+    @classmethod
+    def text_key(cls, text: str, version: str) -> Optional[str]:
+        normalized = cls.normalize_text(text or '')
+        if not normalized:
+            return None
+        return hashlib.sha256(f"text\0{version}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, layer: str, key: Optional[str]) -> Optional[Tuple[ReceiptData, float]]:
+        """The cached extraction and its confidence, or None."""
+        entry = get_extraction_cache_entry(key, self.ttl_seconds) if key else None
+        if entry is not None:
+            try:
+                receipt_data = ReceiptData.model_validate_json(entry['result'])
+            except ValueError as e:
+                logger.warning(f"Discarding unreadable extraction cache entry {key}: {e}")
+                entry = None
+        with self._lock:
+            if entry is None:
+                if layer == 'text':
+                    self.misses += 1
+                return None
+            self.hits[layer] += 1
+        return receipt_data, entry.get('confidence', 0.0)
+
+    def put(self, keys_by_layer: Dict[str, Optional[str]], version: str, receipt_data: ReceiptData, confidence: float):
+        keys_by_layer = {layer: key for layer, key in keys_by_layer.items() if key}
+        stored = put_extraction_cache_entries(keys_by_layer, version, receipt_data.model_dump_json(), confidence, self.ttl_seconds)
+        evicted = evict_extraction_cache(self.max_entries) if stored else 0
+        with self._lock:
+            self.stores += stored
+            self.evictions += evicted
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = sum(self.hits.values())
+            lookups = hits + self.misses
+            return {
+                'entries': count_extraction_cache_entries(),
+                'file_hits': self.hits['file'],
+                'text_hits': self.hits['text'],
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+            }
+
+
+_extraction_cache: Optional[ExtractionCache] = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """The process-wide cache, so statistics span every processor instance."""
+    global _extraction_cache
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache(
+                ttl_seconds=AppSettings.EXTRACTION_CACHE_TTL_DAYS * 86400,
+                max_entries=AppSettings.EXTRACTION_CACHE_MAX_ENTRIES
+            )
+        return _extraction_cache
@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional
+from .reconciliation import AdvancedReconciliationEngine
+from .split_matching import SplitPaymentMatcher
+from .vendor_registry import learn_vendor_aliases
+from models.schema import ReceiptTransaction, BankTransaction
+from database.operations import (
+    load_open_transaction_table, get_transactions_by_object_ids, set_reconciliation_status,
+    bulk_add_reconciliation_matches, bulk_add_split_matches, start_reconciliation_run,
+    complete_reconciliation_run, get_last_reconciliation_run, iter_receipt_transactions_by_date,
+    iter_bank_transactions_by_date
+)
+from config.settings import AppSettings
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalReconciliationService:
+    """Runs reconciliation against persisted match state.
+
+    Only open (not yet matched) transactions take part, and after the first run
+    only the ones inserted or changed since the previous run's watermark are
+    scored against the open items on the other side. Whatever is still open
+    afterwards goes through split-payment matching when it is enabled.
+    """
+
+    def __init__(self, engine: AdvancedReconciliationEngine = None, split_matcher: Optional[SplitPaymentMatcher] = None):
+        self.engine = engine or AdvancedReconciliationEngine()
+        if split_matcher is None and AppSettings.ENABLE_SPLIT_MATCHING:
+            split_matcher = SplitPaymentMatcher(
+                date_tolerance_days=self.engine.date_tolerance_days,
+                max_group_size=AppSettings.SPLIT_MATCH_MAX_GROUP_SIZE,
+                time_limit_seconds=AppSettings.SPLIT_MATCH_TIME_LIMIT_SECONDS
+            )
+        self.split_matcher = split_matcher
+
+    def run(self, full: bool = False, hydrate: bool = True) -> Dict[str, List]:
+        """Reconcile open transactions and persist the matches.
+
+        Matching runs on columnar ``TransactionTable``s. With ``hydrate`` the
+        returned transactions are re-read as full documents for display;
+        otherwise they are the tables' minimal row dicts.
+        """
+        last_run = None if full else get_last_reconciliation_run()
+        watermark = last_run.watermark if last_run else None
+        run = start_reconciliation_run(is_full_run=watermark is None)
+
+        try:
+            learn_vendor_aliases(since=watermark)
+            open_receipts = load_open_transaction_table(ReceiptTransaction)
+            open_bank = load_open_transaction_table(BankTransaction, tokens=open_receipts.tokens)
+
+            if watermark is None:
+                new_receipts = np.arange(len(open_receipts))
+                old_receipts = np.zeros(0, dtype=np.intp)
+                new_bank = np.arange(len(open_bank))
+            else:
+                changed = open_receipts.changed_since(watermark)
+                new_receipts, old_receipts = np.flatnonzero(changed), np.flatnonzero(~changed)
+                new_bank = np.flatnonzero(open_bank.changed_since(watermark))
+
+            # New receipts may match any open bank line; old receipts were already
+            # scored against the old bank lines, so they only see the new ones.
+            # Pairs are (receipt_row, bank_row, confidence, match_type) in open_* rows.
+            pairs = []
+            if len(new_receipts):
+                result = self.engine.reconcile_tables(open_receipts.take(new_receipts), open_bank)
+                pairs.extend((int(new_receipts[r]), b, c, t) for r, b, c, t in result["matches"])
+            if len(old_receipts) and len(new_bank):
+                used_bank_rows = {b for _, b, _, _ in pairs}
+                remaining_new_bank = np.array([b for b in new_bank.tolist() if b not in used_bank_rows], dtype=np.intp)
+                if len(remaining_new_bank):
+                    result = self.engine.reconcile_tables(open_receipts.take(old_receipts), open_bank.take(remaining_new_bank))
+                    pairs.extend((int(old_receipts[r]), int(remaining_new_bank[b]), c, t) for r, b, c, t in result["matches"])
+
+            matches = [
+                {"receipt": open_receipts.row(r), "bank_transaction": open_bank.row(b), "confidence": c, "match_type": t}
+                for r, b, c, t in pairs
+            ]
+            run_id = run.run_id if run else None
+            if bulk_add_reconciliation_matches(matches, run_id=run_id) != len(matches):
+                raise RuntimeError("Failed to persist reconciliation matches")
+
+            matched_receipt_rows = {r for r, _, _, _ in pairs}
+            matched_bank_rows = {b for _, b, _, _ in pairs}
+            unmatched_receipts = open_receipts.rows(r for r in range(len(open_receipts)) if r not in matched_receipt_rows)
+            unmatched_bank = open_bank.rows(b for b in range(len(open_bank)) if b not in matched_bank_rows)
+
+            split_matches = []
+            if self.split_matcher is not None and (len(new_receipts) or len(new_bank)):
+                split_matches = self.split_matcher.match(unmatched_receipts, unmatched_bank)
+                if bulk_add_split_matches(split_matches, run_id=run_id) != len(split_matches):
+                    raise RuntimeError("Failed to persist split-payment matches")
+                split_receipt_ids = {r['transaction_id'] for g in split_matches for r in g['receipts']}
+                split_bank_ids = {b['transaction_id'] for g in split_matches for b in g['bank_transactions']}
+                unmatched_receipts = [r for r in unmatched_receipts if r['transaction_id'] not in split_receipt_ids]
+                unmatched_bank = [b for b in unmatched_bank if b['transaction_id'] not in split_bank_ids]
+
+            still_open_receipts = {r['transaction_id'] for r in unmatched_receipts}
+            still_open_bank = {b['transaction_id'] for b in unmatched_bank}
+            set_reconciliation_status(ReceiptTransaction, [tid for tid in map(open_receipts.transaction_id, new_receipts.tolist()) if tid in still_open_receipts], 'unmatched')
+            set_reconciliation_status(BankTransaction, [tid for tid in map(open_bank.transaction_id, new_bank.tolist()) if tid in still_open_bank], 'unmatched')
+
+            if run:
+                complete_reconciliation_run(
+                    run,
+                    receipts_considered=len(new_receipts) + (len(old_receipts) if len(new_bank) else 0),
+                    bank_transactions_considered=len(open_bank) if len(new_receipts) else len(new_bank),
+                    matches_created=len(matches) + len(split_matches)
+                )
+            logger.info(f"Incremental reconciliation: {len(new_receipts)} new receipts, {len(new_bank)} new bank transactions, {len(matches)} matches, {len(split_matches)} split groups")
+
+            results = {
+                "matches": matches,
+                "split_matches": split_matches,
+                "unmatched_ledger": unmatched_receipts,
+                "unmatched_bank": unmatched_bank
+            }
+            return self._hydrate(results) if hydrate else results
+        except Exception:
+            if run:
+                complete_reconciliation_run(run, status='failed')
+            raise
+
+    def run_stream(self, chunk_size: int = 500, sample_size: int = 100) -> Dict:
+        """Date-window merge-join over the open transactions, storing matches as they come.
+
+        Both collections are read sorted by date through the engine's
+        ``reconcile_stream`` and matches are written in chunks of
+        ``chunk_size``, so memory stays bounded by the date window: only
+        counts and the first ``sample_size`` events of each kind are kept
+        for display. No ``ReconciliationRun`` is recorded: the window only
+        scores pairs within the date tolerance, so the next incremental run
+        must not treat these transactions as already scored against each other.
+        """
+        results = {"matches": [], "unmatched_ledger": [], "unmatched_bank": []}
+        counts = {"matches": 0, "unmatched_ledger": 0, "unmatched_bank": 0, "stored": 0}
+        event_keys = {"match": "matches", "unmatched_ledger": "unmatched_ledger", "unmatched_bank": "unmatched_bank"}
+        pending = []
+        for event, payload in self.engine.reconcile_stream(iter_receipt_transactions_by_date(), iter_bank_transactions_by_date()):
+            key = event_keys[event]
+            counts[key] += 1
+            if len(results[key]) < sample_size:
+                results[key].append(payload)
+            if event == "match":
+                pending.append(payload)
+                if len(pending) >= chunk_size:
+                    counts["stored"] += bulk_add_reconciliation_matches(pending)
+                    pending = []
+        counts["stored"] += bulk_add_reconciliation_matches(pending)
+        if counts["stored"] != counts["matches"]:
+            logger.warning(f"Stored {counts['stored']} of {counts['matches']} streamed matches; the rest were matched elsewhere or failed to save")
+        results["counts"] = counts
+        return results
+
+    @staticmethod
+    def _hydrate(results: Dict[str, List]) -> Dict[str, List]:
+        """Swap minimal row dicts for the stored documents, one query per collection."""
+        receipt_refs = [m['receipt'] for m in results["matches"]] + results["unmatched_ledger"] + \
+            [r for g in results["split_matches"] for r in g['receipts']]
+        bank_refs = [m['bank_transaction'] for m in results["matches"]] + results["unmatched_bank"] + \
+            [b for g in results["split_matches"] for b in g['bank_transactions']]
+        receipts = get_transactions_by_object_ids(ReceiptTransaction, {r['_id'] for r in receipt_refs})
+        bank_transactions = get_transactions_by_object_ids(BankTransaction, {b['_id'] for b in bank_refs})
+
+        def full_receipt(row):
+            return receipts.get(row['_id'], row)
+
+        def full_bank(row):
+            return bank_transactions.get(row['_id'], row)
+
+        return {
+            "matches": [dict(m, receipt=full_receipt(m['receipt']), bank_transaction=full_bank(m['bank_transaction'])) for m in results["matches"]],
+            "split_matches": [
+                dict(g, receipts=[full_receipt(r) for r in g['receipts']], bank_transactions=[full_bank(b) for b in g['bank_transactions']])
+                for g in results["split_matches"]
+            ],
+            "unmatched_ledger": [full_receipt(r) for r in results["unmatched_ledger"]],
+            "unmatched_bank": [full_bank(b) for b in results["unmatched_bank"]]
+        }
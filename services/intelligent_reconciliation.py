@@ -1,36 +1,92 @@
 from models.reconciliation_embeddings import ReconciliationEmbeddings
-from sklearn.metrics.pairwise import cosine_similarity
+from models.vector_index import VectorIndex, create_vector_index
+from models.embedding_codec import encode_embedding, decode_embedding
+from models.schema import ReceiptTransaction, BankTransaction
+from database.operations import load_transaction_embeddings, store_transaction_embeddings
+from config.settings import AppSettings
+from typing import List, Dict, Optional
 import numpy as np
-from typing import List, Dict
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 class IntelligentReconciliation:
-    def __init__(self):
-        self.embeddings = ReconciliationEmbeddings()
+    def __init__(self, index_type: Optional[str] = None, index_path: Optional[str] = None, embedding_backend: Optional[str] = None):
+        self.embeddings = ReconciliationEmbeddings(backend=embedding_backend)
+        self.index_type = index_type or AppSettings.VECTOR_INDEX_TYPE
+        self.index_path = index_path if index_path is not None else AppSettings.VECTOR_INDEX_PATH
     
-    def find_matches(self, receipts: List[Dict], bank_transactions: List[Dict]) -> List[Dict]:
+    def find_matches(self, receipts: List[Dict], bank_transactions: List[Dict], top_k: int = 1, threshold: float = 0.7) -> List[Dict]:
         if not receipts or not bank_transactions:
             return []
 
-        receipt_texts = [f"{r.get('vendor', '')} {r.get('amount', '')}" for r in receipts]
-        bank_texts = [f"{b.get('description', '')} {b.get('amount', '')}" for b in bank_transactions]
-        
-        receipt_embeddings = self.embeddings.embed_transactions(receipt_texts)
-        bank_embeddings = self.embeddings.embed_transactions(bank_texts)
+        receipt_embeddings = self._transaction_vectors(receipts, ReceiptTransaction, self.embeddings.receipt_text)
+        bank_index = self._get_bank_index(bank_transactions)
         
-        similarity_matrix = cosine_similarity(receipt_embeddings, bank_embeddings)
+        scores, indices = bank_index.search(receipt_embeddings, k=top_k, threshold=threshold)
         
         matches = []
         for i, receipt in enumerate(receipts):
-            if i < len(similarity_matrix):
-                best_match_idx = np.argmax(similarity_matrix[i])
-                confidence = similarity_matrix[i][best_match_idx]
-                
-                if confidence > 0.7:  
-                    matches.append({
-                        'receipt': receipt,
-                        'bank_transaction': bank_transactions[best_match_idx],
-                        'confidence': float(confidence),
-                        'match_type': 'semantic'
-                    })
+            for confidence, bank_idx in zip(scores[i], indices[i]):
+                if bank_idx < 0:
+                    break
+                matches.append({
+                    'receipt': receipt,
+                    'bank_transaction': bank_transactions[bank_idx],
+                    'confidence': float(confidence),
+                    'match_type': 'semantic'
+                })
         
-        return matches
\ No newline at end of file
+        return matches
+
+    def _transaction_vectors(self, transactions: List[Dict], document_cls, text_fn) -> np.ndarray:
+        """Stored document embeddings for this model, embedding (and backfilling) only the rest."""
+        ids = [t.get('transaction_id') for t in transactions]
+        known_ids = [i for i in ids if i]
+        stored = load_transaction_embeddings(document_cls, known_ids, self.embeddings.model) if known_ids else {}
+
+        vectors = [decode_embedding(stored[i]) if i in stored else None for i in ids]
+        missing = [k for k, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.embeddings.embed_transactions([text_fn(transactions[k]) for k in missing])
+            backfill = {}
+            for k, vector in zip(missing, fresh):
+                vectors[k] = vector
+                if ids[k]:
+                    backfill[ids[k]] = encode_embedding(vector, AppSettings.EMBEDDING_STORAGE_DTYPE)
+            # Stored lazily here rather than at ingestion, where the remote call would stall inserts.
+            if backfill:
+                store_transaction_embeddings(document_cls, backfill, self.embeddings.model)
+        logger.info(f"Loaded {len(transactions) - len(missing)} stored embeddings, computed {len(missing)}")
+        return np.stack(vectors)
+
+    def _get_bank_index(self, bank_transactions: List[Dict]) -> VectorIndex:
+        bank_texts = [self.embeddings.bank_text(b) for b in bank_transactions]
+        fingerprint = self._fingerprint(bank_texts)
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                index = VectorIndex.load(self.index_path)
+                if index.fingerprint == fingerprint and index.kind == self.index_type:
+                    logger.info(f"Loaded {index.kind} vector index with {len(index)} bank transactions from {self.index_path}")
+                    return index
+            except Exception as e:
+                logger.warning(f"Could not load vector index from {self.index_path}: {e}")
+
+        bank_vectors = self._transaction_vectors(bank_transactions, BankTransaction, self.embeddings.bank_text)
+        index = create_vector_index(self.index_type).build(bank_vectors, fingerprint)
+        if self.index_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+                index.save(self.index_path)
+            except Exception as e:
+                logger.warning(f"Could not persist vector index to {self.index_path}: {e}")
+        return index
+
+    def _fingerprint(self, bank_texts: List[str]) -> str:
+        digest = hashlib.sha256(self.embeddings.model.encode('utf-8'))
+        for text in bank_texts:
+            digest.update(b'\0')
+            digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
@@ -0,0 +1,125 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+_FENCE = re.compile(r'```(?:json|JSON)?\s*(.*?)(?:```|$)', re.DOTALL)
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_DANGLING_KEY = re.compile(r'"(?:[^"\\]|\\.)*"\s*:\s*$')
+_TRAILING_SCALAR = re.compile(r'[^\s,:\[\]{}"]+$')
+
+
+class LLMResponseParser:
+    """Reads the JSON an LLM was asked for out of its response text.
+
+    The payload is taken from a code fence if there is one, then from the
+    first ``{`` (or ``[``) on, and parsed with ``orjson`` when installed. If
+    that fails a small repair is tried: trailing commas are dropped and a
+    truncated document is cut back to its last complete value and closed.
+    ``stats`` counts how each response was read: ``fast``, ``repaired`` or
+    ``failed``, plus ``invalid`` for parsed objects the caller rejected.
+    """
+
+    def __init__(self):
+        self.stats = {'fast': 0, 'repaired': 0, 'failed': 0, 'invalid': 0}
+        self._lock = threading.Lock()
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def parse_object(self, text: str) -> Optional[Dict[str, Any]]:
+        payload = self._payload(text, '{')
+        if payload is None:
+            self.count('failed')
+            return None
+        end = payload.rfind('}')
+        parsed = self._try_loads(payload[:end + 1]) if end != -1 else None
+        if isinstance(parsed, dict):
+            self.count('fast')
+            return parsed
+        parsed = self._try_loads(self._repair(payload))
+        self.count('repaired' if isinstance(parsed, dict) else 'failed')
+        return parsed if isinstance(parsed, dict) else None
+
+    def parse_array(self, text: str) -> Optional[List[Any]]:
+        """A JSON array; if it is broken, the complete objects in it."""
+        payload = self._payload(text, '[')
+        if payload is None:
+            self.count('failed')
+            return None
+        end = payload.rfind(']')
+        parsed = self._try_loads(payload[:end + 1]) if end != -1 else None
+        if isinstance(parsed, list):
+            self.count('fast')
+            return parsed
+        parsed = self._try_loads(_TRAILING_COMMA.sub(r'\1', payload[:end + 1])) if end != -1 else None
+        if not isinstance(parsed, list):
+            # Truncated or otherwise broken: an incomplete last element is not
+            # trusted, so only objects that decode as a whole are kept.
+            parsed = self._complete_objects(payload[1:])
+        self.count('repaired' if parsed else 'failed')
+        return parsed or None
+
+    @staticmethod
+    def _payload(text: str, opener: str) -> Optional[str]:
+        fenced = _FENCE.search(text or '')
+        if fenced and opener in fenced.group(1):
+            text = fenced.group(1)
+        start = (text or '').find(opener)
+        return text[start:] if start != -1 else None
+
+    @staticmethod
+    def _try_loads(text: str) -> Any:
+        try:
+            return _loads(text)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _repair(text: str) -> str:
+        """``text`` from its opening ``{`` up to where that object closes, or closed by hand if truncated."""
+        closers, in_string, escaped, string_start = [], False, False, 0
+        for position, char in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string, string_start = True, position
+            elif char in '{[':
+                closers.append('}' if char == '{' else ']')
+            elif char in '}]':
+                if closers and closers[-1] == char:
+                    closers.pop()
+                if not closers:
+                    return _TRAILING_COMMA.sub(r'\1', text[:position + 1])
+        # Truncated: an unfinished string or scalar may be cut short, so drop it
+        # together with its key rather than guess.
+        if in_string:
+            text = text[:string_start]
+        text = _TRAILING_SCALAR.sub('', text.rstrip())
+        text = _DANGLING_KEY.sub('', text.rstrip()).rstrip().rstrip(',')
+        return _TRAILING_COMMA.sub(r'\1', text + ''.join(reversed(closers)))
+
+    @staticmethod
+    def _complete_objects(text: str) -> List[Any]:
+        objects, decoder = [], json.JSONDecoder()
+        position = text.find('{')
+        while position != -1:
+            try:
+                entry, end = decoder.raw_decode(text, position)
+                objects.append(entry)
+                position = text.find('{', end)
+            except ValueError:
+                position = text.find('{', position + 1)
+        return objects
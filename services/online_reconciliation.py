@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from .reconciliation import AdvancedReconciliationEngine
+from .candidate_index import DynamicAmountIndex
+from models.schema import ReceiptTransaction, BankTransaction
+from database.operations import (
+    get_open_receipt_transactions, get_open_bank_transactions, get_open_transactions_changed_since,
+    get_transactions_by_object_ids, bulk_add_reconciliation_matches, watch_transaction_inserts,
+    RECEIPT_RECONCILIATION_FIELDS, BANK_RECONCILIATION_FIELDS
+)
+from config.settings import AppSettings
+from pymongo.errors import PyMongoError
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class OnlineReconciliationService:
+    """Reconciles transactions as they are inserted instead of on the next page load.
+
+    Open receipts and bank transactions are held in memory, each side in a
+    ``DynamicAmountIndex``. Every newly inserted document is ranked against
+    the open items on the other side with the engine's exact and fuzzy rules
+    and, if one qualifies, the match is written at once; otherwise the
+    document joins the open items. Inserts arrive through a MongoDB change
+    stream, or by polling ``updated_at`` where change streams are unavailable.
+    The semantic tier and split payments are left to the batch run.
+    """
+
+    KINDS = ('receipt', 'bank')
+    DOCUMENT_CLASSES = {'receipt': ReceiptTransaction, 'bank': BankTransaction}
+    FIELDS = {'receipt': RECEIPT_RECONCILIATION_FIELDS, 'bank': BANK_RECONCILIATION_FIELDS}
+    # Polls re-read this far behind the newest updated_at seen, for writers
+    # whose clocks or commits lag; documents already open are skipped.
+    POLL_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, engine: AdvancedReconciliationEngine = None, poll_seconds: Optional[float] = None):
+        self.engine = engine or AdvancedReconciliationEngine()
+        self.poll_seconds = poll_seconds if poll_seconds is not None else AppSettings.ONLINE_MATCH_POLL_SECONDS
+        pct = self.engine.amount_tolerance_percent
+        # The tolerance is relative to the receipt amount, so receipts looked
+        # up from a bank amount need the wider pct / (1 - pct) window.
+        self.indexes = {'receipt': DynamicAmountIndex(pct / (1 - pct)), 'bank': DynamicAmountIndex(pct)}
+        self.open_items: Dict[str, Dict] = {'receipt': {}, 'bank': {}}
+        self.stats = {'receipt': 0, 'bank': 0, 'matches': 0, 'stale_candidates': 0, 'last_match_ms': None}
+
+    def load(self):
+        """Index every open transaction; they are not matched against each other here."""
+        for kind, documents in (('receipt', get_open_receipt_transactions()), ('bank', get_open_bank_transactions())):
+            self.open_items[kind].clear()
+            self.indexes[kind] = DynamicAmountIndex(self.indexes[kind].amount_tolerance_percent)
+            for document in documents:
+                self._open(kind, document)
+        logger.info(f"Online matcher holds {len(self.indexes['receipt'])} open receipts and {len(self.indexes['bank'])} open bank transactions")
+
+    def process(self, kind: str, document: Dict) -> Optional[Dict]:
+        """Match one newly inserted transaction, or keep it open. Returns the stored match."""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown transaction kind '{kind}', expected one of {self.KINDS}")
+        document = {field: document.get(field) for field in ('_id', *self.FIELDS[kind])}
+        if document['_id'] in self.open_items[kind] or document.get('reconciliation_status') == 'matched':
+            return None
+
+        started = time.perf_counter()
+        self.stats[kind] += 1
+        other = 'bank' if kind == 'receipt' else 'receipt'
+        targets = [self.open_items[other][key] for key in self.indexes[other].candidates(document.get('amount'))]
+        peers = [self.open_items[kind][key] for key in self.indexes[kind].candidates(document.get('amount'))]
+
+        for position, confidence, match_type in self.engine.rank_counterparts(document, targets, kind, peers):
+            target = targets[position]
+            if not self._still_open(other, target):
+                continue
+            receipt, bank_txn = (document, target) if kind == 'receipt' else (target, document)
+            match = {"receipt": receipt, "bank_transaction": bank_txn, "confidence": confidence, "match_type": match_type}
+            # Both sides are claimed atomically when the match is stored, so a
+            # batch run or another matcher taking one of them in the meantime
+            # makes this write a no-op rather than a second match.
+            if bulk_add_reconciliation_matches([match]) != 1:
+                if self._is_closed(kind, document):
+                    return None
+                if self._still_open(other, target):
+                    logger.warning(f"Could not store online match {receipt['transaction_id']} ↔ {bank_txn['transaction_id']}")
+                    break
+                continue
+            self._close(other, target)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats['matches'] += 1
+            self.stats['last_match_ms'] = elapsed_ms
+            logger.info(f"Online {match_type} match {receipt['transaction_id']} ↔ {bank_txn['transaction_id']} "
+                        f"(confidence: {confidence:.2f}) in {elapsed_ms:.1f} ms")
+            return match
+
+        self._open(kind, document)
+        return None
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """Load open items, then process inserts until ``stop`` is set."""
+        stop = stop or threading.Event()
+        # Opened before loading so nothing inserted in between is missed;
+        # documents seen twice are skipped by ``process``.
+        stream = watch_transaction_inserts()
+        polled_since = datetime.utcnow() - self.POLL_OVERLAP
+        self.load()
+        if stream is None:
+            logger.info(f"Online matcher polling every {self.poll_seconds}s")
+            self._poll(stop, polled_since)
+        else:
+            logger.info("Online matcher following the transaction change stream")
+            self._follow(stream, stop)
+
+    def _follow(self, stream, stop: threading.Event):
+        kinds = {self.DOCUMENT_CLASSES[kind]._get_collection_name(): kind for kind in self.KINDS}
+        try:
+            while not stop.is_set():
+                try:
+                    change = stream.try_next()
+                except PyMongoError as e:
+                    logger.warning(f"Change stream interrupted, resuming: {e}")
+                    resume_token = stream.resume_token
+                    stream.close()
+                    stream = watch_transaction_inserts(resume_after=resume_token)
+                    if stream is None:
+                        return self._poll(stop, datetime.utcnow() - self.POLL_OVERLAP)
+                    continue
+                if change is not None:
+                    self.process(kinds[change['ns']['coll']], change['fullDocument'])
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def _poll(self, stop: threading.Event, since: datetime):
+        while not stop.is_set():
+            newest = since
+            for kind in self.KINDS:
+                for document in get_open_transactions_changed_since(self.DOCUMENT_CLASSES[kind], since):
+                    self.process(kind, document)
+                    if isinstance(document.get('updated_at'), datetime):
+                        newest = max(newest, document['updated_at'])
+            since = max(since, newest - self.POLL_OVERLAP)
+            stop.wait(self.poll_seconds)
+
+    def _still_open(self, kind: str, document: Dict) -> bool:
+        # A batch run or a reviewer may have matched it since it was indexed.
+        if not self._is_closed(kind, document):
+            return True
+        self.stats['stale_candidates'] += 1
+        self._close(kind, document)
+        return False
+
+    def _is_closed(self, kind: str, document: Dict) -> bool:
+        stored = get_transactions_by_object_ids(self.DOCUMENT_CLASSES[kind], [document['_id']], {'reconciliation_status': 1})
+        return document['_id'] not in stored or stored[document['_id']].get('reconciliation_status') == 'matched'
+
+    def _open(self, kind: str, document: Dict):
+        if self.indexes[kind].add(document['_id'], document.get('amount')):
+            self.open_items[kind][document['_id']] = document
+
+    def _close(self, kind: str, document: Dict):
+        self.indexes[kind].discard(document['_id'])
+        self.open_items[kind].pop(document['_id'], None)
+
+
+if __name__ == '__main__':
+    from database.connection import connect_to_db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    connect_to_db()
+    OnlineReconciliationService().run()
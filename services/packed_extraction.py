@@ -0,0 +1,156 @@
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Dict, Iterable, List, Optional, Tuple
+from config.settings import AppSettings
+import logging
+
+logger = logging.getLogger(__name__)
+
+PACKED_PROMPT_TEMPLATE = """
+            Extract receipt information from each receipt below and return ONLY a valid JSON array
+            with one object per receipt, in the order given, each carrying its receipt_id.
+
+            [
+                {{
+                    "receipt_id": "R1",
+                    "date": "YYYY-MM-DD",
+                    "vendor": "store name", 
+                    "amount": 25.99,
+                    "tax": 2.50,
+                    "category": "category",
+                    "items": ["item1", "item2"],
+                    "payment_method": "card/cash"
+                }}
+            ]
+            {receipts}
+            """
+
+PACKED_RECEIPT_TEMPLATE = """
+            Receipt {receipt_id} text: {receipt_text}
+            End of receipt {receipt_id}
+"""
+
+
+class PackedExtractionMixin:
+    """Extraction with several receipts per LLM request, for ``ReceiptPDFProcessor``.
+
+    The processor provides the single-receipt steps this builds on:
+    ``_prepare_extraction``, ``_complete_extraction`` (also used to retry a
+    receipt on its own), ``_finish_extraction``, ``_response_text`` and
+    ``_processing_failed``, plus ``llm``, ``response_parser`` and
+    ``packing_stats``. Nothing here imports the LLM stack.
+    """
+
+    async def process_receipts_packed(self, pdf_paths: Iterable[str], bypass_cleaning: bool = False,
+                                      max_concurrency: Optional[int] = None,
+                                      token_budget: Optional[int] = None) -> AsyncIterator[Tuple[str, dict]]:
+        """``process_receipts`` with several receipts per LLM request.
+
+        Prepared receipts are packed into one prompt until their estimated
+        tokens reach ``token_budget`` (default ``LLM_PACK_TOKEN_BUDGET``) or the
+        pack holds ``LLM_PACK_MAX_RECEIPTS``. The response, a JSON array keyed by
+        receipt id, is split back into one answer per receipt; receipts whose
+        entry is missing or malformed are retried on their own.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency or AppSettings.MAX_CONCURRENT_PROCESSING)
+        budget = (token_budget or AppSettings.LLM_PACK_TOKEN_BUDGET) - self._estimate_tokens(PACKED_PROMPT_TEMPLATE)
+
+        async def prepare(pdf_path: str) -> Tuple[str, Optional[dict], Optional[dict]]:
+            try:
+                return (pdf_path, *await loop.run_in_executor(None, self._prepare_extraction, pdf_path, bypass_cleaning))
+            except Exception as e:
+                return pdf_path, self._processing_failed(pdf_path, e), None
+
+        prepare_tasks = [asyncio.ensure_future(prepare(pdf_path)) for pdf_path in pdf_paths]
+        pack_tasks = []
+        pack, pack_tokens = [], 0
+        try:
+            # Receipts answered without the LLM come out first; the rest are packed as they get ready.
+            for completed in asyncio.as_completed(prepare_tasks):
+                pdf_path, result, job = await completed
+                if result is not None:
+                    yield pdf_path, result
+                    continue
+                tokens = self._estimate_tokens(job['cleaned_text'])
+                if pack and (pack_tokens + tokens > budget or len(pack) >= AppSettings.LLM_PACK_MAX_RECEIPTS):
+                    pack_tasks.append(asyncio.ensure_future(self._complete_pack(pack, semaphore)))
+                    pack, pack_tokens = [], 0
+                pack.append(job)
+                pack_tokens += tokens
+            if pack:
+                pack_tasks.append(asyncio.ensure_future(self._complete_pack(pack, semaphore)))
+
+            for completed in asyncio.as_completed(pack_tasks):
+                for item in await completed:
+                    yield item
+        finally:
+            for task in prepare_tasks + pack_tasks:
+                task.cancel()
+
+    async def _complete_pack(self, jobs: List[dict], semaphore: asyncio.Semaphore) -> List[Tuple[str, dict]]:
+        if len(jobs) == 1:
+            return [(jobs[0]['pdf_path'], await self._finish_or_fail(jobs[0], self._complete_extraction(jobs[0], semaphore)))]
+
+        receipt_ids = [f"R{position}" for position in range(1, len(jobs) + 1)]
+        prompt = PACKED_PROMPT_TEMPLATE.format(receipts="".join(
+            PACKED_RECEIPT_TEMPLATE.format(receipt_id=receipt_id, receipt_text=job['cleaned_text'])
+            for receipt_id, job in zip(receipt_ids, jobs)
+        ))
+        try:
+            async with semaphore:
+                logger.info(f"Attempting packed LLM completion for {len(jobs)} receipts")
+                response = await self.llm.acomplete(prompt)
+            response_text = self._response_text(response)
+        except Exception as llm_error:
+            logger.error(f"Packed LLM completion failed: {llm_error}")
+            response_text = ""
+
+        answers = self._split_packed_response(response_text, receipt_ids) if not response_text.startswith("Error:") else {}
+        loop = asyncio.get_running_loop()
+        pending = []
+        for receipt_id, job in zip(receipt_ids, jobs):
+            answer = answers.get(receipt_id)
+            if answer is None:
+                self.packing_stats['retried'] += 1
+                logger.warning(f"Packed response had no usable entry for {receipt_id}; retrying {job['pdf_path']} alone")
+                finished = self._complete_extraction(job, semaphore)
+            else:
+                finished = loop.run_in_executor(None, self._finish_extraction, job, answer)
+            pending.append(self._finish_or_fail(job, finished))
+        results = list(zip((job['pdf_path'] for job in jobs), await asyncio.gather(*pending)))
+
+        self.packing_stats['requests'] += 1
+        self.packing_stats['receipts'] += len(jobs)
+        logger.info(f"Packed request answered {len(answers)} of {len(jobs)} receipts")
+        return results
+
+    async def _finish_or_fail(self, job: dict, finished: Awaitable[dict]) -> dict:
+        try:
+            return await finished
+        except Exception as e:
+            return self._processing_failed(job['pdf_path'], e)
+
+    def _split_packed_response(self, response_text: str, receipt_ids: List[str]) -> Dict[str, str]:
+        """One single-receipt response per receipt id the packed response answered well."""
+        entries = self.response_parser.parse_array(response_text) or []
+
+        answers, seen = {}, set()
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            receipt_id = str(entry.pop('receipt_id', '')).strip()
+            if receipt_id not in receipt_ids or not any(entry.get(field) for field in ('date', 'vendor', 'amount')):
+                continue
+            if receipt_id in seen:
+                # Two answers for one receipt: trust neither.
+                answers.pop(receipt_id, None)
+                continue
+            seen.add(receipt_id)
+            answers[receipt_id] = json.dumps(entry, indent=4)
+        return answers
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Roughly four characters per token for English text; no tokenizer is shipped.
+        return len(text) // 4 + 1
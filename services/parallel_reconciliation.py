@@ -0,0 +1,142 @@
+import bisect
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from utils.helpers import GeneralHelpers
+from models.transaction_table import TransactionTable
+from .reconciliation import AdvancedReconciliationEngine
+from .vendor_registry import VendorRegistry
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _rank_shard(args) -> Tuple[List[int], List[List[Tuple[int, float]]], Dict[str, int]]:
+    """Pool worker: rank one shard's candidates and map them back to global positions."""
+    scoring, settings, receipt_positions, receipts, bank_positions, bank_transactions = args
+    engine = AdvancedReconciliationEngine(scoring=scoring, tiers=('fuzzy',), strategy='greedy')
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    ranked = engine.rank_candidates(receipts, bank_transactions)
+    return receipt_positions, [
+        [(bank_positions[position], confidence) for position, confidence in candidates]
+        for candidates in ranked
+    ], engine.last_run_stats
+
+
+class ParallelReconciliationEngine(AdvancedReconciliationEngine):
+    """Runs the fuzzy tier of ``AdvancedReconciliationEngine`` across a process pool.
+
+    Receipts are sorted by absolute amount and cut into contiguous shards. Each
+    shard ships only the bank transactions inside its amount range widened by
+    the tolerance, so neighbouring shards overlap. Workers return ranked
+    candidates rather than matches; a serial greedy pass then commits them in
+    the original receipt order (or the optimal assignment solver), which keeps
+    every bank transaction matched at most once and reproduces the serial fuzzy
+    tier exactly.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, shards_per_worker: int = 4,
+                 min_parallel_pairs: int = 250000, scoring: str = 'scalar', tiers: Optional[Sequence[str]] = None,
+                 strategy: Optional[str] = None, vendor_registry: Optional[VendorRegistry] = None):
+        super().__init__(scoring=scoring, tiers=tiers, strategy=strategy, vendor_registry=vendor_registry)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shards_per_worker = shards_per_worker
+        self.min_parallel_pairs = min_parallel_pairs
+
+    def _match_fuzzy(self, ledger_transactions: List[Dict], bank_transactions: List[Dict], stats: Dict[str, Any]) -> List[Dict]:
+        started = time.perf_counter()
+        shards = self._build_shards(ledger_transactions, bank_transactions)
+        use_pool = (
+            self.max_workers > 1 and len(shards) > 1
+            and len(ledger_transactions) * len(bank_transactions) >= self.min_parallel_pairs
+        )
+        stats["pairs_total"] += len(ledger_transactions) * len(bank_transactions)
+
+        ranked: List[List[Tuple[int, float]]] = [[] for _ in ledger_transactions]
+        if use_pool:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                shard_results = list(pool.map(_rank_shard, shards))
+        else:
+            shard_results = [_rank_shard(shard) for shard in shards]
+        for receipt_positions, shard_ranked, shard_stats in shard_results:
+            for receipt_pos, candidates in zip(receipt_positions, shard_ranked):
+                ranked[receipt_pos] = candidates
+            stats["pairs_candidate"] += shard_stats["pairs_candidate"]
+            stats["pairs_scored"] += shard_stats["pairs_scored"]
+        scored = time.perf_counter()
+
+        matches = self._commit_ranked(ledger_transactions, bank_transactions, ranked, stats)
+        stats["parallel"] = {
+            "shards": len(shards),
+            "workers": self.max_workers if use_pool else 1,
+            "bank_rows_shipped": sum(len(shard[5]) for shard in shards),
+            "score_seconds": scored - started,
+            "merge_seconds": time.perf_counter() - scored,
+        }
+        logger.info(f"Parallel fuzzy tier matched {len(matches)} of {len(ledger_transactions)} receipts "
+                    f"across {len(shards)} shards ({stats['parallel']['score_seconds']:.2f}s scoring)")
+        return matches
+
+    def _match_fuzzy_table(self, ledger: TransactionTable, rows: np.ndarray, bank: TransactionTable, cols: np.ndarray,
+                           stats: Dict[str, Any]) -> List[Tuple[int, int, float, str]]:
+        """Shard the table rows the same way as the dict path."""
+        receipts, bank_transactions = ledger.rows(rows), bank.rows(cols)
+        ledger_rows = {id(r): int(row) for r, row in zip(receipts, rows)}
+        bank_rows = {id(b): int(col) for b, col in zip(bank_transactions, cols)}
+        return [
+            (ledger_rows[id(m['receipt'])], bank_rows[id(m['bank_transaction'])], m['confidence'], m['match_type'])
+            for m in self._match_fuzzy(receipts, bank_transactions, stats)
+        ]
+
+    def _build_shards(self, ledger_transactions: List[Dict], bank_transactions: List[Dict]) -> List[tuple]:
+        receipts = []
+        for position, receipt in enumerate(ledger_transactions):
+            amount = GeneralHelpers.parse_amount(receipt.get('amount', 0))
+            # Zero or unreadable amounts can never be amount-compatible.
+            if amount and not math.isnan(amount):
+                receipts.append((abs(amount), position))
+        receipts.sort()
+
+        bank = []
+        for position, txn in enumerate(bank_transactions):
+            amount = GeneralHelpers.parse_amount(txn.get('amount', 0))
+            if amount is not None and not math.isnan(amount):
+                bank.append((abs(amount), position))
+        bank.sort()
+        bank_amounts = [amount for amount, _ in bank]
+
+        settings = {
+            'amount_tolerance_percent': self.amount_tolerance_percent,
+            'match_threshold': self.match_threshold,
+            'score_block_size': self.score_block_size,
+            '_vendor_registry': self.vendor_registry,
+        }
+        n_shards = max(1, min(len(receipts), self.max_workers * self.shards_per_worker))
+        shard_size = math.ceil(len(receipts) / n_shards) if receipts else 0
+
+        shards = []
+        for start in range(0, len(receipts), shard_size or 1):
+            chunk = receipts[start:start + shard_size]
+            # Tolerance grows with the amount, so the chunk's end points bound
+            # the window of every receipt inside it.
+            lo_amount, hi_amount = chunk[0][0], chunk[-1][0]
+            lo = bisect.bisect_left(bank_amounts, lo_amount - self._variance(lo_amount))
+            hi = bisect.bisect_right(bank_amounts, hi_amount + self._variance(hi_amount))
+
+            # Keep the original relative order inside each shard: the greedy
+            # tie-break prefers the earlier bank transaction.
+            receipt_positions = sorted(position for _, position in chunk)
+            bank_positions = sorted(position for _, position in bank[lo:hi])
+            shards.append((
+                self.scoring, settings,
+                receipt_positions, [ledger_transactions[p] for p in receipt_positions],
+                bank_positions, [bank_transactions[p] for p in bank_positions],
+            ))
+        return shards
+
+    def _variance(self, amount: float) -> float:
+        return max(amount * self.amount_tolerance_percent, 1.0) + 2e-6
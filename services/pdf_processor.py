@@ -1,43 +1,24 @@
 import json
+import hashlib
+import asyncio
+from typing import AsyncIterator, Iterable, Optional, Tuple
 from llama_index.core import SimpleDirectoryReader
 from models.receipt_llm_config import ReceiptExtractionLLM
 from models.validation_models import ReceiptData
+from services.vendor_registry import get_vendor_registry
+from services.extraction_cache import get_extraction_cache
+from services.llm_response_parser import LLMResponseParser
+from services.packed_extraction import PackedExtractionMixin
+from utils.helpers import GeneralHelpers
+from config.settings import AppSettings
 from pydantic import ValidationError
 import logging
 import re
-from datetime import datetime
+from datetime import date, datetime
 
 logger = logging.getLogger(__name__)
 
-
-class ReceiptPDFProcessor:
-    def __init__(self):
-        self.llm = ReceiptExtractionLLM()
-        
-    
-    def process_receipt(self, pdf_path: str, bypass_cleaning: bool = False) -> dict:
-        try:
-            logger.info(f"Processing PDF: {pdf_path}")
-            
-            text_content = self._extract_text_with_fallbacks(pdf_path)
-            
-            logger.info(f"Extracted {len(text_content)} characters from PDF")
-            
-            if bypass_cleaning:
-                logger.info("Bypassing text cleaning for manual upload")
-                cleaned_text = text_content[:10000]
-            else:
-                logger.info("Using enhanced text cleaning for email processing")
-                cleaned_text = self._clean_receipt_text(text_content)
-            
-            if not bypass_cleaning:
-                if not cleaned_text or len(cleaned_text.strip()) < 10:
-                    logger.warning(f"Insufficient text extracted from PDF: {len(cleaned_text)} characters (min: 10)")
-                    return {'error': 'Insufficient text content in PDF', 'confidence': 0.0}
-
-            logger.info(f"Processing with {len(cleaned_text)} characters of text")
-            
-            prompt = f"""
+PROMPT_TEMPLATE = """
             Extract receipt information from the text below and return ONLY a valid JSON object.
 
             {{
@@ -50,62 +31,238 @@ class ReceiptPDFProcessor:
                 "payment_method": "card/cash"
             }}
 
-            Receipt text: {cleaned_text}
+            Receipt text: {receipt_text}
             """
+
+EXTRACTION_FAILED_TEXT = "Receipt processing failed - manual review required"
+
+
+class ReceiptPDFProcessor(PackedExtractionMixin):
+    # Bump when parsing or validation changes what an LLM response turns into;
+    # cached extractions from older versions are then ignored.
+    EXTRACTION_VERSION = 4
+
+    def __init__(self):
+        self.llm = ReceiptExtractionLLM()
+        self.cache = get_extraction_cache() if AppSettings.ENABLE_EXTRACTION_CACHE else None
+        self.packing_stats = {'requests': 0, 'receipts': 0, 'retried': 0}
+        self.response_parser = LLMResponseParser()
+        payload = json.dumps(self.llm._base_payload(PROMPT_TEMPLATE), sort_keys=True)
+        self.extraction_version = hashlib.sha256(f"{self.EXTRACTION_VERSION}\0{payload}".encode('utf-8')).hexdigest()[:16]
+        
+    
+    def process_receipt(self, pdf_path: str, bypass_cleaning: bool = False) -> dict:
+        try:
+            result, job = self._prepare_extraction(pdf_path, bypass_cleaning)
+            if result is not None:
+                return result
             
             try:
                 logger.info("Attempting LLM completion")
                 if hasattr(self.llm, 'complete'):
-                    response = self.llm.complete(prompt)
+                    response = self.llm.complete(job['prompt'])
                 else:
-                    response = self.llm(prompt)
-                
-                try:
-                    response_text = str(response.text) if hasattr(response, 'text') else str(response)
-                    logger.info(f"LLM completion successful: {len(response_text)} characters")
-                    logger.info(f"LLM response preview: {response_text[:200]}...")
-                except Exception as text_error:
-                    logger.error(f"Failed to extract response text: {text_error}")
-                    response_text = ""
+                    response = self.llm(job['prompt'])
+                response_text = self._response_text(response)
                     
             except Exception as llm_error:
                 logger.error(f"LLM completion failed: {llm_error}")
                 logger.info("Falling back to direct text analysis")
                 response_text = ""
             
-            if response_text.strip():
-                logger.info("Using LLM response for extraction")
-                extracted_data = self._manual_json_construction(response_text)
-            else:
-                logger.info("Using direct text analysis (no LLM response)")
-                extracted_data = self._manual_json_construction(cleaned_text[:5000]) 
-            
-            logger.info(f" Data extraction successful: {extracted_data}")
+            return self._finish_extraction(job, response_text)
             
-            try:
+        except Exception as e:
+            return self._processing_failed(pdf_path, e)
+
+    async def process_receipt_async(self, pdf_path: str, bypass_cleaning: bool = False,
+                                    semaphore: Optional[asyncio.Semaphore] = None) -> dict:
+        """``process_receipt`` without blocking the event loop.
+
+        Text extraction and parsing run in the loop's default executor; the LLM
+        call goes through ``acomplete`` while holding ``semaphore``.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = semaphore or asyncio.Semaphore(AppSettings.MAX_CONCURRENT_PROCESSING)
+        try:
+            result, job = await loop.run_in_executor(None, self._prepare_extraction, pdf_path, bypass_cleaning)
+            if result is not None:
+                return result
+            return await self._complete_extraction(job, semaphore)
+
+        except Exception as e:
+            return self._processing_failed(pdf_path, e)
+
+    async def _complete_extraction(self, job: dict, semaphore: asyncio.Semaphore) -> dict:
+        try:
+            async with semaphore:
+                logger.info("Attempting async LLM completion")
+                response = await self.llm.acomplete(job['prompt'])
+            response_text = self._response_text(response)
+        except Exception as llm_error:
+            logger.error(f"LLM completion failed: {llm_error}")
+            logger.info("Falling back to direct text analysis")
+            response_text = ""
+
+        return await asyncio.get_running_loop().run_in_executor(None, self._finish_extraction, job, response_text)
+
+    async def process_receipts(self, pdf_paths: Iterable[str], bypass_cleaning: bool = False,
+                               max_concurrency: Optional[int] = None) -> AsyncIterator[Tuple[str, dict]]:
+        """Process many receipts at once, yielding ``(pdf_path, result)`` as each completes.
+
+        At most ``max_concurrency`` (default ``MAX_CONCURRENT_PROCESSING``) LLM
+        calls are in flight; the other receipts meanwhile have their text
+        extracted, so network waits and extraction overlap.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or AppSettings.MAX_CONCURRENT_PROCESSING)
+
+        async def process(pdf_path: str) -> Tuple[str, dict]:
+            return pdf_path, await self.process_receipt_async(pdf_path, bypass_cleaning, semaphore)
+
+        tasks = [asyncio.ensure_future(process(pdf_path)) for pdf_path in pdf_paths]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # The consumer stopped early; do not leave extractions running.
+            for task in tasks:
+                task.cancel()
+
+    def _prepare_extraction(self, pdf_path: str, bypass_cleaning: bool) -> Tuple[Optional[dict], Optional[dict]]:
+        """Everything before the LLM call: ``(result, None)`` when the receipt is
+        already answered (cached or unreadable), else ``(None, job)``."""
+        logger.info(f"Processing PDF: {pdf_path}")
+
+        cache_keys = {}
+        if self.cache is not None:
+            variant = 'raw' if bypass_cleaning else 'cleaned'
+            cache_keys['file'] = self.cache.file_key(GeneralHelpers.hash_file(pdf_path), self.extraction_version, variant)
+            cached = self.cache.get('file', cache_keys['file'])
+            if cached is not None:
+                logger.info(f"Extraction cache hit (file) for {pdf_path}")
+                return self._cached_result(*cached), None
+        
+        text_content = self._extract_text_with_fallbacks(pdf_path)
+        
+        logger.info(f"Extracted {len(text_content)} characters from PDF")
+        
+        if bypass_cleaning:
+            logger.info("Bypassing text cleaning for manual upload")
+            cleaned_text = text_content[:10000]
+        else:
+            logger.info("Using enhanced text cleaning for email processing")
+            cleaned_text = self._clean_receipt_text(text_content)
+        
+        if not bypass_cleaning:
+            if not cleaned_text or len(cleaned_text.strip()) < 10:
+                logger.warning(f"Insufficient text extracted from PDF: {len(cleaned_text)} characters (min: 10)")
+                return {'error': 'Insufficient text content in PDF', 'confidence': 0.0}, None
+
+        if text_content == EXTRACTION_FAILED_TEXT:
+            # Every unreadable PDF yields this text; its extraction says nothing about the file.
+            cache_keys = {}
+        elif self.cache is not None:
+            cache_keys['text'] = self.cache.text_key(cleaned_text, self.extraction_version)
+            cached = self.cache.get('text', cache_keys['text'])
+            if cached is not None:
+                logger.info(f"Extraction cache hit (text) for {pdf_path}")
+                # Remember the file too, so it skips text extraction next time.
+                self.cache.put({'file': cache_keys.get('file')}, self.extraction_version, *cached)
+                return self._cached_result(*cached), None
+
+        logger.info(f"Processing with {len(cleaned_text)} characters of text")
+        
+        return None, {
+            'pdf_path': pdf_path,
+            'cleaned_text': cleaned_text,
+            'prompt': PROMPT_TEMPLATE.format(receipt_text=cleaned_text),
+            'cache_keys': cache_keys,
+        }
+
+    def _response_text(self, response) -> str:
+        try:
+            response_text = str(response.text) if hasattr(response, 'text') else str(response)
+            logger.info(f"LLM completion successful: {len(response_text)} characters")
+            logger.info(f"LLM response preview: {response_text[:200]}...")
+            return response_text
+        except Exception as text_error:
+            logger.error(f"Failed to extract response text: {text_error}")
+            return ""
+
+    def _finish_extraction(self, job: dict, response_text: str) -> dict:
+        extracted_data = None
+        if response_text.strip():
+            extracted_data = self._structured_extraction(response_text)
+        if extracted_data is not None:
+            logger.info("Using structured LLM response for extraction")
+        elif response_text.strip():
+            logger.info("Using LLM response for extraction")
+            extracted_data = self._manual_json_construction(response_text)
+        else:
+            logger.info("Using direct text analysis (no LLM response)")
+            extracted_data = self._manual_json_construction(job['cleaned_text'][:5000]) 
+        
+        logger.info(f" Data extraction successful: {extracted_data}")
+        
+        try:
+            if isinstance(extracted_data, ReceiptData):
+                validated_data = extracted_data
+            else:
                 prepared_data = self._prepare_for_validation(extracted_data)
                 validated_data = ReceiptData(**prepared_data)
-                validated_data_dict = validated_data.model_dump()
-                validated_data_dict['confidence'] = self._calculate_confidence(validated_data_dict)
-                database_ready_data = self.get_database_ready_data(validated_data_dict)
-
-                logger.info(f"Successfully processed PDF with confidence: {database_ready_data['confidence']}")
-                return database_ready_data
-                
-            except ValidationError as e:
-                logger.error(f"Pydantic validation failed: {e}")
-                logger.error(f"Extracted data: {extracted_data}")
-                return {'error': f"Validation error: {e}", 'confidence': 0.0}
+            validated_data_dict = validated_data.model_dump()
+            validated_data_dict['confidence'] = self._calculate_confidence(validated_data_dict)
+            database_ready_data = self.get_database_ready_data(validated_data_dict)
+            # Only answers the LLM actually gave are worth keeping; a text-analysis fallback is retried next time.
+            if job['cache_keys'] and response_text.strip() and not response_text.startswith("Error:"):
+                self.cache.put(job['cache_keys'], self.extraction_version, validated_data, validated_data_dict['confidence'])
+
+            logger.info(f"Successfully processed PDF with confidence: {database_ready_data['confidence']}")
+            return database_ready_data
             
-        except Exception as e:
-            logger.error(f"PDF processing failed for {pdf_path}: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return {
-                'error': f'PDF processing failed: {str(e)}', 
-                'confidence': 0.0,
-                'file_path': pdf_path
-            }
+        except ValidationError as e:
+            logger.error(f"Pydantic validation failed: {e}")
+            logger.error(f"Extracted data: {extracted_data}")
+            return {'error': f"Validation error: {e}", 'confidence': 0.0}
+
+    def _structured_extraction(self, response_text: str) -> Optional[ReceiptData]:
+        """The JSON object in the LLM response validated as ReceiptData, or None to fall back to text heuristics."""
+        parsed = self.response_parser.parse_object(response_text)
+        if parsed is None:
+            return None
+        try:
+            receipt_data = ReceiptData.model_validate({field: value for field, value in parsed.items() if value is not None})
+        except ValidationError as e:
+            logger.warning(f"LLM JSON does not fit ReceiptData, using text heuristics: {e}")
+            self.response_parser.count('invalid')
+            return None
+        if not receipt_data.vendor and not receipt_data.amount:
+            self.response_parser.count('invalid')
+            return None
+
+        if receipt_data.vendor_id is None and receipt_data.vendor:
+            receipt_data.vendor_id = get_vendor_registry().find(receipt_data.vendor)
+        if not receipt_data.category and receipt_data.vendor:
+            receipt_data.category = self._categorize_transaction(receipt_data.vendor, receipt_data.items)
+        return receipt_data
+
+    def _processing_failed(self, pdf_path: str, e: Exception) -> dict:
+        logger.error(f"PDF processing failed for {pdf_path}: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return {
+            'error': f'PDF processing failed: {str(e)}', 
+            'confidence': 0.0,
+            'file_path': pdf_path
+        }
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _cached_result(self, receipt_data: ReceiptData, confidence: float) -> dict:
+        validated_data_dict = receipt_data.model_dump()
+        validated_data_dict['confidence'] = confidence
+        return self.get_database_ready_data(validated_data_dict)
         
     def _clean_receipt_text(self, text: str) -> str:
         import re
@@ -212,9 +369,15 @@ class ReceiptPDFProcessor:
             logger.error(f"Enhanced binary extraction failed: {e}")
         
         logger.error("All extraction methods failed - using minimal fallback")
-        return "Receipt processing failed - manual review required"
+        return EXTRACTION_FAILED_TEXT
 
     def get_database_ready_data(self, validated_data_dict: dict) -> dict:
+        receipt_date = validated_data_dict.get('receipt_date')
+        if isinstance(receipt_date, date):
+            # BSON has no date type; callers read the 'date' string.
+            if not isinstance(receipt_date, datetime):
+                validated_data_dict['receipt_date'] = datetime.combine(receipt_date, datetime.min.time())
+            validated_data_dict.setdefault('date', receipt_date.strftime('%Y-%m-%d'))
         if 'date' in validated_data_dict:
             validated_data_dict['transaction_date'] = validated_data_dict['date']
         
@@ -372,7 +535,6 @@ class ReceiptPDFProcessor:
         
         vendor_patterns = [
             r'(?:^|\n)\s*([A-Z][A-Z\s&]{8,40})\s*(?:#|\n|Store)',  
-            r'(?:^|\n)\s*(AMAZON\.COM|WALMART|SHELL|CVS|TARGET|MCDONALD)', 
             r'(?:^|\n)\s*([A-Z][A-Z\s&]{5,40})\s*(?:SUPERCENTER|STATION|PHARMACY)', 
         ]
         
@@ -396,6 +558,14 @@ class ReceiptPDFProcessor:
                 result["vendor"] = best_vendor
                 logger.info(f"Vendor extracted: {result['vendor']}")
         
+        vendor_registry = get_vendor_registry()
+        if result["vendor"] == "Unknown Store":
+            # Nothing looked like a vendor name: a known alias in the header is the next best thing.
+            header_vendor_id = vendor_registry.find('\n'.join(text.split('\n')[:15]))
+            if header_vendor_id is not None:
+                result["vendor"] = vendor_registry.name(header_vendor_id)
+                logger.info(f"Known vendor extracted: {result['vendor']}")
+
         if result["vendor"] == "Unknown Store":
             lines = [line.strip() for line in text.split('\n') if line.strip()]
             for line in lines[:15]:
@@ -408,6 +578,7 @@ class ReceiptPDFProcessor:
                     result["vendor"] = line[:50]
                     logger.info(f"Fallback vendor extracted: {result['vendor']}")
                     break
+        result["vendor_id"] = vendor_registry.find(result["vendor"])
         tax_patterns = [
             r'TAX[:\s]*\$?(\d+\.\d{2})',
             r'SALES TAX[:\s]*\$?(\d+\.\d{2})',
@@ -1,119 +1,750 @@
-from typing import List, Dict, Any
-from fuzzywuzzy import fuzz
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 from .intelligent_reconciliation import IntelligentReconciliation
+from .candidate_index import AmountCandidateIndex
+from .vectorized_scoring import BatchSimilarityScorer
+from .assignment import optimal_assignment
+from .vendor_registry import VendorRegistry, get_vendor_registry
+from .token_set_scoring import TokenSetScorer
 from models.schema import ReceiptTransaction, BankTransaction
+from models.transaction_table import TransactionTable, MISSING_CENTS, MISSING_DAYS
+from utils.helpers import GeneralHelpers
+from config.settings import AppSettings
+import numpy as np
+import heapq
 import logging
+import math
+import time
 
 logger = logging.getLogger(__name__)
 
 class AdvancedReconciliationEngine:
-    def __init__(self):
-        self.intelligent_matcher = IntelligentReconciliation()
+    SCORING_MODES = ('scalar', 'vectorized')
+    TIERS = ('exact', 'fuzzy', 'semantic')
+    STRATEGIES = ('greedy', 'optimal')
+
+    def __init__(self, scoring: str = 'scalar', score_block_size: int = 256, tiers: Optional[Sequence[str]] = None,
+                 strategy: Optional[str] = None, vendor_registry: Optional[VendorRegistry] = None):
+        if scoring not in self.SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode '{scoring}', expected one of {self.SCORING_MODES}")
+        strategy = strategy or AppSettings.RECONCILIATION_STRATEGY
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown matching strategy '{strategy}', expected one of {self.STRATEGIES}")
+        self.strategy = strategy
+        tiers = tuple(tiers) if tiers is not None else tuple(AppSettings.RECONCILIATION_TIERS)
+        unknown = [tier for tier in tiers if tier not in self.TIERS]
+        if unknown:
+            raise ValueError(f"Unknown reconciliation tiers {unknown}, expected a subset of {self.TIERS}")
+        self.tiers = tiers
+        self._intelligent_matcher: Optional[IntelligentReconciliation] = None
+        self._vendor_registry = vendor_registry
+        self.token_set_scorer = TokenSetScorer()
+        self.scoring = scoring
+        self.score_block_size = score_block_size
         self.date_tolerance_days = 7
         self.amount_tolerance_percent = 0.1  
         self.vendor_similarity_threshold = 70  
+        self.match_threshold = 0.7
+        self.semantic_threshold = 0.85
+        self.semantic_top_k = 3
+        self.max_assignment_component_cells = 4_000_000
+        self.last_run_stats: Dict[str, Any] = {}
+
+    @property
+    def intelligent_matcher(self) -> IntelligentReconciliation:
+        # Built on first use: it opens the embedding cache and vector index,
+        # which pure rule-based runs (and pool workers) never need.
+        if self._intelligent_matcher is None:
+            self._intelligent_matcher = IntelligentReconciliation()
+        return self._intelligent_matcher
+
+    @property
+    def vendor_registry(self) -> VendorRegistry:
+        # The shared registry, unless one was passed in, so aliases learned
+        # from confirmed matches apply to the next run.
+        return self._vendor_registry or get_vendor_registry()
 
     def reconcile_transactions(self, ledger_transactions: List[Dict], bank_transactions: List[Dict]) -> Dict[str, List]:
+        """Run the enabled tiers cheapest-first, each on what the previous ones left open.
+
+        exact:    unique (amount in cents, date) hash join
+        fuzzy:    amount-blocked vendor/amount similarity, greedy or optimal
+        semantic: embedding similarity between amount-compatible leftovers
+        """
+        matches = []
+        used_bank_transactions = set()
+        used_receipts = set()
+        stats: Dict[str, Any] = {
+            "receipts": len(ledger_transactions),
+            "bank_transactions": len(bank_transactions),
+            "pairs_total": 0,
+            "pairs_candidate": 0,
+            "pairs_scored": 0,
+            "pairs_pruned": 0,
+            "tiers": {},
+        }
+        tier_methods = {
+            'exact': self._match_exact,
+            'fuzzy': self._match_fuzzy,
+            'semantic': self._match_semantic,
+        }
+
+        for tier in self.TIERS:
+            if tier not in self.tiers:
+                continue
+            open_ledger = [r for r in ledger_transactions if r['transaction_id'] not in used_receipts]
+            open_bank = [b for b in bank_transactions if b['transaction_id'] not in used_bank_transactions]
+            started = time.perf_counter()
+            tier_matches = tier_methods[tier](open_ledger, open_bank, stats) if open_ledger and open_bank else []
+            for match in tier_matches:
+                used_receipts.add(match['receipt']['transaction_id'])
+                used_bank_transactions.add(match['bank_transaction']['transaction_id'])
+            matches.extend(tier_matches)
+            stats["tiers"][tier] = {
+                "receipts": len(open_ledger),
+                "bank_transactions": len(open_bank),
+                "matches": len(tier_matches),
+                "seconds": time.perf_counter() - started,
+            }
+
+        stats["pairs_pruned"] = stats["pairs_total"] - stats["pairs_scored"]
+        self.last_run_stats = stats
+        logger.info("Reconciliation tiers: " + ", ".join(
+            f"{tier} {tier_stats['matches']}/{tier_stats['receipts']} in {tier_stats['seconds']:.2f}s"
+            for tier, tier_stats in stats["tiers"].items()
+        ))
+        logger.info(f"Reconciliation scored {stats['pairs_scored']} of {stats['pairs_total']} pairs ({stats['pairs_pruned']} pruned by amount blocking)")
+        
+        return {
+            "matches": matches,
+            "unmatched_ledger": [r for r in ledger_transactions if r['transaction_id'] not in used_receipts],
+            "unmatched_bank": [b for b in bank_transactions if b['transaction_id'] not in used_bank_transactions]
+        }
+
+    def _match_exact(self, ledger_transactions: List[Dict], bank_transactions: List[Dict], stats: Dict[str, Any]) -> List[Dict]:
+        # Only keys that occur once on each side are settled here; anything
+        # ambiguous is left for the fuzzy tier to tell apart by vendor.
+        receipt_keys: Dict[Tuple[int, date], List[Dict]] = {}
+        for receipt in ledger_transactions:
+            key = self._exact_key(receipt.get('amount'), receipt.get('transaction_date'))
+            if key is not None:
+                receipt_keys.setdefault(key, []).append(receipt)
+
+        bank_keys: Dict[Tuple[int, date], List[Dict]] = {}
+        for bank_txn in bank_transactions:
+            key = self._exact_key(bank_txn.get('amount'), bank_txn.get('transaction_date'))
+            if key is not None and key in receipt_keys:
+                bank_keys.setdefault(key, []).append(bank_txn)
+
+        matches = []
+        for key, receipts in receipt_keys.items():
+            candidates = bank_keys.get(key)
+            if len(receipts) == 1 and candidates is not None and len(candidates) == 1:
+                matches.append({
+                    "receipt": receipts[0],
+                    "bank_transaction": candidates[0],
+                    "confidence": 1.0,
+                    "match_type": "exact"
+                })
+        return matches
+
+    def _exact_key(self, amount, transaction_date) -> Optional[Tuple[int, date]]:
+        amount = GeneralHelpers.parse_amount(amount)
+        parsed_date = self._parse_date(transaction_date)
+        if not amount or math.isnan(amount) or parsed_date is None:
+            return None
+        return int(round(abs(amount) * 100)), parsed_date.date()
+
+    def _match_fuzzy(self, ledger_transactions: List[Dict], bank_transactions: List[Dict], stats: Dict[str, Any]) -> List[Dict]:
+        if self.strategy == 'optimal':
+            stats["pairs_total"] += len(ledger_transactions) * len(bank_transactions)
+            ranked = self.rank_candidates(ledger_transactions, bank_transactions)
+            stats["pairs_candidate"] += self.last_run_stats["pairs_candidate"]
+            stats["pairs_scored"] += self.last_run_stats["pairs_scored"]
+            return self._commit_ranked(ledger_transactions, bank_transactions, ranked, stats)
+
         matches = []
         used_bank_transactions = set()  
         used_receipts = set() 
         
-        for receipt in ledger_transactions:
+        bank_index = AmountCandidateIndex(bank_transactions, self.amount_tolerance_percent)
+        stats["pairs_total"] += len(ledger_transactions) * len(bank_transactions)
+        
+        scorer = None
+        if self.scoring == 'vectorized':
+            scorer = BatchSimilarityScorer(ledger_transactions, bank_transactions, self.vendor_registry)
+        block_scores: Dict[int, Dict[int, float]] = {}
+        
+        for receipt_pos, receipt in enumerate(ledger_transactions):
             if receipt['transaction_id'] in used_receipts:
                 continue
                 
             best_match = None
             best_confidence = 0.0
             
-            for bank_txn in bank_transactions:
+            if scorer is not None:
+                if receipt_pos not in block_scores:
+                    block_scores = self._score_receipt_block(scorer, bank_index, ledger_transactions, receipt_pos, stats)
+                row_scores = block_scores[receipt_pos]
+                candidate_positions = list(row_scores)
+            else:
+                row_scores = None
+                candidate_positions = bank_index.candidates(receipt.get('amount', 0))
+                stats["pairs_candidate"] += len(candidate_positions)
+            
+            for position in candidate_positions:
+                bank_txn = bank_transactions[position]
                 if bank_txn['transaction_id'] in used_bank_transactions:
                     continue 
-                    
-                confidence = self._calculate_similarity(receipt, bank_txn)
                 
-                if (confidence > 0.7 and 
-                    self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0))):
-                    if confidence > best_confidence:
-                        best_match = bank_txn
-                        best_confidence = confidence
+                if row_scores is not None:
+                    confidence = row_scores[position]
+                else:
+                    if not self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0)):
+                        continue
+                    confidence = self._calculate_similarity(receipt, bank_txn, self.match_threshold)
+                    stats["pairs_scored"] += 1
+                
+                if confidence > self.match_threshold and confidence > best_confidence:
+                    best_match = bank_txn
+                    best_confidence = confidence
             
             if best_match:
-                logger.info(f"Match found: {receipt.get('vendor_name')} ↔ {best_match['description']} (confidence: {best_confidence:.2f})")
+                logger.debug(f"Match found: {receipt.get('vendor_name')} ↔ {best_match['description']} (confidence: {best_confidence:.2f})")
                 matches.append({
                     "receipt": receipt,
                     "bank_transaction": best_match,
                     "confidence": best_confidence,
-                    "match_type": "semantic"
+                    "match_type": "fuzzy"
                 })
                 used_receipts.add(receipt['transaction_id'])
                 used_bank_transactions.add(best_match['transaction_id'])
             else:
                 logger.debug(f"No match for receipt: {receipt.get('vendor_name')} (${receipt.get('amount', 0)})")
         
+        return matches
+
+    def _commit_ranked(self, ledger_transactions: List[Dict], bank_transactions: List[Dict],
+                       ranked: List[List[Tuple[int, float]]], stats: Dict[str, Any]) -> List[Dict]:
+        """Turn ``rank_candidates`` output into fuzzy-tier matches using ``self.strategy``."""
+        pairs = self._select_pairs(
+            ranked,
+            [r['transaction_id'] for r in ledger_transactions],
+            [b['transaction_id'] for b in bank_transactions],
+            stats
+        )
+        return [{
+            "receipt": ledger_transactions[receipt_pos],
+            "bank_transaction": bank_transactions[position],
+            "confidence": confidence,
+            "match_type": "fuzzy"
+        } for receipt_pos, position, confidence in pairs]
+
+    def _select_pairs(self, ranked: List[List[Tuple[int, float]]], receipt_keys: Sequence, bank_keys: Sequence,
+                      stats: Dict[str, Any]) -> List[Tuple[int, int, float]]:
+        """Pick (receipt_pos, bank_pos, confidence) pairs so that no receipt key
+        or bank key is used twice."""
+        if self.strategy == 'greedy':
+            pairs = []
+            used_bank_transactions = set()
+            used_receipts = set()
+            for receipt_pos, candidates in enumerate(ranked):
+                if receipt_keys[receipt_pos] in used_receipts:
+                    continue
+                for position, confidence in candidates:
+                    if bank_keys[position] in used_bank_transactions:
+                        continue
+                    pairs.append((receipt_pos, position, confidence))
+                    used_receipts.add(receipt_keys[receipt_pos])
+                    used_bank_transactions.add(bank_keys[position])
+                    break
+            return pairs
+
+        # Graph nodes are the keys, so duplicated transaction ids can still only match once.
+        receipt_nodes: Dict[Any, int] = {}
+        bank_nodes: Dict[Any, int] = {}
+        best_edges: Dict[Tuple[int, int], Tuple[float, int, int]] = {}
+        for receipt_pos, candidates in enumerate(ranked):
+            row = receipt_nodes.setdefault(receipt_keys[receipt_pos], len(receipt_nodes))
+            for position, confidence in candidates:
+                col = bank_nodes.setdefault(bank_keys[position], len(bank_nodes))
+                if (row, col) not in best_edges or confidence > best_edges[(row, col)][0]:
+                    best_edges[(row, col)] = (confidence, receipt_pos, position)
+
+        assigned, solver_stats = optimal_assignment(
+            [(row, col, edge[0]) for (row, col), edge in best_edges.items()],
+            len(receipt_nodes), self.max_assignment_component_cells
+        )
+        stats["assignment"] = dict(solver_stats, edges=len(best_edges))
+        pairs = []
+        for row, col, _ in assigned:
+            confidence, receipt_pos, position = best_edges[(row, col)]
+            pairs.append((receipt_pos, position, confidence))
+        pairs.sort()
+        return pairs
+
+    def _match_semantic(self, ledger_transactions: List[Dict], bank_transactions: List[Dict], stats: Dict[str, Any]) -> List[Dict]:
+        try:
+            candidates = self.intelligent_matcher.find_matches(
+                ledger_transactions, bank_transactions,
+                top_k=self.semantic_top_k, threshold=self.semantic_threshold
+            )
+        except Exception as e:
+            logger.warning(f"Semantic matching tier skipped: {e}")
+            return []
+
+        matches = []
+        used_bank_transactions = set()
+        used_receipts = set()
+        # find_matches returns each receipt's neighbours best-first, receipts in input order.
+        for candidate in candidates:
+            receipt, bank_txn = candidate['receipt'], candidate['bank_transaction']
+            if receipt['transaction_id'] in used_receipts or bank_txn['transaction_id'] in used_bank_transactions:
+                continue
+            if not self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0)):
+                continue
+            matches.append(candidate)
+            used_receipts.add(receipt['transaction_id'])
+            used_bank_transactions.add(bank_txn['transaction_id'])
+        return matches
+
+    def reconcile_tables(self, ledger: TransactionTable, bank: TransactionTable) -> Dict[str, Any]:
+        """``reconcile_transactions`` over columnar tables.
+
+        Amounts and dates are compared as integer cents and epoch days, and
+        each distinct (vendor, description) pair is scored once. Results are
+        row numbers: ``matches`` holds ``(ledger_row, bank_row, confidence,
+        match_type)`` tuples and ``unmatched_ledger`` / ``unmatched_bank`` are
+        row arrays.
+        """
+        ledger_open = np.ones(len(ledger), dtype=bool)
+        bank_open = np.ones(len(bank), dtype=bool)
+        matches: List[Tuple[int, int, float, str]] = []
+        stats: Dict[str, Any] = {
+            "receipts": len(ledger),
+            "bank_transactions": len(bank),
+            "pairs_total": 0,
+            "pairs_candidate": 0,
+            "pairs_scored": 0,
+            "pairs_pruned": 0,
+            "tiers": {},
+        }
+        tier_methods = {
+            'exact': self._match_exact_table,
+            'fuzzy': self._match_fuzzy_table,
+            'semantic': self._match_semantic_table,
+        }
+
+        for tier in self.TIERS:
+            if tier not in self.tiers:
+                continue
+            rows, cols = np.flatnonzero(ledger_open), np.flatnonzero(bank_open)
+            started = time.perf_counter()
+            tier_matches = tier_methods[tier](ledger, rows, bank, cols, stats) if len(rows) and len(cols) else []
+            for ledger_row, bank_row, _, _ in tier_matches:
+                ledger_open[ledger_row] = False
+                bank_open[bank_row] = False
+            matches.extend(tier_matches)
+            stats["tiers"][tier] = {
+                "receipts": len(rows),
+                "bank_transactions": len(cols),
+                "matches": len(tier_matches),
+                "seconds": time.perf_counter() - started,
+            }
+
+        stats["pairs_pruned"] = stats["pairs_total"] - stats["pairs_scored"]
+        self.last_run_stats = stats
+        logger.info("Reconciliation tiers: " + ", ".join(
+            f"{tier} {tier_stats['matches']}/{tier_stats['receipts']} in {tier_stats['seconds']:.2f}s"
+            for tier, tier_stats in stats["tiers"].items()
+        ))
         return {
             "matches": matches,
-            "unmatched_ledger": [r for r in ledger_transactions if r['transaction_id'] not in used_receipts],
-            "unmatched_bank": [b for b in bank_transactions if b['transaction_id'] not in used_bank_transactions]
+            "unmatched_ledger": np.flatnonzero(ledger_open),
+            "unmatched_bank": np.flatnonzero(bank_open),
         }
 
+    def _match_exact_table(self, ledger: TransactionTable, rows: np.ndarray, bank: TransactionTable, cols: np.ndarray,
+                           stats: Dict[str, Any]) -> List[Tuple[int, int, float, str]]:
+        receipt_keys: Dict[Tuple[int, int], List[int]] = {}
+        for row, cents, days in zip(rows.tolist(), ledger.amount_cents[rows].tolist(), ledger.date_days[rows].tolist()):
+            if cents not in (0, MISSING_CENTS) and days != MISSING_DAYS:
+                receipt_keys.setdefault((abs(cents), days), []).append(row)
+
+        bank_keys: Dict[Tuple[int, int], List[int]] = {}
+        for col, cents, days in zip(cols.tolist(), bank.amount_cents[cols].tolist(), bank.date_days[cols].tolist()):
+            key = (abs(cents), days)
+            if key in receipt_keys and cents != MISSING_CENTS:
+                bank_keys.setdefault(key, []).append(col)
+
+        return [
+            (receipt_rows[0], bank_keys[key][0], 1.0, "exact")
+            for key, receipt_rows in receipt_keys.items()
+            if len(receipt_rows) == 1 and len(bank_keys.get(key, ())) == 1
+        ]
+
+    def _match_fuzzy_table(self, ledger: TransactionTable, rows: np.ndarray, bank: TransactionTable, cols: np.ndarray,
+                           stats: Dict[str, Any]) -> List[Tuple[int, int, float, str]]:
+        stats["pairs_total"] += len(rows) * len(cols)
+        valid = bank.amount_cents[cols] != MISSING_CENTS
+        bank_rows = cols[valid]
+        bank_abs = np.abs(bank.amount_cents[bank_rows])
+        order = np.argsort(bank_abs, kind='stable')
+        sorted_abs, sorted_rows = bank_abs[order], bank_rows[order]
+
+        # (score, cutoff it holds for): exact scores hold for any cutoff, an
+        # understated one only for cutoffs at least as high as when computed.
+        vendor_scores: Dict[Tuple[int, int], Tuple[float, int]] = {}
+        ranked: List[List[Tuple[int, float]]] = []
+        for row in rows.tolist():
+            cents = int(ledger.amount_cents[row])
+            if cents in (0, MISSING_CENTS):
+                ranked.append([])
+                continue
+            variance = max(abs(cents) * self.amount_tolerance_percent, 100.0)
+            lo = np.searchsorted(sorted_abs, abs(cents) - variance, side='left')
+            hi = np.searchsorted(sorted_abs, abs(cents) + variance, side='right')
+            candidates = np.sort(sorted_rows[lo:hi])
+            stats["pairs_candidate"] += len(candidates)
+            stats["pairs_scored"] += len(candidates)
+            if not len(candidates):
+                ranked.append([])
+                continue
+
+            # Back to float amounts so scores equal the dict path's bit for bit.
+            receipt_amount = cents / 100
+            bank_abs = np.abs(bank.amount_cents[candidates]) / 100
+            amount_score = np.maximum(0, 1 - np.abs(receipt_amount - bank_abs) / receipt_amount)
+
+            text_id = int(ledger.text_ids[row])
+            vendor_score = np.empty(len(candidates))
+            cutoffs = BatchSimilarityScorer.vendor_cutoffs(amount_score, self.match_threshold).tolist()
+            for k, (desc_id, cutoff) in enumerate(zip(bank.text_ids[candidates].tolist(), cutoffs)):
+                cached = vendor_scores.get((text_id, desc_id))
+                if cached is not None and cutoff >= cached[1]:
+                    score = cached[0]
+                else:
+                    score = self._vendor_score(ledger.texts[text_id], bank.texts[desc_id], cutoff)
+                    vendor_scores[(text_id, desc_id)] = (score, 0 if round(score * 100) >= cutoff else cutoff)
+                vendor_score[k] = score
+            confidence = (0.8 * 0.2) + (amount_score * 0.4) + (vendor_score * 0.4)
+            keep = confidence > self.match_threshold
+            kept_rows, kept_confidence = candidates[keep], confidence[keep]
+            best_first = np.lexsort((kept_rows, -kept_confidence))
+            ranked.append(list(zip(kept_rows[best_first].tolist(), kept_confidence[best_first].tolist())))
+
+        pairs = self._select_pairs(ranked, range(len(rows)), range(len(bank)), stats)
+        return [(int(rows[receipt_pos]), bank_row, confidence, "fuzzy") for receipt_pos, bank_row, confidence in pairs]
+
+    def _match_semantic_table(self, ledger: TransactionTable, rows: np.ndarray, bank: TransactionTable, cols: np.ndarray,
+                              stats: Dict[str, Any]) -> List[Tuple[int, int, float, str]]:
+        receipts, bank_transactions = ledger.rows(rows), bank.rows(cols)
+        ledger_rows = {id(r): int(row) for r, row in zip(receipts, rows)}
+        bank_rows = {id(b): int(col) for b, col in zip(bank_transactions, cols)}
+        return [
+            (ledger_rows[id(m['receipt'])], bank_rows[id(m['bank_transaction'])], m['confidence'], m['match_type'])
+            for m in self._match_semantic(receipts, bank_transactions, stats)
+        ]
+
+    def rank_candidates(self, ledger_transactions: List[Dict], bank_transactions: List[Dict]) -> List[List[Tuple[int, float]]]:
+        """Score every amount-compatible pair without committing to a match.
+
+        Returns, per receipt, the ``(bank_position, confidence)`` pairs above
+        ``match_threshold`` ordered best-first with ties by bank position, which
+        is exactly the preference order the greedy loop in
+        ``reconcile_transactions`` applies.
+        """
+        bank_index = AmountCandidateIndex(bank_transactions, self.amount_tolerance_percent)
+        stats = {"pairs_candidate": 0, "pairs_scored": 0}
+        scorer = None
+        if self.scoring == 'vectorized':
+            scorer = BatchSimilarityScorer(ledger_transactions, bank_transactions, self.vendor_registry)
+        block_scores: Dict[int, Dict[int, float]] = {}
+
+        ranked = []
+        for receipt_pos, receipt in enumerate(ledger_transactions):
+            if scorer is not None:
+                if receipt_pos not in block_scores:
+                    block_scores = self._score_receipt_block(scorer, bank_index, ledger_transactions, receipt_pos, stats)
+                scored = list(block_scores[receipt_pos].items())
+            else:
+                scored = []
+                for position in bank_index.candidates(receipt.get('amount', 0)):
+                    stats["pairs_candidate"] += 1
+                    bank_txn = bank_transactions[position]
+                    if not self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0)):
+                        continue
+                    scored.append((position, self._calculate_similarity(receipt, bank_txn, self.match_threshold)))
+                    stats["pairs_scored"] += 1
+            ranked.append(sorted(
+                ((position, confidence) for position, confidence in scored if confidence > self.match_threshold),
+                key=lambda pair: (-pair[1], pair[0])
+            ))
+
+        self.last_run_stats = stats
+        return ranked
+
+    def suggest_candidates(self, sources: List[Dict], targets: List[Dict], k: int = 3, min_score: float = 0.5,
+                           direction: str = 'receipt') -> List[Dict]:
+        """Top-k scored counterparts for each source transaction, with score breakdowns.
+
+        ``direction='receipt'`` suggests bank lines for receipts, ``'bank'``
+        suggests receipts for bank lines. Only amount-blocked candidates are
+        scored and a k-sized heap keeps the best, ties going to the earlier
+        target.
+        """
+        if direction not in ('receipt', 'bank'):
+            raise ValueError(f"Unknown suggestion direction '{direction}', expected 'receipt' or 'bank'")
+        pct = self.amount_tolerance_percent
+        # The tolerance is relative to the receipt amount, so looking receipts
+        # up from a bank amount needs the wider pct / (1 - pct) window.
+        index = AmountCandidateIndex(targets, pct if direction == 'receipt' else pct / (1 - pct))
+
+        suggestions = []
+        for source in sources:
+            scored = self._scored_candidates(source, targets, index.candidates(source.get('amount', 0)), direction, min_score)
+            top = heapq.nlargest(k, scored, key=lambda item: (item[0], item[1]))
+            if top:
+                suggestions.append({
+                    "source": source,
+                    "direction": direction,
+                    "candidates": [
+                        {"transaction": target, "confidence": confidence, "breakdown": dict(breakdown, days_apart=self._days_apart(source, target))}
+                        for confidence, _, target, breakdown in top
+                    ]
+                })
+        return suggestions
+
+    def rank_counterparts(self, source: Dict, targets: List[Dict], direction: str = 'receipt',
+                          peers: Sequence[Dict] = ()) -> List[Tuple[int, float, str]]:
+        """Match preferences for one transaction among open counterparts.
+
+        Applies the exact and fuzzy tiers to a single source: a target sharing
+        its (amount, date) key is an exact match when it is the only one and no
+        open ``peer`` on the source's side shares the key either; otherwise
+        every target scoring above ``match_threshold`` follows as a fuzzy match.
+        Returns ``(target_position, confidence, match_type)`` best-first, ties
+        going to the earlier target.
+        """
+        if direction not in ('receipt', 'bank'):
+            raise ValueError(f"Unknown match direction '{direction}', expected 'receipt' or 'bank'")
+        if 'exact' in self.tiers:
+            key = self._exact_key(source.get('amount'), source.get('transaction_date'))
+            if key is not None:
+                same_key = [p for p, t in enumerate(targets) if self._exact_key(t.get('amount'), t.get('transaction_date')) == key]
+                peer_keys = (self._exact_key(p.get('amount'), p.get('transaction_date')) for p in peers if p is not source)
+                if len(same_key) == 1 and key not in peer_keys:
+                    return [(same_key[0], 1.0, 'exact')]
+
+        ranked = []
+        if 'fuzzy' in self.tiers:
+            for position, target in enumerate(targets):
+                receipt, bank_txn = (source, target) if direction == 'receipt' else (target, source)
+                if not self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0)):
+                    continue
+                confidence = self._calculate_similarity(receipt, bank_txn, self.match_threshold)
+                if confidence > self.match_threshold:
+                    ranked.append((position, confidence, 'fuzzy'))
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked
+
+    def _scored_candidates(self, source: Dict, targets: List[Dict], positions: List[int], direction: str,
+                           min_score: float) -> Iterator[Tuple[float, int, Dict, Dict[str, float]]]:
+        for position in positions:
+            target = targets[position]
+            receipt, bank_txn = (source, target) if direction == 'receipt' else (target, source)
+            if not self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0)):
+                continue
+            breakdown = self._similarity_breakdown(receipt, bank_txn, min_score, inclusive=True)
+            if breakdown and breakdown['confidence'] >= min_score:
+                yield breakdown['confidence'], -position, target, breakdown
+
+    def _days_apart(self, first: Dict, second: Dict) -> Optional[int]:
+        first_date = self._parse_date(first.get('transaction_date'))
+        second_date = self._parse_date(second.get('transaction_date'))
+        if first_date is None or second_date is None:
+            return None
+        return abs((first_date.date() - second_date.date()).days)
+
+    def _score_receipt_block(self, scorer: BatchSimilarityScorer, bank_index: AmountCandidateIndex,
+                             ledger_transactions: List[Dict], start: int, stats: Dict[str, int]) -> Dict[int, Dict[int, float]]:
+        rows = list(range(start, min(start + self.score_block_size, len(ledger_transactions))))
+        row_candidates = [bank_index.candidates(ledger_transactions[r].get('amount', 0)) for r in rows]
+        cols = sorted(set().union(*row_candidates))
+        col_offsets = {position: k for k, position in enumerate(cols)}
+
+        mask = np.zeros((len(rows), len(cols)), dtype=bool)
+        for i, candidates in enumerate(row_candidates):
+            mask[i, [col_offsets[p] for p in candidates]] = True
+        mask &= scorer.compatible(rows, cols, self.amount_tolerance_percent)
+        scores = scorer.score_block(rows, cols, mask, self.match_threshold)
+
+        stats["pairs_candidate"] += sum(len(c) for c in row_candidates)
+        stats["pairs_scored"] += int(mask.sum())
+
+        block = {}
+        for i, receipt_pos in enumerate(rows):
+            block[receipt_pos] = {cols[j]: float(scores[i, j]) for j in np.flatnonzero(mask[i])}
+        return block
+
+    def reconcile_stream(self, ledger_transactions: Iterable[Dict], bank_transactions: Iterable[Dict]) -> Iterator[Tuple[str, Dict]]:
+        """Merge-join two date-sorted streams, holding only a +/- date_tolerance_days
+        window of bank transactions in memory.
+
+        Yields ("match", match), ("unmatched_ledger", receipt) and
+        ("unmatched_bank", bank_transaction) events as soon as they are decided.
+        """
+        tolerance = timedelta(days=self.date_tolerance_days)
+        window: "OrderedDict[str, Tuple[datetime, Dict]]" = OrderedDict()
+        bank_iter = iter(bank_transactions)
+        pending_bank = next(bank_iter, None)
+        stats = {"receipts": 0, "bank_transactions": 0, "matches": 0, "pairs_scored": 0, "peak_window": 0}
+        self.last_run_stats = stats
+
+        for receipt in ledger_transactions:
+            stats["receipts"] += 1
+            receipt_date = self._parse_date(receipt.get('transaction_date'))
+            if receipt_date is None:
+                yield "unmatched_ledger", receipt
+                continue
+
+            while pending_bank is not None:
+                bank_date = self._parse_date(pending_bank.get('transaction_date'))
+                if bank_date is not None and bank_date > receipt_date + tolerance:
+                    break
+                stats["bank_transactions"] += 1
+                if bank_date is None:
+                    yield "unmatched_bank", pending_bank
+                else:
+                    window[pending_bank['transaction_id']] = (bank_date, pending_bank)
+                pending_bank = next(bank_iter, None)
+            stats["peak_window"] = max(stats["peak_window"], len(window))
+
+            while window:
+                oldest_id, (oldest_date, oldest_bank) = next(iter(window.items()))
+                if oldest_date >= receipt_date - tolerance:
+                    break
+                del window[oldest_id]
+                yield "unmatched_bank", oldest_bank
+
+            best_match = None
+            best_confidence = 0.0
+            for bank_date, bank_txn in window.values():
+                if not self._amounts_compatible(receipt.get('amount', 0), bank_txn.get('amount', 0)):
+                    continue
+                if not self._is_date_within_tolerance(receipt_date, bank_date):
+                    continue
+                confidence = self._calculate_similarity(receipt, bank_txn, self.match_threshold)
+                stats["pairs_scored"] += 1
+                if confidence > self.match_threshold and confidence > best_confidence:
+                    best_match = bank_txn
+                    best_confidence = confidence
+
+            if best_match:
+                del window[best_match['transaction_id']]
+                stats["matches"] += 1
+                yield "match", {
+                    "receipt": receipt,
+                    "bank_transaction": best_match,
+                    "confidence": best_confidence,
+                    "match_type": "fuzzy"
+                }
+            else:
+                yield "unmatched_ledger", receipt
+
+        for _, bank_txn in window.values():
+            yield "unmatched_bank", bank_txn
+        while pending_bank is not None:
+            stats["bank_transactions"] += 1
+            yield "unmatched_bank", pending_bank
+            pending_bank = next(bank_iter, None)
+
+        logger.info(f"Streaming reconciliation matched {stats['matches']} of {stats['receipts']} receipts (peak window {stats['peak_window']} bank transactions)")
+
+    def _parse_date(self, value) -> Optional[datetime]:
+        return GeneralHelpers.parse_date(value)
+
     def _safe_date_diff(self, date1, date2):
         try:
-            if isinstance(date1, dict) and '$date' in date1:
-                date1 = datetime.fromtimestamp(date1['$date'] / 1000)
-            elif isinstance(date1, str):
-                date1 = datetime.fromisoformat(date1.replace('Z', '+00:00'))
-            
-            if isinstance(date2, dict) and '$date' in date2:
-                date2 = datetime.fromtimestamp(date2['$date'] / 1000)
-            elif isinstance(date2, str):
-                date2 = datetime.fromisoformat(date2.replace('Z', '+00:00'))
+            if isinstance(date1, (dict, str)):
+                date1 = self._parse_date(date1)
+            if isinstance(date2, (dict, str)):
+                date2 = self._parse_date(date2)
                 
             return abs((date1 - date2).days)
         except Exception as e:
             logger.warning(f"Date parsing failed: {e}")
             return 999
 
-    def _calculate_similarity(self, receipt: Dict, bank: Dict) -> float:
+    def _calculate_similarity(self, receipt: Dict, bank: Dict, min_confidence: Optional[float] = None) -> float:
+        breakdown = self._similarity_breakdown(receipt, bank, min_confidence)
+        return breakdown['confidence'] if breakdown else 0.0
+
+    def _similarity_breakdown(self, receipt: Dict, bank: Dict, min_confidence: Optional[float] = None,
+                              inclusive: bool = False) -> Optional[Dict[str, float]]:
+        """Score one pair. With ``min_confidence`` the fuzzy vendor comparison
+        may stop early, and a pair that cannot exceed it (or reach it, if
+        ``inclusive``) comes back with an understated vendor score; pairs that
+        can are scored exactly."""
         try:
             receipt_vendor = str(receipt.get('vendor_name', '')).upper()
             bank_desc = str(bank.get('description', '')).upper()
             
-            vendor_mappings = {
-                'USB': 'AMAZON',
-                'FUEL': 'SHELL',
-                'TAX': 'WALMART',
-            }
-            
-            if receipt_vendor in vendor_mappings:
-                receipt_vendor = vendor_mappings[receipt_vendor]
-            
-            if receipt_vendor in bank_desc or any(word in bank_desc for word in receipt_vendor.split()):
-                vendor_score = 0.9
-            else:
-                vendor_score = fuzz.token_set_ratio(receipt_vendor, bank_desc) / 100.0
-            
             date_score = 0.8 
             
             receipt_amount = float(receipt.get('amount', 0))
             bank_amount = float(bank.get('amount', 0))
             
             if receipt_amount == 0:
-                return 0.0 
+                return None 
             
             bank_abs = abs(bank_amount)
             amount_diff = abs(receipt_amount - bank_abs) / receipt_amount
             amount_score = max(0, 1 - amount_diff)
             
+            cutoff = None if min_confidence is None else self._vendor_cutoff(amount_score, min_confidence, inclusive)
+            vendor_score = self._vendor_score(receipt_vendor, bank_desc, cutoff)
+            
             final_score = (date_score * 0.2) + (amount_score * 0.4) + (vendor_score * 0.4)
             
-            logger.info(f"Similarity: {receipt_vendor} vs {bank_desc} = {final_score:.2f} (vendor:{vendor_score:.2f}, amount:{amount_score:.2f})")
+            logger.debug("Similarity: %s vs %s = %.2f (vendor:%.2f, amount:%.2f)", receipt_vendor, bank_desc, final_score, vendor_score, amount_score)
             
-            return final_score
+            return {
+                'confidence': final_score,
+                'vendor_score': vendor_score,
+                'amount_score': amount_score,
+                'date_score': date_score,
+            }
             
         except Exception as e:
             logger.error(f"Similarity calculation failed: {e}")
-            return 0.0
+            return None
+
+    def _vendor_cutoff(self, amount_score: float, min_confidence: float, inclusive: bool = False) -> int:
+        """Smallest token-set ratio (0-100) that still lets a pair with this
+        amount score exceed ``min_confidence``, or reach it if ``inclusive``.
+        Evaluated with the scoring expression itself so rounding agrees."""
+        base = (0.8 * 0.2) + (amount_score * 0.4)
+        estimate = int((min_confidence - base) / 0.4 * 100)
+        for ratio in range(max(estimate - 2, 0), 101):
+            confidence = base + ((ratio / 100.0) * 0.4)
+            if confidence >= min_confidence if inclusive else confidence > min_confidence:
+                return ratio
+        return 101
+
+    def _vendor_score(self, receipt_vendor: str, bank_desc: str, cutoff: Optional[int] = None) -> float:
+        """0.9 for the same vendor, else the token-set ratio, which is only
+        exact when it reaches ``cutoff``."""
+        registry = self.vendor_registry
+        receipt_vendor_id = registry.resolve(receipt_vendor)
+        if receipt_vendor_id is not None:
+            if registry.resolve(bank_desc) == receipt_vendor_id:
+                return 0.9
+            receipt_vendor = registry.name(receipt_vendor_id)
+        if receipt_vendor in bank_desc or any(word in bank_desc for word in receipt_vendor.split()):
+            return 0.9
+        return self.token_set_scorer.score(receipt_vendor, bank_desc, cutoff) / 100.0
 
     def _amounts_compatible(self, receipt_amount, bank_amount):
         if receipt_amount == 0: 
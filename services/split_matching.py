@@ -0,0 +1,148 @@
+import bisect
+import math
+import time
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from utils.helpers import GeneralHelpers
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (amount in cents, day ordinal, position in the caller's list)
+_Item = Tuple[int, int, int]
+
+
+class SplitPaymentMatcher:
+    """Matches one bank line to several receipts (a combined card charge) and
+    one receipt to several bank lines (instalments) when amounts sum exactly.
+
+    Subsets are found by meet-in-the-middle on integer cents: every subset of
+    up to half the group size is indexed by its sum, then each half is paired
+    with a disjoint complementary half. Only an unambiguous smallest subset
+    is accepted. Candidate pools are limited to the date window and to the
+    ``max_candidates`` nearest in date, and the whole search stops at
+    ``time_limit_seconds``.
+    """
+
+    DIRECTIONS = ('many_to_one', 'one_to_many')
+
+    def __init__(self, date_tolerance_days: int = 7, max_group_size: int = 4, max_candidates: int = 24,
+                 amount_tolerance_cents: int = 0, time_limit_seconds: float = 5.0, confidence: float = 0.8):
+        if max_group_size < 2:
+            raise ValueError("max_group_size must be at least 2")
+        self.date_tolerance_days = date_tolerance_days
+        self.max_group_size = max_group_size
+        self.max_candidates = max_candidates
+        self.amount_tolerance_cents = amount_tolerance_cents
+        self.time_limit_seconds = time_limit_seconds
+        self.confidence = confidence
+        self.last_run_stats: Dict[str, Any] = {}
+
+    def match(self, receipts: List[Dict], bank_transactions: List[Dict]) -> List[Dict]:
+        """Return split groups; no receipt or bank line appears in more than one group."""
+        deadline = time.perf_counter() + self.time_limit_seconds
+        stats = {"targets_searched": 0, "groups": 0, "timed_out": False}
+        receipt_items = self._items(receipts)
+        bank_items = self._items(bank_transactions)
+        used_receipts: set = set()
+        used_bank: set = set()
+
+        groups = []
+        for direction, targets, parts, used_targets, used_parts in (
+            ('many_to_one', bank_items, receipt_items, used_bank, used_receipts),
+            ('one_to_many', receipt_items, bank_items, used_receipts, used_bank),
+        ):
+            parts_by_day = sorted(parts, key=lambda item: (item[1], item[2]))
+            part_days = [item[1] for item in parts_by_day]
+            for target in sorted(targets, key=lambda item: item[2]):
+                if time.perf_counter() > deadline:
+                    stats["timed_out"] = True
+                    break
+                if target[2] in used_targets:
+                    continue
+                stats["targets_searched"] += 1
+                subset = self._find_subset(target, self._candidates(target, parts_by_day, part_days, used_parts))
+                if subset is None:
+                    continue
+
+                used_targets.add(target[2])
+                used_parts.update(item[2] for item in subset)
+                if direction == 'many_to_one':
+                    group_receipts = [receipts[item[2]] for item in subset]
+                    group_bank = [bank_transactions[target[2]]]
+                else:
+                    group_receipts = [receipts[target[2]]]
+                    group_bank = [bank_transactions[item[2]] for item in subset]
+                groups.append({
+                    "group_id": GeneralHelpers.generate_unique_id("split"),
+                    "receipts": group_receipts,
+                    "bank_transactions": group_bank,
+                    "confidence": self.confidence,
+                    "direction": direction,
+                    "match_type": "split"
+                })
+
+        stats["groups"] = len(groups)
+        self.last_run_stats = stats
+        logger.info(f"Split matching found {len(groups)} groups from {stats['targets_searched']} targets"
+                    + (" (time limit reached)" if stats["timed_out"] else ""))
+        return groups
+
+    def _items(self, transactions: Sequence[Dict]) -> List[_Item]:
+        items = []
+        for position, txn in enumerate(transactions):
+            amount = GeneralHelpers.parse_amount(txn.get('amount'))
+            txn_date = GeneralHelpers.parse_date(txn.get('transaction_date'))
+            if not amount or math.isnan(amount) or txn_date is None:
+                continue
+            items.append((int(round(abs(amount) * 100)), txn_date.date().toordinal(), position))
+        return items
+
+    def _candidates(self, target: _Item, parts_by_day: List[_Item], part_days: List[int], used_parts: set) -> List[_Item]:
+        lo = bisect.bisect_left(part_days, target[1] - self.date_tolerance_days)
+        hi = bisect.bisect_right(part_days, target[1] + self.date_tolerance_days)
+        limit = target[0] + self.amount_tolerance_cents
+        pool = [item for item in parts_by_day[lo:hi] if item[0] < limit and item[2] not in used_parts]
+        if len(pool) > self.max_candidates:
+            pool = sorted(pool, key=lambda item: (abs(item[1] - target[1]), item[2]))[:self.max_candidates]
+        return sorted(pool, key=lambda item: item[2])
+
+    def _find_subset(self, target: _Item, candidates: List[_Item]) -> Optional[List[_Item]]:
+        if len(candidates) < 2:
+            return None
+        half = (self.max_group_size + 1) // 2
+        limit = target[0] + self.amount_tolerance_cents
+
+        # Index every subset of up to ``half`` candidates by its sum; the empty
+        # subset lets a single half cover the whole target.
+        by_sum: Dict[int, List[Tuple[int, ...]]] = {0: [()]}
+        for size in range(1, half + 1):
+            for combo in combinations(range(len(candidates)), size):
+                total = sum(candidates[i][0] for i in combo)
+                if total <= limit:
+                    by_sum.setdefault(total, []).append(combo)
+
+        # Smallest group wins; two different subsets of that size mean the
+        # amounts alone cannot tell which receipts belong together.
+        best_size, solutions = None, set()
+        for left_total, lefts in by_sum.items():
+            for offset in range(-self.amount_tolerance_cents, self.amount_tolerance_cents + 1):
+                rights = by_sum.get(target[0] + offset - left_total)
+                if not rights:
+                    continue
+                for left in lefts:
+                    if not left:
+                        continue
+                    for right in rights:
+                        # Right half strictly after the left one keeps the halves disjoint.
+                        if right and right[0] <= left[-1]:
+                            continue
+                        size = len(left) + len(right)
+                        if size < 2 or size > self.max_group_size or (best_size is not None and size > best_size):
+                            continue
+                        if best_size is None or size < best_size:
+                            best_size, solutions = size, set()
+                        solutions.add(left + right)
+        if len(solutions) != 1:
+            return None
+        return [candidates[i] for i in solutions.pop()]
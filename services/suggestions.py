@@ -0,0 +1,40 @@
+from typing import Dict, List, Optional
+from .reconciliation import AdvancedReconciliationEngine
+from database.operations import (
+    get_open_receipt_transactions, get_open_bank_transactions, replace_suggestions,
+    get_suggestion_page, count_pending_suggestions
+)
+from config.settings import AppSettings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestionService:
+    """Precomputes top-k candidates for open transactions in both directions
+    and stores them as pending 'suggested' matches, so reviewers page through
+    stored rows instead of re-scoring."""
+
+    DIRECTIONS = ('receipt', 'bank')
+
+    def __init__(self, engine: AdvancedReconciliationEngine = None, k: Optional[int] = None, min_score: Optional[float] = None):
+        self.engine = engine or AdvancedReconciliationEngine()
+        self.k = k or AppSettings.SUGGESTION_TOP_K
+        self.min_score = min_score if min_score is not None else AppSettings.SUGGESTION_MIN_SCORE
+
+    def generate(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        open_receipts = get_open_receipt_transactions()
+        open_bank = get_open_bank_transactions()
+
+        stored = {}
+        for direction, sources, targets in (('receipt', open_receipts, open_bank), ('bank', open_bank, open_receipts)):
+            suggestions = self.engine.suggest_candidates(sources, targets, k=self.k, min_score=self.min_score, direction=direction)
+            stored[direction] = replace_suggestions(direction, [s['_id'] for s in sources], suggestions, run_id=run_id)
+        logger.info(f"Stored {stored['receipt']} receipt and {stored['bank']} bank transaction suggestions")
+        return stored
+
+    def page(self, direction: str = 'receipt', page: int = 0, page_size: int = 20) -> List[Dict]:
+        return get_suggestion_page(direction, page, page_size)
+
+    def count(self, direction: str = 'receipt') -> int:
+        return count_pending_suggestions(direction)
@@ -0,0 +1,130 @@
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from fuzzywuzzy import fuzz, utils
+from models.transaction_table import InternTable
+
+
+class TokenSetScorer:
+    """``fuzz.token_set_ratio`` over texts tokenized once.
+
+    Each text is normalized the way fuzzywuzzy does it (``full_process`` with
+    ``force_ascii``) the first time it is seen, and kept as a tuple of
+    interned token ids in sorted token order plus their id set. Scoring a
+    pair then only partitions two small id tuples.
+
+    Of the three ratios token_set_ratio takes the maximum of, the two that
+    compare the sorted intersection with each combined string have a closed
+    form: the intersection is a prefix of both strings, so every character
+    of it matches. Only the third ratio needs the sequence matcher; given a
+    ``cutoff`` it is skipped whenever a character-count upper bound shows it
+    cannot raise the result or reach the cutoff. Scores are identical to
+    fuzzywuzzy's.
+    """
+
+    # difflib's popularity heuristic only applies from 200 characters on; past
+    # that the closed form is not guaranteed, so those strings go to fuzz.ratio.
+    _PREFIX_FORM_MAX_LENGTH = 200
+
+    def __init__(self, max_cached_pairs: int = 500000):
+        self.tokens = InternTable()
+        self.max_cached_pairs = max_cached_pairs
+        self._text_ids: Dict[str, int] = {}
+        self._token_ids: List[Tuple[int, ...]] = []
+        self._token_sets: List[FrozenSet[int]] = []
+        # (a, b) -> (lower, upper) bounds on the ratio; equal once it is exact.
+        self._pairs: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self.stats = {'pairs': 0, 'cached': 0, 'closed_form': 0, 'pruned': 0, 'sequence_matcher': 0}
+
+    def add(self, text: str) -> int:
+        """Id of ``text``, tokenizing it on first sight."""
+        text_id = self._text_ids.get(text)
+        if text_id is None:
+            processed = utils.full_process(text, force_ascii=True) if text is not None else ''
+            token_ids = tuple(self.tokens.intern(token) for token in sorted(set(processed.split())))
+            text_id = len(self._token_ids)
+            self._text_ids[text] = text_id
+            self._token_ids.append(token_ids)
+            self._token_sets.append(frozenset(token_ids))
+        return text_id
+
+    def score(self, text: str, other: str, cutoff: Optional[int] = None) -> int:
+        return self.score_ids(self.add(text), self.add(other), cutoff)
+
+    def score_block(self, text: Union[str, int], others: Sequence[Union[str, int]],
+                    cutoffs: Union[None, int, Sequence[int]] = None) -> np.ndarray:
+        """Scores of one text against a block of others (texts or ids).
+
+        ``cutoffs`` is a scalar or one value per entry. An entry whose score
+        is provably below its cutoff holds some smaller value instead of the
+        exact score; every other entry is exact.
+        """
+        text_id = text if isinstance(text, (int, np.integer)) else self.add(text)
+        if cutoffs is None or np.isscalar(cutoffs):
+            cutoffs = [cutoffs] * len(others)
+        scores = np.empty(len(others), dtype=np.int64)
+        for k, (other, cutoff) in enumerate(zip(others, cutoffs)):
+            other_id = other if isinstance(other, (int, np.integer)) else self.add(other)
+            scores[k] = self.score_ids(int(text_id), int(other_id), None if cutoff is None else int(cutoff))
+        return scores
+
+    def score_ids(self, text_id: int, other_id: int, cutoff: Optional[int] = None) -> int:
+        self.stats['pairs'] += 1
+        key = (text_id, other_id)
+        bounds = self._pairs.get(key)
+        if bounds is not None:
+            lower, upper = bounds
+            if lower == upper or (cutoff is not None and upper < cutoff):
+                self.stats['cached'] += 1
+                return lower
+
+        tokens1, tokens2 = self._token_ids[text_id], self._token_ids[other_id]
+        if not tokens1 or not tokens2:
+            return self._remember(key, 0, 0)
+
+        set1, set2 = self._token_sets[text_id], self._token_sets[other_id]
+        values = self.tokens.values
+        sorted_sect = " ".join(values[t] for t in tokens1 if t in set2)
+        sorted_1to2 = " ".join(values[t] for t in tokens1 if t not in set2)
+        sorted_2to1 = " ".join(values[t] for t in tokens2 if t not in set1)
+        combined_1to2 = (sorted_sect + " " + sorted_1to2).strip()
+        combined_2to1 = (sorted_sect + " " + sorted_2to1).strip()
+
+        known = max(self._prefix_ratio(sorted_sect, combined_1to2), self._prefix_ratio(sorted_sect, combined_2to1))
+        if combined_1to2 == combined_2to1:
+            self.stats['closed_form'] += 1
+            return self._remember(key, 100, 100)
+        if cutoff is not None:
+            upper = self._ratio_upper_bound(combined_1to2, combined_2to1)
+            if upper <= known:
+                self.stats['closed_form'] += 1
+                return self._remember(key, known, known)
+            if upper < cutoff:
+                self.stats['pruned'] += 1
+                return self._remember(key, known, upper)
+
+        self.stats['sequence_matcher'] += 1
+        exact = max(known, fuzz.ratio(combined_1to2, combined_2to1))
+        return self._remember(key, exact, exact)
+
+    def _remember(self, key: Tuple[int, int], lower: int, upper: int) -> int:
+        if len(self._pairs) < self.max_cached_pairs or key in self._pairs:
+            self._pairs[key] = (lower, upper)
+        return lower
+
+    def _prefix_ratio(self, prefix: str, combined: str) -> int:
+        """``fuzz.ratio(prefix, combined)`` where ``combined`` starts with ``prefix``."""
+        if prefix == combined:
+            return 100
+        if not prefix:
+            return 0
+        if len(combined) >= self._PREFIX_FORM_MAX_LENGTH:
+            return fuzz.ratio(prefix, combined)
+        # Same expression difflib and Levenshtein.ratio reduce to: 2 * matches / total.
+        return utils.intr(100 * (2.0 * len(prefix) / (len(prefix) + len(combined))))
+
+    @staticmethod
+    def _ratio_upper_bound(s1: str, s2: str) -> int:
+        # Matched characters can never exceed the shared character counts.
+        shared = sum((Counter(s1) & Counter(s2)).values())
+        return utils.intr(100 * (2.0 * shared / (len(s1) + len(s2))))
@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from utils.helpers import GeneralHelpers
+from .token_set_scoring import TokenSetScorer
+from .vendor_registry import VendorRegistry
+
+
+class BatchSimilarityScorer:
+    """Array-backed twin of ``AdvancedReconciliationEngine._calculate_similarity``.
+
+    Amounts, vendor strings and descriptions are parsed once up front; a block of
+    receipts x candidates is then scored in one step with the same 0.2/0.4/0.4
+    weighting, producing the same floats as the scalar path.
+    """
+
+    DATE_SCORE = 0.8
+    DATE_WEIGHT = 0.2
+    AMOUNT_WEIGHT = 0.4
+    VENDOR_WEIGHT = 0.4
+    VENDOR_HIT_SCORE = 0.9
+    # Distinct sentinels so two unresolved vendors never compare equal.
+    UNKNOWN_VENDOR = -1
+    UNKNOWN_BANK_VENDOR = -2
+
+    def __init__(self, receipts: Sequence[Dict], bank_transactions: Sequence[Dict], vendor_registry: VendorRegistry):
+        self.receipt_amounts = self._amount_array(receipts)
+        self.bank_amounts = self._amount_array(bank_transactions)
+
+        self.receipt_vendors = []
+        self.receipt_needles = []
+        receipt_vendor_ids = []
+        for receipt in receipts:
+            vendor = str(receipt.get('vendor_name', '')).upper()
+            vendor_id = vendor_registry.resolve(vendor)
+            if vendor_id is not None:
+                vendor = vendor_registry.name(vendor_id)
+            receipt_vendor_ids.append(self.UNKNOWN_VENDOR if vendor_id is None else vendor_id)
+            self.receipt_vendors.append(vendor)
+            self.receipt_needles.append(tuple(dict.fromkeys([vendor] + vendor.split())))
+        self.receipt_vendor_ids = np.array(receipt_vendor_ids, dtype=np.int64)
+
+        self.bank_descs = [str(b.get('description', '')).upper() for b in bank_transactions]
+        bank_vendor_ids = [vendor_registry.resolve(desc) for desc in self.bank_descs]
+        self.bank_vendor_ids = np.array([self.UNKNOWN_BANK_VENDOR if v is None else v for v in bank_vendor_ids], dtype=np.int64)
+
+        self.token_set_scorer = TokenSetScorer()
+        self.receipt_text_ids = [self.token_set_scorer.add(vendor) for vendor in self.receipt_vendors]
+        self.bank_text_ids = [self.token_set_scorer.add(desc) for desc in self.bank_descs]
+
+    @staticmethod
+    def _amount_array(transactions: Sequence[Dict]) -> np.ndarray:
+        amounts = [GeneralHelpers.parse_amount(t.get('amount', 0)) for t in transactions]
+        return np.array([np.nan if a is None else a for a in amounts], dtype=np.float64)
+
+    def compatible(self, rows: Sequence[int], cols: Sequence[int], amount_tolerance_percent: float) -> np.ndarray:
+        receipt_abs = np.abs(self.receipt_amounts[rows])[:, None]
+        bank_abs = np.abs(self.bank_amounts[cols])[None, :]
+        variance = np.maximum(receipt_abs * amount_tolerance_percent, 1.0)
+        return (receipt_abs != 0) & (np.abs(receipt_abs - bank_abs) <= variance)
+
+    @classmethod
+    def vendor_cutoffs(cls, amount_score: np.ndarray, min_confidence: float) -> np.ndarray:
+        """Smallest token-set ratio per pair that lets the score exceed ``min_confidence``
+        (101 if none does), tested with the same float expression as ``score_block``."""
+        base = (cls.DATE_SCORE * cls.DATE_WEIGHT) + (np.asarray(amount_score, dtype=np.float64) * cls.AMOUNT_WEIGHT)
+        with np.errstate(invalid='ignore'):
+            estimate = np.floor((min_confidence - base) / cls.VENDOR_WEIGHT * 100) - 2
+        cutoffs = np.clip(np.nan_to_num(estimate, nan=101), 0, 101).astype(np.int64)
+        # The estimate is at most a few ratios low; step up until the score clears.
+        while True:
+            low = (cutoffs <= 100) & ~(base + ((cutoffs / 100.0) * cls.VENDOR_WEIGHT) > min_confidence)
+            if not low.any():
+                return cutoffs
+            cutoffs[low] += 1
+
+    def score_block(self, rows: Sequence[int], cols: Sequence[int], mask: np.ndarray = None,
+                    min_confidence: Optional[float] = None) -> np.ndarray:
+        """Scores for ``rows`` x ``cols``. With ``min_confidence``, a pair whose
+        score cannot exceed it may be scored low rather than exactly."""
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        if mask is None:
+            mask = np.ones((len(rows), len(cols)), dtype=bool)
+        if len(rows) == 0 or len(cols) == 0:
+            return np.zeros((len(rows), len(cols)), dtype=np.float64)
+
+        receipt_amount = self.receipt_amounts[rows][:, None]
+        bank_abs = np.abs(self.bank_amounts[cols])[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            amount_score = np.maximum(0.0, 1 - np.abs(receipt_amount - bank_abs) / receipt_amount)
+
+        vendor_hit = self._vendor_hits(rows, cols)
+        vendor_score = np.where(vendor_hit, self.VENDOR_HIT_SCORE, 0.0)
+        cutoffs = None
+        if min_confidence is not None:
+            cutoffs = self.vendor_cutoffs(amount_score, min_confidence)
+        for i, j in zip(*np.nonzero(mask & ~vendor_hit)):
+            cutoff = None if cutoffs is None else int(cutoffs[i, j])
+            ratio = self.token_set_scorer.score_ids(self.receipt_text_ids[rows[i]], self.bank_text_ids[cols[j]], cutoff)
+            vendor_score[i, j] = ratio / 100.0
+
+        date_score = np.full(vendor_score.shape, self.DATE_SCORE)
+        scores = (date_score * self.DATE_WEIGHT) + (amount_score * self.AMOUNT_WEIGHT) + (vendor_score * self.VENDOR_WEIGHT)
+
+        valid = mask & (receipt_amount != 0) & ~np.isnan(receipt_amount) & ~np.isnan(bank_abs)
+        return np.where(valid, scores, 0.0)
+
+    def _vendor_hits(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        descs = np.array([self.bank_descs[c] for c in cols], dtype=str)
+
+        needle_ids: Dict[str, int] = {}
+        row_needles: List[List[int]] = []
+        for row in rows:
+            row_needles.append([needle_ids.setdefault(n, len(needle_ids)) for n in self.receipt_needles[row]])
+
+        found = np.zeros((len(needle_ids), len(cols)), dtype=bool)
+        for needle, k in needle_ids.items():
+            found[k] = np.char.find(descs, needle) >= 0
+
+        hits = self.receipt_vendor_ids[rows][:, None] == self.bank_vendor_ids[cols][None, :]
+        for i, needle_rows in enumerate(row_needles):
+            hits[i] |= found[needle_rows].any(axis=0)
+        return hits
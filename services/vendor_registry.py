@@ -0,0 +1,263 @@
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from fuzzywuzzy import fuzz
+from database.operations import (
+    get_vendor_aliases, add_vendor_aliases, get_confirmed_match_transactions, allocate_vendor_id, claim_vendor_alias
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Canonical vendors known before any match is confirmed. Ids are fixed so
+# learned aliases stored in MongoDB keep pointing at the same vendor.
+SEED_VENDORS: Dict[int, Tuple[str, Tuple[str, ...]]] = {
+    1: ('AMAZON', ('AMAZON', 'AMAZON.COM', 'AMZN')),
+    2: ('WALMART', ('WALMART', 'WAL-MART')),
+    3: ('SHELL', ('SHELL',)),
+    4: ('CVS', ('CVS',)),
+    5: ('TARGET', ('TARGET',)),
+    6: ('MCDONALD', ('MCDONALD', 'MCDONALDS')),
+}
+
+# Receipt vendor names that stand for a vendor only when they are the whole
+# name: a receipt "vendor" of TAX is a Walmart receipt, but TAX inside a bank
+# description says nothing about the merchant.
+SEED_WHOLE_TEXT_ALIASES: Dict[str, int] = {
+    'USB': 1,
+    'FUEL': 3,
+    'TAX': 2,
+}
+
+_MIN_LEARNED_ALIAS_LENGTH = 3
+# Most recently resolved texts kept per registry.
+_RESOLVE_CACHE_SIZE = 50000
+# A learned alias has to look like the vendor it is learned for (fuzz.partial_ratio).
+_MIN_LEARNED_ALIAS_SIMILARITY = 70
+
+# Card networks and payment processors put these in front of the merchant in
+# bank descriptions; they name no vendor and must never become aliases.
+_PROCESSOR_WORDS = {
+    'POS', 'PURCHASE', 'DEBIT', 'CREDIT', 'CARD', 'CHECKCARD', 'VISA', 'MASTERCARD', 'ACH', 'RECURRING',
+    'PAYMENT', 'ONLINE', 'PREAUTHORIZED', 'AUTHORIZED', 'WITHDRAWAL', 'TRANSFER', 'ELECTRONIC', 'EFT', 'PMT',
+}
+_PROCESSOR_PREFIX = re.compile(
+    r'^(?:(?:' + '|'.join(sorted(_PROCESSOR_WORDS)) + r')\b[\s\-:]*'
+    r'|(?:SQ|SQU|TST|PAYPAL|PP|SP|GOOGLE|GGL|APPLE PAY|APL|IN|PY|CKE|BT|ZETTLE|IZ|DD)\s*\*\s*)+'
+)
+
+
+def normalize_vendor_text(text) -> str:
+    return ' '.join(str(text or '').upper().split())
+
+
+class VendorAliasAutomaton:
+    """Aho-Corasick automaton over upper-cased vendor aliases.
+
+    ``find`` scans a text once and returns the vendor id of the leftmost,
+    then longest, alias that sits on word boundaries (so SHELL is found in
+    "SHELL OIL 5521" but not in "EGGSHELL").
+    """
+
+    def __init__(self, aliases: Iterable[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (alias length, vendor id) for every alias ending at the state.
+        self._output: List[List[Tuple[int, int]]] = [[]]
+        for alias, vendor_id in aliases:
+            self._add(alias, vendor_id)
+        self._link()
+
+    def _add(self, alias: str, vendor_id: int):
+        state = 0
+        for char in alias:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(alias), vendor_id))
+
+    def _link(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Optional[int]:
+        best: Optional[Tuple[int, int, int]] = None  # (start, -length, vendor id)
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if not self._output[state]:
+                continue
+            at_boundary = end + 1 == len(text) or not text[end + 1].isalnum()
+            for length, vendor_id in self._output[state]:
+                start = end + 1 - length
+                if not at_boundary and text[end].isalnum():
+                    continue
+                if start > 0 and text[start - 1].isalnum() and text[start].isalnum():
+                    continue
+                candidate = (start, -length, vendor_id)
+                if best is None or candidate < best:
+                    best = candidate
+        return best[2] if best else None
+
+
+class VendorRegistry:
+    """Canonical vendor ids with their aliases, compiled for single-pass lookup.
+
+    Seeded from ``SEED_VENDORS`` and extended with aliases persisted in the
+    ``vendor_aliases`` collection, including those learned from confirmed
+    matches. ``resolve`` maps a receipt vendor name or a bank description to
+    a vendor id, so two texts name the same vendor when their ids are equal.
+    """
+
+    def __init__(self, aliases: Iterable[Dict] = ()):
+        self.names: Dict[int, str] = {vendor_id: name for vendor_id, (name, _) in SEED_VENDORS.items()}
+        self.aliases: Dict[str, int] = {}
+        self.whole_text_aliases: Dict[str, int] = dict(SEED_WHOLE_TEXT_ALIASES)
+        for vendor_id, (_, vendor_aliases) in SEED_VENDORS.items():
+            for alias in vendor_aliases:
+                self.aliases[alias] = vendor_id
+        for record in aliases:
+            self._register(record)
+        self._compile()
+
+    @classmethod
+    def load(cls) -> "VendorRegistry":
+        return cls(get_vendor_aliases())
+
+    def _register(self, record: Dict):
+        alias = normalize_vendor_text(record['alias'])
+        vendor_id = int(record['vendor_id'])
+        self.names.setdefault(vendor_id, normalize_vendor_text(record.get('vendor_name')) or alias)
+        if record.get('whole_text'):
+            self.whole_text_aliases[alias] = vendor_id
+        else:
+            self.aliases[alias] = vendor_id
+
+    def _compile(self):
+        self.automaton = VendorAliasAutomaton(self.aliases.items())
+        # Bank descriptions carry store numbers and terminal ids, so most are
+        # new texts; a bounded cache keeps long-lived processes from growing.
+        self._resolve = lru_cache(maxsize=_RESOLVE_CACHE_SIZE)(self.find)
+
+    def __getstate__(self) -> Dict:
+        # The memo wraps a bound method and cannot be pickled; pool workers
+        # rebuild it on arrival.
+        state = dict(self.__dict__)
+        del state['_resolve']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._resolve = lru_cache(maxsize=_RESOLVE_CACHE_SIZE)(self.find)
+
+    def resolve(self, text) -> Optional[int]:
+        """``find`` memoized per text, for vendor names and descriptions that repeat."""
+        return self._resolve(normalize_vendor_text(text))
+
+    def find(self, text) -> Optional[int]:
+        text = normalize_vendor_text(text)
+        vendor_id = self.whole_text_aliases.get(text)
+        return vendor_id if vendor_id is not None else self.automaton.find(text)
+
+    def name(self, vendor_id: int) -> str:
+        return self.names[vendor_id]
+
+    def learn(self, vendor_descriptions: Iterable[Tuple[str, str]],
+              allocate_vendor: Optional[Callable[[str, int], Optional[int]]] = None) -> List[Dict]:
+        """Add aliases from confirmed (receipt vendor name, bank description) pairs.
+
+        A receipt vendor the registry does not know becomes a new vendor, its
+        id from ``allocate_vendor(name, highest known id)`` (by default the
+        next id in memory; None skips the pair). A bank description that does
+        not already resolve to the receipt's vendor contributes its leading
+        words, after any payment processor prefix and up to the first one
+        holding a digit, as an alias if they resemble the vendor name and do
+        not already belong to another vendor. Returns the new alias records.
+        """
+        learned = []
+        for vendor_name, description in vendor_descriptions:
+            vendor_name = normalize_vendor_text(vendor_name)
+            if len(vendor_name) < _MIN_LEARNED_ALIAS_LENGTH:
+                continue
+            # Aliases learned earlier in this pass are not compiled yet, so look them up directly.
+            vendor_id = self.aliases.get(vendor_name)
+            if vendor_id is None:
+                vendor_id = self.resolve(vendor_name)
+            if vendor_id is None:
+                vendor_id = allocate_vendor(vendor_name, max(self.names)) if allocate_vendor else max(self.names) + 1
+                if vendor_id is None:
+                    continue
+                learned.append(self._learned(vendor_name, vendor_id, vendor_name))
+            if self.resolve(description) == vendor_id:
+                continue
+            alias = self._description_alias(description)
+            if (len(alias) < _MIN_LEARNED_ALIAS_LENGTH or alias in self.aliases
+                    or fuzz.partial_ratio(alias, self.names[vendor_id]) < _MIN_LEARNED_ALIAS_SIMILARITY):
+                continue
+            learned.append(self._learned(alias, vendor_id, self.names[vendor_id]))
+        if learned:
+            self._compile()
+        return learned
+
+    def _learned(self, alias: str, vendor_id: int, vendor_name: str) -> Dict:
+        record = {'alias': alias, 'vendor_id': vendor_id, 'vendor_name': vendor_name, 'whole_text': False, 'source': 'confirmed'}
+        self._register(record)
+        return record
+
+    @staticmethod
+    def _description_alias(description) -> str:
+        text = _PROCESSOR_PREFIX.sub('', normalize_vendor_text(description))
+        # Store numbers, terminal ids and locations follow the merchant name and differ between statements.
+        words = []
+        for word in text.split():
+            if re.search(r'[\d#]', word):
+                break
+            words.append(word)
+        while words and words[-1] in _PROCESSOR_WORDS:
+            words.pop()
+        return ' '.join(words)
+
+
+_shared_registry: Optional[VendorRegistry] = None
+
+
+def get_vendor_registry(refresh: bool = False) -> VendorRegistry:
+    global _shared_registry
+    if _shared_registry is None or refresh:
+        _shared_registry = VendorRegistry.load()
+    return _shared_registry
+
+
+def _allocate_vendor(vendor_name: str, highest_known_id: int) -> Optional[int]:
+    # Ids come from a shared counter and the vendor's own name is claimed at
+    # once, so processes learning concurrently agree on one id per vendor.
+    vendor_id = allocate_vendor_id(highest_known_id)
+    if vendor_id is None:
+        return None
+    return claim_vendor_alias({'alias': vendor_name, 'vendor_id': vendor_id, 'vendor_name': vendor_name,
+                               'whole_text': False, 'source': 'confirmed'})
+
+
+def learn_vendor_aliases(since=None) -> int:
+    """Extend the registry from matches confirmed after ``since`` and persist the new aliases."""
+    registry = get_vendor_registry()
+    learned = registry.learn(get_confirmed_match_transactions(since), allocate_vendor=_allocate_vendor)
+    stored = add_vendor_aliases(learned)
+    if learned:
+        logger.info(f"Learned {len(learned)} vendor aliases from confirmed matches")
+    return stored
@@ -0,0 +1,44 @@
+from datetime import datetime
+import inspect
+import mongomock
+import pytest
+from mongoengine import connect, disconnect
+from database.operations import add_receipt_transaction, add_bank_transaction
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory MongoDB behind the mongoengine documents."""
+    # mongomock 4.3 predates the ``sort`` argument pymongo 4.11+ passes when
+    # bulk_write queues an UpdateOne.
+    add_update = mongomock.collection.BulkOperationBuilder.add_update
+    if 'sort' not in inspect.signature(add_update).parameters:
+        monkeypatch.setattr(mongomock.collection.BulkOperationBuilder, 'add_update',
+                            lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs))
+    disconnect()
+    connect('reconciliation_test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient,
+            uuidRepresentation='standard')
+    yield
+    disconnect()
+
+
+@pytest.fixture
+def add_receipt(db):
+    def add(transaction_id, amount, vendor_name='SHELL', transaction_date=datetime(2024, 5, 1), **fields):
+        return add_receipt_transaction(dict(
+            transaction_id=transaction_id, transaction_date=transaction_date, vendor_name=vendor_name,
+            amount=amount, category='fuel', receipt_filename=f'{transaction_id}.pdf', receipt_path=f'/tmp/{transaction_id}.pdf',
+            **fields
+        ))
+    return add
+
+
+@pytest.fixture
+def add_bank(db):
+    def add(transaction_id, amount, description='SHELL OIL 5521', transaction_date=datetime(2024, 5, 2), **fields):
+        return add_bank_transaction(dict(
+            transaction_id=transaction_id, transaction_date=transaction_date, description=description,
+            amount=amount, transaction_type='debit' if amount < 0 else 'credit', account_number='1234',
+            upload_batch_id='statement.csv', **fields
+        ))
+    return add
@@ -0,0 +1,68 @@
+import random
+from services.assignment import connected_components, greedy_assignment, optimal_assignment
+
+
+def _random_edges(rng, n_rows, n_cols, density):
+    return [
+        (row, col, round(rng.uniform(0.5, 1.0), 3))
+        for row in range(n_rows) for col in range(n_cols) if rng.random() < density
+    ]
+
+
+def _best_total(edges):
+    """Maximum matching weight by trying every choice for each row."""
+    by_row = {}
+    for row, col, weight in edges:
+        by_row.setdefault(row, []).append((col, weight))
+    rows = sorted(by_row)
+
+    def best(k, used_cols):
+        if k == len(rows):
+            return 0.0
+        result = best(k + 1, used_cols)
+        for col, weight in by_row[rows[k]]:
+            if col not in used_cols:
+                result = max(result, weight + best(k + 1, used_cols | {col}))
+        return result
+
+    return best(0, frozenset())
+
+
+def _assert_matching(chosen, edges):
+    assert set(chosen) <= set(edges)
+    assert len({row for row, _, _ in chosen}) == len(chosen)
+    assert len({col for _, col, _ in chosen}) == len(chosen)
+
+
+def test_optimal_assignment_matches_brute_force():
+    rng = random.Random(12)
+    for _ in range(300):
+        n_rows, n_cols = rng.randint(1, 6), rng.randint(1, 6)
+        edges = _random_edges(rng, n_rows, n_cols, rng.uniform(0.2, 0.9))
+        chosen, stats = optimal_assignment(edges, n_rows)
+        _assert_matching(chosen, edges)
+        assert abs(sum(w for _, _, w in chosen) - _best_total(edges)) < 1e-9
+        assert stats["solved_greedy"] == 0
+
+
+def test_optimal_assignment_beats_greedy_on_a_chain():
+    # Greedy takes the single heaviest edge (0, 0) and strands both other rows.
+    edges = [(0, 0, 1.0), (0, 1, 0.9), (1, 0, 0.9), (2, 1, 0.1)]
+    chosen, _ = optimal_assignment(edges, 3)
+    assert sum(w for _, _, w in chosen) > sum(w for _, _, w in greedy_assignment(edges))
+    assert sorted(chosen) == [(0, 1, 0.9), (1, 0, 0.9)]
+
+
+def test_components_are_solved_separately_and_oversized_ones_fall_back_to_greedy():
+    edges = [(0, 0, 0.9), (1, 0, 0.8), (1, 1, 0.7), (2, 2, 0.6)]
+    components = connected_components(edges, 3)
+    assert sorted(len(c) for c in components) == [1, 3]
+
+    chosen, stats = optimal_assignment(edges, 3, max_component_cells=1)
+    assert stats["components"] == 2 and stats["solved_greedy"] == 1
+    assert sorted(chosen) == sorted(greedy_assignment(edges))
+
+
+def test_greedy_assignment_breaks_ties_by_position():
+    edges = [(1, 0, 0.8), (0, 0, 0.8), (0, 1, 0.8)]
+    assert greedy_assignment(edges) == [(0, 0, 0.8)]
@@ -0,0 +1,52 @@
+import pytest
+import services.reconciliation as reconciliation
+from benchmarks.synthetic_ledger import generate_ledger
+from services.candidate_index import AmountCandidateIndex
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+
+class FullScan:
+    """Every bank transaction is a candidate, as before the index."""
+
+    def __init__(self, transactions, amount_tolerance_percent=0.1, min_variance=1.0):
+        self.size = len(transactions)
+
+    def __len__(self):
+        return self.size
+
+    def candidates(self, receipt_amount):
+        return list(range(self.size))
+
+
+def _outcome(result):
+    return (
+        [(m['receipt']['transaction_id'], m['bank_transaction']['transaction_id'], m['confidence'], m['match_type'])
+         for m in result['matches']],
+        [r['transaction_id'] for r in result['unmatched_ledger']],
+        [b['transaction_id'] for b in result['unmatched_bank']],
+    )
+
+
+def test_candidates_include_every_compatible_amount():
+    receipts, bank, _ = generate_ledger(300, seed=3)
+    engine = AdvancedReconciliationEngine(vendor_registry=VendorRegistry())
+    index = AmountCandidateIndex(bank, engine.amount_tolerance_percent)
+    for receipt in receipts:
+        candidates = index.candidates(receipt['amount'])
+        assert candidates == sorted(candidates)
+        compatible = [position for position, txn in enumerate(bank)
+                      if engine._amounts_compatible(receipt['amount'], txn['amount'])]
+        assert set(compatible) <= set(candidates)
+
+
+@pytest.mark.parametrize('strategy', AdvancedReconciliationEngine.STRATEGIES)
+@pytest.mark.parametrize('seed', [0, 1])
+def test_indexed_reconciliation_equals_full_scan(monkeypatch, strategy, seed):
+    receipts, bank, _ = generate_ledger(300, seed=seed)
+    engine = AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), strategy=strategy, vendor_registry=VendorRegistry())
+    indexed = _outcome(engine.reconcile_transactions(receipts, bank))
+
+    monkeypatch.setattr(reconciliation, 'AmountCandidateIndex', FullScan)
+    assert _outcome(engine.reconcile_transactions(receipts, bank)) == indexed
+    assert indexed[0]
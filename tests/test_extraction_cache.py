@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+import pytest
+import database.operations as operations
+from models.schema import ExtractionCacheEntry
+from models.validation_models import ReceiptData
+from services.extraction_cache import ExtractionCache
+
+
+class Clock(datetime):
+    """``datetime`` whose ``utcnow`` is moved by the test, for expiry and LRU order."""
+    now = None
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now
+
+    @classmethod
+    def advance(cls, **kwargs):
+        cls.now = cls.now + timedelta(**kwargs)
+
+
+@pytest.fixture
+def clock(db, monkeypatch):
+    # Starts at the real time: mongomock applies the TTL index against the wall clock.
+    monkeypatch.setattr(Clock, 'now', datetime.utcnow())
+    monkeypatch.setattr(operations, 'datetime', Clock)
+    return Clock
+
+
+def _receipt(vendor, amount=40.5):
+    return ReceiptData(date='2024-05-01', vendor=vendor, amount=amount, items=['fuel'])
+
+
+def test_keys_depend_on_content_version_and_variant():
+    assert ExtractionCache.text_key("SHELL  OIL\n40.50", "v1") == ExtractionCache.text_key("shell oil 40.50 ", "v1")
+    assert ExtractionCache.text_key("SHELL OIL", "v1") != ExtractionCache.text_key("SHELL OIL", "v2")
+    assert ExtractionCache.file_key("abc", "v1", "raw") != ExtractionCache.file_key("abc", "v1", "cleaned")
+    assert ExtractionCache.text_key("   ", "v1") is None and ExtractionCache.file_key("", "v1") is None
+
+
+def test_hits_are_counted_per_layer(clock):
+    cache = ExtractionCache(ttl_seconds=3600, max_entries=10)
+    keys = {'file': cache.file_key('hash', 'v1'), 'text': cache.text_key('SHELL OIL 40.50', 'v1')}
+    assert cache.get('file', keys['file']) is None and cache.get('text', keys['text']) is None
+    cache.put(keys, 'v1', _receipt('SHELL'), 0.9)
+
+    receipt_data, confidence = cache.get('file', keys['file'])
+    assert receipt_data == _receipt('SHELL') and confidence == 0.9
+    assert cache.get('text', keys['text'])[0].vendor == 'SHELL'
+    stats = cache.stats()
+    assert (stats['file_hits'], stats['text_hits'], stats['misses'], stats['entries'], stats['stores']) == (1, 1, 1, 2, 2)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+
+def test_entries_expire_unless_used(clock):
+    cache = ExtractionCache(ttl_seconds=3600, max_entries=10)
+    used, unused = cache.text_key('SHELL', 'v1'), cache.text_key('TARGET', 'v1')
+    cache.put({'text': used}, 'v1', _receipt('SHELL'), 0.9)
+    cache.put({'text': unused}, 'v1', _receipt('TARGET'), 0.9)
+
+    clock.advance(minutes=50)
+    assert cache.get('text', used) is not None  # Pushes its expiry back an hour.
+    clock.advance(minutes=20)
+    assert cache.get('text', unused) is None
+    assert cache.get('text', used) is not None
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ExtractionCache(ttl_seconds=3600, max_entries=2)
+    keys = [cache.text_key(vendor, 'v1') for vendor in ('SHELL', 'TARGET', 'CVS')]
+    cache.put({'text': keys[0]}, 'v1', _receipt('SHELL'), 0.9)
+    clock.advance(seconds=1)
+    cache.put({'text': keys[1]}, 'v1', _receipt('TARGET'), 0.9)
+    clock.advance(seconds=1)
+    cache.get('text', keys[0])
+    clock.advance(seconds=1)
+    cache.put({'text': keys[2]}, 'v1', _receipt('CVS'), 0.9)
+
+    assert cache.get('text', keys[1]) is None
+    assert cache.get('text', keys[0]) is not None and cache.get('text', keys[2]) is not None
+    assert cache.stats()['evictions'] == 1 and ExtractionCacheEntry.objects.count() == 2
+
+
+def test_unreadable_entries_are_misses(clock):
+    cache = ExtractionCache(ttl_seconds=3600, max_entries=10)
+    key = cache.text_key('SHELL', 'v1')
+    cache.put({'text': key}, 'v1', _receipt('SHELL'), 0.9)
+    ExtractionCacheEntry._get_collection().update_one({'key': key}, {'$set': {'result': '{"amount": "not json'}})
+    assert cache.get('text', key) is None
+    assert cache.stats()['misses'] == 1
@@ -0,0 +1,163 @@
+from datetime import datetime
+import pytest
+import database.operations as operations
+from database.operations import bulk_add_reconciliation_matches, get_reconciliation_summary, set_reconciliation_status
+from models.schema import ReceiptTransaction, BankTransaction, ReconciliationMatch, ReconciliationRun
+from services.incremental_reconciliation import IncrementalReconciliationService
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+
+def _doc(document_cls, transaction_id):
+    return document_cls._get_collection().find_one({'transaction_id': transaction_id})
+
+
+def _status(document_cls, transaction_id):
+    return _doc(document_cls, transaction_id).get('reconciliation_status')
+
+
+def _match(receipt_id, bank_id):
+    return {"receipt": _doc(ReceiptTransaction, receipt_id), "bank_transaction": _doc(BankTransaction, bank_id),
+            "confidence": 0.9, "match_type": "fuzzy"}
+
+
+class RecordingEngine(AdvancedReconciliationEngine):
+    """Records the (receipts, bank transactions) sizes of every table pass."""
+
+    def __init__(self):
+        super().__init__(vendor_registry=VendorRegistry())
+        self.passes = []
+
+    def reconcile_tables(self, receipts, bank_transactions):
+        self.passes.append((len(receipts), len(bank_transactions)))
+        return super().reconcile_tables(receipts, bank_transactions)
+
+
+def test_matches_and_statuses_are_stored_together(add_receipt, add_bank):
+    add_receipt('r1', 40.50)
+    add_bank('b1', -40.50)
+    assert bulk_add_reconciliation_matches([_match('r1', 'b1')], run_id='run_1') == 1
+    assert ReconciliationMatch.objects.count() == 1
+    assert _status(ReceiptTransaction, 'r1') == _status(BankTransaction, 'b1') == 'matched'
+    assert 'match_claim' not in _doc(ReceiptTransaction, 'r1')
+    summary = get_reconciliation_summary()
+    assert (summary['matched_receipts'], summary['matched_bank_transactions']) == (1, 1)
+
+
+def test_a_transaction_matched_elsewhere_is_not_matched_again(add_receipt, add_bank):
+    add_receipt('r1', 40.50)
+    add_receipt('r2', 40.50)
+    add_bank('b1', -40.50)
+    assert bulk_add_reconciliation_matches([_match('r1', 'b1')]) == 1
+    # A second writer that read b1 while it was still open.
+    assert bulk_add_reconciliation_matches([_match('r2', 'b1')]) == 0
+    assert ReconciliationMatch.objects.count() == 1
+    assert _status(ReceiptTransaction, 'r2') == 'unmatched'
+    assert get_reconciliation_summary()['matched_receipts'] == 1
+
+
+def test_only_fully_claimed_matches_of_a_batch_are_stored(add_receipt, add_bank):
+    for i in range(3):
+        add_receipt(f'r{i}', 10.00 + i)
+        add_bank(f'b{i}', -(10.00 + i))
+    set_reconciliation_status(BankTransaction, ['b1'], 'matched')
+    stored = bulk_add_reconciliation_matches([_match(f'r{i}', f'b{i}') for i in range(3)])
+    assert stored == 2
+    assert _status(ReceiptTransaction, 'r1') == 'unmatched'
+    assert {m.bank_transaction.transaction_id for m in ReconciliationMatch.objects} == {'b0', 'b2'}
+
+
+def _fail(*args, **kwargs):
+    raise RuntimeError("connection reset")
+
+
+def test_a_failed_insert_releases_every_claim(add_receipt, add_bank, monkeypatch):
+    add_receipt('r1', 40.50, reconciliation_status='suggested')
+    add_bank('b1', -40.50)
+    monkeypatch.setattr(type(ReconciliationMatch.objects), 'insert', _fail)
+    assert bulk_add_reconciliation_matches([_match('r1', 'b1')]) == 0
+    assert ReconciliationMatch.objects.count() == 0
+    assert _status(ReceiptTransaction, 'r1') == 'suggested'
+    assert _status(BankTransaction, 'b1') == 'unmatched'
+    assert 'match_claim' not in _doc(BankTransaction, 'b1')
+    assert get_reconciliation_summary()['matched_receipts'] == 0
+
+
+def test_a_failed_status_update_leaves_no_match(add_receipt, add_bank, monkeypatch):
+    add_receipt('r1', 40.50)
+    add_bank('b1', -40.50)
+    claim = operations._claim_transactions
+    monkeypatch.setattr(operations, '_claim_transactions',
+                        lambda cls, *args: _fail() if cls is BankTransaction else claim(cls, *args))
+    assert bulk_add_reconciliation_matches([_match('r1', 'b1')]) == 0
+    assert ReconciliationMatch.objects.count() == 0
+    assert _status(ReceiptTransaction, 'r1') == 'unmatched'
+
+
+def test_incremental_run_scores_only_new_transactions(add_receipt, add_bank):
+    add_receipt('r1', 40.50, vendor_name='SHELL')
+    add_receipt('r2', 12.00, vendor_name='TARGET')
+    add_bank('b1', -40.50, description='SHELL OIL 5521')
+    add_bank('b2', -99.00, description='NETFLIX.COM')
+
+    engine = RecordingEngine()
+    service = IncrementalReconciliationService(engine)
+    first = service.run(hydrate=False)
+    assert [(m['receipt']['transaction_id'], m['bank_transaction']['transaction_id']) for m in first['matches']] == [('r1', 'b1')]
+    assert engine.passes == [(2, 2)]
+
+    # r3 is new and may match any open bank line; r2 is old and only sees new ones.
+    add_receipt('r3', 99.00, vendor_name='NETFLIX', transaction_date=datetime(2024, 5, 2))
+    add_bank('b3', -12.00, description='TARGET T-1234', transaction_date=datetime(2024, 5, 2))
+    engine.passes.clear()
+    second = service.run(hydrate=False)
+    assert engine.passes == [(1, 2), (1, 1)]
+    assert sorted((m['receipt']['transaction_id'], m['bank_transaction']['transaction_id']) for m in second['matches']) == [
+        ('r2', 'b3'), ('r3', 'b2')]
+
+    engine.passes.clear()
+    third = service.run(hydrate=False)
+    assert engine.passes == [] and third['matches'] == []
+    assert ReconciliationMatch.objects.count() == 3
+    assert [run.status for run in ReconciliationRun.objects.order_by('started_at')] == ['completed'] * 3
+
+
+def test_a_run_whose_matches_cannot_be_stored_fails(add_receipt, add_bank, monkeypatch):
+    add_receipt('r1', 40.50)
+    add_bank('b1', -40.50)
+    monkeypatch.setattr('services.incremental_reconciliation.bulk_add_reconciliation_matches', lambda *a, **k: 0)
+    with pytest.raises(RuntimeError):
+        IncrementalReconciliationService(RecordingEngine()).run()
+    assert ReconciliationRun.objects.first().status == 'failed'
+
+
+def test_streaming_run_reads_open_transactions_and_stores_its_matches(add_receipt, add_bank):
+    for i in range(5):
+        add_receipt(f'r{i}', 10.00 + i, transaction_date=datetime(2024, 5, 1 + i))
+        add_bank(f'b{i}', -(10.00 + i), transaction_date=datetime(2024, 5, 2 + i))
+    set_reconciliation_status(ReceiptTransaction, ['r0'], 'matched')
+    set_reconciliation_status(BankTransaction, ['b0'], 'matched')
+
+    service = IncrementalReconciliationService(RecordingEngine())
+    results = service.run_stream(chunk_size=2)
+    pairs = sorted((m['receipt']['transaction_id'], m['bank_transaction']['transaction_id']) for m in results['matches'])
+    assert pairs == [('r1', 'b1'), ('r2', 'b2'), ('r3', 'b3'), ('r4', 'b4')]
+    assert ReconciliationMatch.objects.count() == 4
+    assert get_reconciliation_summary()['matched_receipts'] == 5
+
+    assert results['counts'] == {"matches": 4, "unmatched_ledger": 0, "unmatched_bank": 0, "stored": 4}
+
+    again = service.run_stream()
+    assert again['matches'] == [] and again['counts']['matches'] == 0
+    assert ReconciliationRun.objects.count() == 0
+
+
+def test_streaming_run_keeps_counts_and_a_capped_sample(add_receipt, add_bank):
+    for i in range(12):
+        add_receipt(f'r{i}', 10.00 + i, transaction_date=datetime(2024, 5, 1 + i))
+        add_bank(f'b{i}', -(10.00 + i), transaction_date=datetime(2024, 5, 1 + i))
+    add_receipt('r_only', 77.77)
+    results = IncrementalReconciliationService(RecordingEngine()).run_stream(chunk_size=5, sample_size=3)
+    assert results['counts'] == {"matches": 12, "unmatched_ledger": 1, "unmatched_bank": 0, "stored": 12}
+    assert len(results['matches']) == 3 and len(results['unmatched_ledger']) == 1
+    assert ReconciliationMatch.objects.count() == 12
@@ -0,0 +1,71 @@
+import pytest
+from services.llm_response_parser import LLMResponseParser
+
+RECEIPT = {"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"]}
+
+
+@pytest.mark.parametrize("text", [
+    '{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"]}',
+    'Here is the data:\n```json\n{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"]}\n```\nDone.',
+    '```\n{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"]}\n```',
+    'Sure! {"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"]} Let me know.',
+])
+def test_well_formed_objects_parse_on_the_fast_path(text):
+    parser = LLMResponseParser()
+    assert parser.parse_object(text) == RECEIPT
+    assert parser.stats == {'fast': 1, 'repaired': 0, 'failed': 0, 'invalid': 0}
+
+
+@pytest.mark.parametrize("text", [
+    '{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack",],}',
+    '```json\n{\n  "date": "2024-05-01",\n  "vendor": "SHELL",\n  "amount": 40.5,\n  "items": ["fuel", "snack"],\n}\n```',
+    '{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"]} and {"note": "}"}',
+])
+def test_trailing_commas_and_trailing_text_are_repaired(text):
+    parser = LLMResponseParser()
+    assert parser.parse_object(text) == RECEIPT
+    assert parser.stats['repaired'] == 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "sna',
+     {"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel"]}),
+    ('{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"], "tax": 1.',
+     RECEIPT),
+    ('{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"], "tax":',
+     RECEIPT),
+    ('```json\n{"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5, "items": ["fuel", "snack"], "catego',
+     RECEIPT),
+    ('{"date": "2024-05-01", "vendor": "SHELL \\"OIL\\" 55',
+     {"date": "2024-05-01"}),
+])
+def test_truncated_objects_keep_their_complete_values(text, expected):
+    parser = LLMResponseParser()
+    assert parser.parse_object(text) == expected
+    assert parser.stats['repaired'] == 1
+
+
+@pytest.mark.parametrize("text", [None, "", "I could not read this receipt.", '{"vendor": SHELL}', '["not", "an object"]'])
+def test_unreadable_responses_fail(text):
+    parser = LLMResponseParser()
+    assert parser.parse_object(text) is None
+    assert parser.stats['failed'] == 1
+
+
+def test_arrays_are_parsed_repaired_or_salvaged():
+    parser = LLMResponseParser()
+    assert parser.parse_array('```json\n[{"receipt_id": "R1"}, {"receipt_id": "R2"}]\n```') == [
+        {"receipt_id": "R1"}, {"receipt_id": "R2"}]
+    assert parser.parse_array('[{"receipt_id": "R1"}, {"receipt_id": "R2"},]') == [
+        {"receipt_id": "R1"}, {"receipt_id": "R2"}]
+    assert parser.parse_array('[{"receipt_id": "R1", "items": ["a"]}, {"receipt_id": "R2", "ite') == [
+        {"receipt_id": "R1", "items": ["a"]}]
+    assert parser.parse_array("No receipts found.") is None
+    assert parser.stats == {'fast': 1, 'repaired': 2, 'failed': 1, 'invalid': 0}
+
+
+def test_callers_count_rejected_objects():
+    parser = LLMResponseParser()
+    parser.parse_object('{"vendor": "SHELL"}')
+    parser.count('invalid')
+    assert parser.stats == {'fast': 1, 'repaired': 0, 'failed': 0, 'invalid': 1}
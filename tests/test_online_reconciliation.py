@@ -0,0 +1,97 @@
+from datetime import datetime
+import services.online_reconciliation as online
+from database.operations import bulk_add_reconciliation_matches, set_reconciliation_status
+from models.schema import ReceiptTransaction, BankTransaction, ReconciliationMatch
+from services.online_reconciliation import OnlineReconciliationService
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+
+def _doc(document_cls, transaction_id):
+    return document_cls._get_collection().find_one({'transaction_id': transaction_id})
+
+
+def _service():
+    service = OnlineReconciliationService(AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), vendor_registry=VendorRegistry()))
+    service.load()
+    return service
+
+
+def _pairs():
+    return sorted((m.ledger_transaction.transaction_id, m.bank_transaction.transaction_id) for m in ReconciliationMatch.objects)
+
+
+def test_an_inserted_receipt_is_matched_at_once(add_receipt, add_bank):
+    add_bank('b1', -40.50)
+    service = _service()
+    add_receipt('r1', 40.50)
+    match = service.process('receipt', _doc(ReceiptTransaction, 'r1'))
+    assert match['bank_transaction']['transaction_id'] == 'b1'
+    assert _pairs() == [('r1', 'b1')]
+    assert service.open_items == {'receipt': {}, 'bank': {}}
+    assert service.stats['matches'] == 1
+
+
+def test_an_unmatched_transaction_stays_open_until_its_counterpart_arrives(add_receipt, add_bank):
+    service = _service()
+    add_receipt('r1', 40.50)
+    assert service.process('receipt', _doc(ReceiptTransaction, 'r1')) is None
+    assert list(service.open_items['receipt']) == [_doc(ReceiptTransaction, 'r1')['_id']]
+    # Seen again (a poll overlap or a change stream replay): still one open item.
+    assert service.process('receipt', _doc(ReceiptTransaction, 'r1')) is None
+    assert len(service.open_items['receipt']) == 1
+
+    add_bank('b1', -40.50)
+    assert service.process('bank', _doc(BankTransaction, 'b1'))['receipt']['transaction_id'] == 'r1'
+    assert _pairs() == [('r1', 'b1')]
+
+
+def test_a_candidate_matched_elsewhere_is_dropped(add_receipt, add_bank):
+    add_bank('b1', -40.50, transaction_date=datetime(2024, 5, 2))
+    add_bank('b2', -40.50, transaction_date=datetime(2024, 5, 6))
+    service = _service()
+    set_reconciliation_status(BankTransaction, ['b1'], 'matched')
+    add_receipt('r1', 40.50)
+    match = service.process('receipt', _doc(ReceiptTransaction, 'r1'))
+    assert match['bank_transaction']['transaction_id'] == 'b2'
+    assert service.stats['stale_candidates'] == 1
+    assert _doc(BankTransaction, 'b1')['_id'] not in service.open_items['bank']
+
+
+def test_a_candidate_claimed_between_check_and_write_is_not_matched_twice(add_receipt, add_bank, monkeypatch):
+    add_bank('b1', -40.50, transaction_date=datetime(2024, 5, 2))
+    add_bank('b2', -40.50, transaction_date=datetime(2024, 5, 6))
+    add_receipt('r_batch', 40.50)
+    service = _service()
+    add_receipt('r1', 40.50)
+
+    def batch_run_wins_first(matches, *args, **kwargs):
+        if not ReconciliationMatch.objects.count():
+            # A batch run stores its match for b1 right after the online check.
+            bulk_add_reconciliation_matches([{"receipt": _doc(ReceiptTransaction, 'r_batch'), "bank_transaction": _doc(BankTransaction, 'b1'),
+                                              "confidence": 0.9, "match_type": "fuzzy"}])
+        return bulk_add_reconciliation_matches(matches, *args, **kwargs)
+
+    monkeypatch.setattr(online, 'bulk_add_reconciliation_matches', batch_run_wins_first)
+    match = service.process('receipt', _doc(ReceiptTransaction, 'r1'))
+    assert match['bank_transaction']['transaction_id'] == 'b2'
+    assert _pairs() == [('r1', 'b2'), ('r_batch', 'b1')]
+    assert _doc(ReceiptTransaction, 'r1')['reconciliation_status'] == 'matched'
+
+
+def test_a_transaction_matched_while_its_match_was_written_is_left_alone(add_receipt, add_bank, monkeypatch):
+    add_bank('b1', -40.50)
+    add_bank('b_batch', -40.50)
+    service = _service()
+    add_receipt('r1', 40.50)
+
+    def batch_run_took_the_receipt(matches, *args, **kwargs):
+        bulk_add_reconciliation_matches([{"receipt": _doc(ReceiptTransaction, 'r1'), "bank_transaction": _doc(BankTransaction, 'b_batch'),
+                                          "confidence": 0.9, "match_type": "fuzzy"}])
+        return bulk_add_reconciliation_matches(matches, *args, **kwargs)
+
+    monkeypatch.setattr(online, 'bulk_add_reconciliation_matches', batch_run_took_the_receipt)
+    assert service.process('receipt', _doc(ReceiptTransaction, 'r1')) is None
+    assert _pairs() == [('r1', 'b_batch')]
+    assert _doc(BankTransaction, 'b1')['reconciliation_status'] == 'unmatched'
+    assert service.open_items['receipt'] == {}
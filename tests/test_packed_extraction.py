@@ -0,0 +1,114 @@
+import asyncio
+import json
+from config.settings import AppSettings
+from services.llm_response_parser import LLMResponseParser
+from services.packed_extraction import PACKED_PROMPT_TEMPLATE, PackedExtractionMixin
+
+
+class FakeProcessor(PackedExtractionMixin):
+    """The single-receipt steps ``ReceiptPDFProcessor`` provides, without PDFs or an LLM."""
+
+    def __init__(self, answer=None, cached=()):
+        self.response_parser = LLMResponseParser()
+        self.packing_stats = {'requests': 0, 'receipts': 0, 'retried': 0}
+        self.llm = self
+        self.answer = answer or (lambda receipt_ids: [_entry(receipt_id, "SHELL", 40.5) for receipt_id in receipt_ids])
+        self.cached = set(cached)
+        self.packs = []
+        self.retried = []
+
+    async def acomplete(self, prompt):
+        receipt_ids = [line.strip().split()[1] for line in prompt.splitlines() if line.strip().startswith("Receipt R")]
+        self.packs.append(receipt_ids)
+        answer = self.answer(receipt_ids)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer if isinstance(answer, str) else json.dumps(answer)
+
+    def _prepare_extraction(self, pdf_path, bypass_cleaning):
+        if pdf_path in self.cached:
+            return {"vendor": "CACHED"}, None
+        return None, {"pdf_path": pdf_path, "cleaned_text": f"receipt text of {pdf_path}"}
+
+    async def _complete_extraction(self, job, semaphore):
+        self.retried.append(job['pdf_path'])
+        return {"vendor": "ALONE"}
+
+    def _finish_extraction(self, job, response_text):
+        return json.loads(response_text)
+
+    def _response_text(self, response):
+        return response
+
+    def _processing_failed(self, pdf_path, e):
+        return {"error": str(e)}
+
+
+def _entry(receipt_id, vendor, amount):
+    return {"receipt_id": receipt_id, "date": "2024-05-01", "vendor": vendor, "amount": amount}
+
+
+async def _collect(processor, paths, **kwargs):
+    return dict([item async for item in processor.process_receipts_packed(paths, **kwargs)])
+
+
+def test_split_returns_one_answer_per_receipt():
+    response = "```json\n" + json.dumps([_entry("R1", "SHELL", 40.5), _entry("R2", "TARGET", 12.0)]) + "\n```"
+    answers = FakeProcessor()._split_packed_response(response, ["R1", "R2"])
+    assert sorted(answers) == ["R1", "R2"]
+    assert json.loads(answers["R2"]) == {"date": "2024-05-01", "vendor": "TARGET", "amount": 12.0}
+
+
+def test_split_drops_missing_unknown_empty_and_duplicated_entries():
+    entries = [
+        _entry("R1", "SHELL", 40.5),
+        _entry("R2", "TARGET", 12.0),
+        _entry("R2", "WALMART", 9.0),
+        _entry("R9", "CVS", 3.0),
+        {"receipt_id": "R3", "date": None, "vendor": "", "amount": None},
+    ]
+    answers = FakeProcessor()._split_packed_response(json.dumps(entries), ["R1", "R2", "R3", "R4"])
+    assert list(answers) == ["R1"]
+
+
+def test_split_keeps_complete_entries_of_a_truncated_response():
+    response = json.dumps([_entry("R1", "SHELL", 40.5), _entry("R2", "TARGET", 12.0)])[:-20]
+    assert list(FakeProcessor()._split_packed_response(response, ["R1", "R2"])) == ["R1"]
+    assert FakeProcessor()._split_packed_response("Sorry, I cannot help.", ["R1"]) == {}
+
+
+def test_receipts_are_packed_up_to_the_receipt_limit(monkeypatch):
+    monkeypatch.setattr(AppSettings, 'LLM_PACK_MAX_RECEIPTS', 3)
+    processor = FakeProcessor(cached={"c.pdf"})
+    paths = [f"{i}.pdf" for i in range(7)] + ["c.pdf"]
+    results = asyncio.run(_collect(processor, paths, token_budget=100000))
+    assert results["c.pdf"] == {"vendor": "CACHED"}
+    assert sorted(len(pack) for pack in processor.packs) == [3, 3]
+    # The last receipt is a pack of one and takes the single-receipt path.
+    assert len(processor.retried) == 1
+    assert sum(result.get("vendor") == "SHELL" for result in results.values()) == 6
+    assert processor.packing_stats == {'requests': 2, 'receipts': 6, 'retried': 0}
+
+
+def test_receipts_are_packed_up_to_the_token_budget():
+    processor = FakeProcessor()
+    paths = [f"{i}.pdf" for i in range(4)]
+    # Room for the prompt and two receipts of about six tokens, not three.
+    prompt_tokens = PackedExtractionMixin._estimate_tokens(PACKED_PROMPT_TEMPLATE)
+    asyncio.run(_collect(processor, paths, token_budget=prompt_tokens + 14))
+    assert [len(pack) for pack in processor.packs] == [2, 2]
+
+
+def test_unanswered_receipts_are_retried_alone():
+    processor = FakeProcessor(answer=lambda receipt_ids: [_entry("R1", "SHELL", 40.5), _entry("R7", "CVS", 3.0)])
+    results = asyncio.run(_collect(processor, ["a.pdf", "b.pdf", "c.pdf"], token_budget=100000))
+    assert results == {"a.pdf": {"date": "2024-05-01", "vendor": "SHELL", "amount": 40.5},
+                       "b.pdf": {"vendor": "ALONE"}, "c.pdf": {"vendor": "ALONE"}}
+    assert sorted(processor.retried) == ["b.pdf", "c.pdf"]
+    assert processor.packing_stats == {'requests': 1, 'receipts': 3, 'retried': 2}
+
+
+def test_a_failed_pack_request_retries_every_receipt():
+    processor = FakeProcessor(answer=lambda receipt_ids: RuntimeError("timeout"))
+    results = asyncio.run(_collect(processor, ["a.pdf", "b.pdf"], token_budget=100000))
+    assert results == {"a.pdf": {"vendor": "ALONE"}, "b.pdf": {"vendor": "ALONE"}}
@@ -0,0 +1,43 @@
+import pytest
+from benchmarks.synthetic_ledger import generate_ledger
+from services.parallel_reconciliation import ParallelReconciliationEngine
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+
+def _outcome(result):
+    return (
+        [(m['receipt']['transaction_id'], m['bank_transaction']['transaction_id'], m['confidence'], m['match_type'])
+         for m in result['matches']],
+        [r['transaction_id'] for r in result['unmatched_ledger']],
+        [b['transaction_id'] for b in result['unmatched_bank']],
+    )
+
+
+@pytest.mark.parametrize('scoring', AdvancedReconciliationEngine.SCORING_MODES)
+@pytest.mark.parametrize('strategy', AdvancedReconciliationEngine.STRATEGIES)
+def test_parallel_reconciliation_equals_serial(strategy, scoring):
+    receipts, bank, _ = generate_ledger(300, seed=4)
+    registry = VendorRegistry()
+    serial = AdvancedReconciliationEngine(scoring=scoring, tiers=('exact', 'fuzzy'), strategy=strategy,
+                                          vendor_registry=registry)
+    expected = _outcome(serial.reconcile_transactions(receipts, bank))
+    assert expected[0]
+
+    parallel = ParallelReconciliationEngine(max_workers=2, min_parallel_pairs=0, scoring=scoring,
+                                            tiers=('exact', 'fuzzy'), strategy=strategy, vendor_registry=registry)
+    assert _outcome(parallel.reconcile_transactions(receipts, bank)) == expected
+    assert parallel.last_run_stats['parallel']['workers'] == 2
+
+
+def test_shards_overlap_enough_to_reproduce_serial_in_process():
+    receipts, bank, _ = generate_ledger(300, seed=5)
+    # Duplicated ids must still match at most once across shards.
+    receipts[7]['transaction_id'] = receipts[3]['transaction_id']
+    bank[9]['transaction_id'] = bank[2]['transaction_id']
+    registry = VendorRegistry()
+    serial = AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), strategy='greedy', vendor_registry=registry)
+    sharded = ParallelReconciliationEngine(max_workers=1, shards_per_worker=16, tiers=('exact', 'fuzzy'),
+                                           strategy='greedy', vendor_registry=registry)
+    assert _outcome(sharded.reconcile_transactions(receipts, bank)) == _outcome(serial.reconcile_transactions(receipts, bank))
+    assert sharded.last_run_stats['parallel']['shards'] == 16
@@ -0,0 +1,69 @@
+from datetime import datetime
+from database.operations import (
+    add_bank_transactions, bulk_add_reconciliation_matches, bulk_add_split_matches, set_reconciliation_status,
+    get_reconciliation_summary, refresh_reconciliation_summary
+)
+from models.schema import ReceiptTransaction, BankTransaction, ReconciliationSummary
+
+COUNTERS = ('receipts', 'bank_transactions', 'matched_receipts', 'matched_bank_transactions',
+            'receipt_amount', 'matched_receipt_amount', 'bank_debits', 'bank_credits')
+
+
+def _doc(document_cls, transaction_id):
+    return document_cls._get_collection().find_one({'transaction_id': transaction_id})
+
+
+def _counters(summary):
+    return {key: round(summary.get(key, 0), 2) for key in COUNTERS}
+
+
+def _assert_increments_match_a_recount():
+    incremental = _counters(ReconciliationSummary._get_collection().find_one({'summary_id': 'global'}))
+    assert incremental == _counters(refresh_reconciliation_summary())
+
+
+def _bank_record(transaction_id, amount):
+    return {'transaction_id': transaction_id, 'transaction_date': datetime(2024, 5, 2), 'description': 'TARGET T-1234',
+            'amount': amount, 'transaction_type': 'debit' if amount < 0 else 'credit', 'account_number': '1234',
+            'upload_batch_id': 'statement.csv'}
+
+
+def test_counters_follow_ingestion_and_matching(add_receipt, add_bank):
+    assert _counters(get_reconciliation_summary()) == dict.fromkeys(COUNTERS, 0)
+
+    add_receipt('r1', 40.50)
+    add_receipt('r2', 12.25)
+    add_receipt('r3', 30.00)
+    add_receipt('r4', 20.00)
+    add_bank('b1', -40.50)
+    add_bank('b2', 1500.00, description='PAYROLL DEPOSIT')
+    assert add_bank_transactions([_bank_record('b3', -12.25), _bank_record('b4', -50.00)]) == 2
+    _assert_increments_match_a_recount()
+
+    bulk_add_reconciliation_matches([{"receipt": _doc(ReceiptTransaction, 'r1'), "bank_transaction": _doc(BankTransaction, 'b1'),
+                                      "confidence": 0.95, "match_type": "exact"}])
+    bulk_add_split_matches([{"group_id": "split_1", "confidence": 0.8, "direction": "many_to_one", "match_type": "split",
+                             "receipts": [_doc(ReceiptTransaction, 'r3'), _doc(ReceiptTransaction, 'r4')],
+                             "bank_transactions": [_doc(BankTransaction, 'b4')]}])
+    summary = ReconciliationSummary._get_collection().find_one({'summary_id': 'global'})
+    assert (summary['matched_receipts'], summary['matched_bank_transactions']) == (3, 2)
+    assert round(summary['matched_receipt_amount'], 2) == 90.50
+    _assert_increments_match_a_recount()
+
+    # Re-marking a matched transaction, or matching it again, must not count it twice.
+    set_reconciliation_status(ReceiptTransaction, ['r1'], 'matched')
+    bulk_add_reconciliation_matches([{"receipt": _doc(ReceiptTransaction, 'r2'), "bank_transaction": _doc(BankTransaction, 'b1'),
+                                      "confidence": 0.9, "match_type": "fuzzy"}])
+    _assert_increments_match_a_recount()
+
+    set_reconciliation_status(ReceiptTransaction, ['r1', 'r2'], 'unmatched')
+    _assert_increments_match_a_recount()
+    assert ReconciliationSummary._get_collection().find_one({'summary_id': 'global'})['matched_receipts'] == 2
+
+
+def test_a_partly_failed_bulk_insert_recounts(add_bank):
+    add_bank('b1', -40.50)
+    assert add_bank_transactions([_bank_record('b1', -40.50), _bank_record('b2', -12.25)]) == 1
+    summary = ReconciliationSummary._get_collection().find_one({'summary_id': 'global'})
+    assert summary['bank_transactions'] == 2
+    _assert_increments_match_a_recount()
@@ -0,0 +1,87 @@
+import random
+from datetime import datetime, timedelta
+from itertools import combinations
+from services.split_matching import SplitPaymentMatcher
+from utils.helpers import GeneralHelpers
+
+DAY = datetime(2024, 3, 10)
+
+
+def _txn(txn_id, amount, days=0):
+    return {"transaction_id": txn_id, "amount": amount, "transaction_date": DAY + timedelta(days=days)}
+
+
+def _ids(transactions):
+    return sorted(txn["transaction_id"] for txn in transactions)
+
+
+def test_finds_receipts_combined_into_one_bank_charge():
+    receipts = [_txn("r1", 12.50), _txn("r2", 7.77, 1), _txn("r3", 30.25, -2), _txn("r4", 99.99)]
+    bank = [_txn("b1", -42.75, 1)]
+    groups = SplitPaymentMatcher().match(receipts, bank)
+    assert len(groups) == 1
+    assert groups[0]["direction"] == "many_to_one"
+    assert _ids(groups[0]["receipts"]) == ["r1", "r3"]
+    assert _ids(groups[0]["bank_transactions"]) == ["b1"]
+
+
+def test_finds_a_receipt_paid_in_instalments():
+    receipts = [_txn("r1", 300.00)]
+    bank = [_txn("b1", -100.00), _txn("b2", -100.00, 3), _txn("b3", -100.00, 6), _txn("b4", -45.00, 2)]
+    groups = SplitPaymentMatcher(max_group_size=3).match(receipts, bank)
+    assert len(groups) == 1
+    assert groups[0]["direction"] == "one_to_many"
+    assert _ids(groups[0]["bank_transactions"]) == ["b1", "b2", "b3"]
+
+
+def test_rejects_a_target_two_subsets_of_the_same_size_can_explain():
+    receipts = [_txn("r1", 10.00), _txn("r2", 20.00), _txn("r3", 15.00), _txn("r4", 15.00)]
+    assert SplitPaymentMatcher().match(receipts, [_txn("b1", -30.00)]) == []
+
+
+def test_smallest_subset_wins_over_larger_ones():
+    receipts = [_txn("r1", 5.00), _txn("r2", 5.00), _txn("r3", 10.00), _txn("r4", 20.00)]
+    groups = SplitPaymentMatcher().match(receipts, [_txn("b1", -30.00)])
+    assert [_ids(group["receipts"]) for group in groups] == [["r3", "r4"]]
+
+
+def test_respects_date_window_and_group_size():
+    receipts = [_txn("r1", 10.00), _txn("r2", 20.00, 8)]
+    assert SplitPaymentMatcher(date_tolerance_days=7).match(receipts, [_txn("b1", -30.00)]) == []
+    assert len(SplitPaymentMatcher(date_tolerance_days=8).match(receipts, [_txn("b1", -30.00)])) == 1
+
+    receipts = [_txn(f"r{i}", 10.00 + i) for i in range(5)]
+    bank = [_txn("b1", -sum(txn["amount"] for txn in receipts))]
+    assert SplitPaymentMatcher(max_group_size=4).match(receipts, bank) == []
+    assert len(SplitPaymentMatcher(max_group_size=5).match(receipts, bank)) == 1
+
+
+def test_no_transaction_is_used_twice():
+    receipts = [_txn("r1", 10.00), _txn("r2", 20.00), _txn("r3", 5.00), _txn("r4", 25.00)]
+    bank = [_txn("b1", -30.00), _txn("b2", -30.00)]
+    groups = SplitPaymentMatcher().match(receipts, bank)
+    used = [txn["transaction_id"] for group in groups for txn in group["receipts"] + group["bank_transactions"]]
+    assert len(used) == len(set(used))
+
+
+def test_find_subset_agrees_with_brute_force():
+    matcher = SplitPaymentMatcher(max_group_size=4)
+    rng = random.Random(13)
+    for _ in range(300):
+        candidates = [(rng.choice([500, 750, 1000, 1250, 2000, 3333]), 0, i) for i in range(rng.randint(2, 7))]
+        target = (rng.randint(1000, 6000) // 250 * 250, 0, 99)
+
+        expected = None
+        for size in range(2, matcher.max_group_size + 1):
+            hits = [combo for combo in combinations(candidates, size) if sum(c[0] for c in combo) == target[0]]
+            if hits:
+                expected = list(hits[0]) if len(hits) == 1 else None
+                break
+        assert matcher._find_subset(target, candidates) == expected
+
+
+def test_accepts_extended_json_dates():
+    receipts = [_txn("r1", 10.00), _txn("r2", 20.00)]
+    bank = [{"transaction_id": "b1", "amount": -30.00, "transaction_date": {"$date": "2024-03-10T12:00:00Z"}}]
+    assert len(SplitPaymentMatcher().match(receipts, bank)) == 1
+    assert GeneralHelpers.parse_date({"$date": {"$numberLong": "1710072000000"}}) == datetime(2024, 3, 10, 12)
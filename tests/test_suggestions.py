@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+VENDORS = ["STARBUCKS", "SHELL OIL", "AMAZON.COM", "WHOLE FOODS", "TARGET", "UBER TRIP", "CVS PHARMACY"]
+
+
+def _engine():
+    return AdvancedReconciliationEngine(vendor_registry=VendorRegistry())
+
+
+def _transactions(rng, kind, count):
+    start = datetime(2024, 5, 1)
+    transactions = []
+    for i in range(count):
+        vendor = rng.choice(VENDORS)
+        amount = rng.choice([12.40, 12.45, 50.00, 50.20, 87.13])
+        txn = {"transaction_id": f"{kind}{i}", "amount": amount,
+               "transaction_date": start + timedelta(days=rng.randint(0, 10))}
+        if kind == "r":
+            txn["vendor_name"] = vendor
+        else:
+            txn["amount"] = -amount
+            txn["description"] = f"POS PURCHASE {vendor} #{rng.randint(100, 999)}"
+        transactions.append(txn)
+    return transactions
+
+
+def _brute_force(engine, source, targets, k, min_score, direction):
+    scored = []
+    for position, target in enumerate(targets):
+        receipt, bank = (source, target) if direction == "receipt" else (target, source)
+        if not engine._amounts_compatible(receipt.get("amount", 0), bank.get("amount", 0)):
+            continue
+        confidence = engine._calculate_similarity(receipt, bank)
+        if confidence >= min_score:
+            scored.append((-confidence, position, target["transaction_id"]))
+    return [(transaction_id, -negated) for negated, _, transaction_id in sorted(scored)[:k]]
+
+
+@pytest.mark.parametrize("direction", ["receipt", "bank"])
+def test_top_k_matches_a_full_ranking(direction):
+    rng = random.Random(14)
+    engine = _engine()
+    receipts, bank = _transactions(rng, "r", 25), _transactions(rng, "b", 40)
+    sources, targets = (receipts, bank) if direction == "receipt" else (bank, receipts)
+
+    for k, min_score in ((1, 0.3), (3, 0.5), (5, 0.7)):
+        suggestions = engine.suggest_candidates(sources, targets, k=k, min_score=min_score, direction=direction)
+        by_source = {s["source"]["transaction_id"]: s for s in suggestions}
+        for source in sources:
+            expected = _brute_force(engine, source, targets, k, min_score, direction)
+            suggestion = by_source.get(source["transaction_id"])
+            got = [] if suggestion is None else [
+                (c["transaction"]["transaction_id"], c["confidence"]) for c in suggestion["candidates"]
+            ]
+            assert [txn_id for txn_id, _ in got] == [txn_id for txn_id, _ in expected]
+            assert [c for _, c in got] == pytest.approx([c for _, c in expected])
+
+
+def test_suggestions_carry_a_breakdown():
+    receipt = {"transaction_id": "r1", "amount": 20.00, "vendor_name": "STARBUCKS",
+               "transaction_date": datetime(2024, 5, 1)}
+    bank = {"transaction_id": "b1", "amount": -20.00, "description": "STARBUCKS STORE 123",
+            "transaction_date": datetime(2024, 5, 3)}
+    [suggestion] = _engine().suggest_candidates([receipt], [bank], k=3, min_score=0.5)
+    [candidate] = suggestion["candidates"]
+    assert candidate["breakdown"]["confidence"] == candidate["confidence"]
+    assert candidate["breakdown"]["days_apart"] == 2
+
+
+def test_rejects_an_unknown_direction():
+    with pytest.raises(ValueError):
+        _engine().suggest_candidates([], [], direction="sideways")
@@ -0,0 +1,57 @@
+import random
+import numpy as np
+from fuzzywuzzy import fuzz
+from services.token_set_scoring import TokenSetScorer
+
+CORPUS = [
+    "STARBUCKS", "Starbucks Coffee", "STARBUCKS STORE 00123 SEATTLE WA", "SQ *STARBUCKS #4412",
+    "AMAZON.COM", "AMZN MKTP US*2K3LL1", "Amazon Marketplace", "amazon amazon amazon",
+    "SHELL OIL 5521", "Shell", "EGGSHELL BAKERY", "WHOLE FOODS MARKET", "Whole Foods #10233 Austin",
+    "Café Zoë", "CAFE ZOE", "Joe's Pizza", "JOES PIZZA NYC", "POS PURCHASE JOE'S PIZZA #12",
+    "", "   ", "!!!", None, "a", "A B C", "c b a",
+    "THE HOME DEPOT 0612 " * 12, "HOME DEPOT " * 25 + "SUPPLIES",
+]
+
+
+def _random_corpus(rng, size):
+    words = ["SHELL", "OIL", "STORE", "MKT", "#12", "CAFE", "ZOE", "THE", "PIZZA", "A", "MARKET", "HOME"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(0, 8))) for _ in range(size)]
+
+
+def test_scores_equal_token_set_ratio():
+    scorer = TokenSetScorer()
+    corpus = CORPUS + _random_corpus(random.Random(18), 60)
+    for a in corpus:
+        for b in corpus:
+            assert scorer.score(a, b) == fuzz.token_set_ratio(a, b, force_ascii=True), (a, b)
+
+
+def test_cutoff_scores_are_exact_at_or_above_the_cutoff():
+    scorer = TokenSetScorer()
+    corpus = CORPUS + _random_corpus(random.Random(180), 40)
+    rng = random.Random(181)
+    for a in corpus:
+        for b in corpus:
+            expected = fuzz.token_set_ratio(a, b, force_ascii=True)
+            cutoff = rng.choice([0, 40, 60, 75, 90, 100])
+            score = scorer.score(a, b, cutoff)
+            if expected >= cutoff:
+                assert score == expected, (a, b, cutoff)
+            else:
+                assert score <= expected and score < cutoff, (a, b, cutoff)
+    # Pruned pairs cached under a cutoff are scored exactly when asked again without one.
+    for a in corpus:
+        for b in corpus:
+            assert scorer.score(a, b) == fuzz.token_set_ratio(a, b, force_ascii=True)
+
+
+def test_score_block_matches_pairwise_scores():
+    scorer = TokenSetScorer()
+    others = CORPUS[:12]
+    ids = [scorer.add(text) for text in others]
+    expected = [fuzz.token_set_ratio("STARBUCKS COFFEE 123", text, force_ascii=True) for text in others]
+    assert scorer.score_block("STARBUCKS COFFEE 123", others).tolist() == expected
+    assert scorer.score_block("STARBUCKS COFFEE 123", ids).tolist() == expected
+    cutoffs = np.array([50] * len(others))
+    blocked = scorer.score_block("STARBUCKS COFFEE 123", ids, cutoffs)
+    assert all(b == e for b, e in zip(blocked, expected) if e >= 50)
@@ -0,0 +1,50 @@
+import pytest
+from benchmarks.synthetic_ledger import generate_ledger
+from models.transaction_table import InternTable, TransactionTable
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+
+def _outcome(result):
+    return (
+        [(m['receipt']['transaction_id'], m['bank_transaction']['transaction_id'], m['confidence'], m['match_type'])
+         for m in result['matches']],
+        [r['transaction_id'] for r in result['unmatched_ledger']],
+        [b['transaction_id'] for b in result['unmatched_bank']],
+    )
+
+
+def _table_outcome(result, ledger, bank):
+    return (
+        [(ledger.transaction_id(row), bank.transaction_id(col), confidence, match_type)
+         for row, col, confidence, match_type in result['matches']],
+        [ledger.transaction_id(row) for row in result['unmatched_ledger']],
+        [bank.transaction_id(col) for col in result['unmatched_bank']],
+    )
+
+
+@pytest.mark.parametrize('strategy', AdvancedReconciliationEngine.STRATEGIES)
+@pytest.mark.parametrize('seed', [0, 1])
+def test_table_reconciliation_equals_dict_path(strategy, seed):
+    receipts, bank, _ = generate_ledger(300, seed=seed)
+    engine = AdvancedReconciliationEngine(tiers=('exact', 'fuzzy'), strategy=strategy, vendor_registry=VendorRegistry())
+    expected = _outcome(engine.reconcile_transactions(receipts, bank))
+    assert expected[0]
+
+    tokens = InternTable()
+    ledger = TransactionTable.from_documents('receipt', receipts, tokens)
+    statement = TransactionTable.from_documents('bank', bank, tokens)
+    result = engine.reconcile_tables(ledger, statement)
+    assert _table_outcome(result, ledger, statement) == expected
+
+
+def test_rows_round_trip_documents():
+    receipts, bank, _ = generate_ledger(50, seed=6)
+    ledger = TransactionTable.from_documents('receipt', receipts)
+    statement = TransactionTable.from_documents('bank', bank)
+    for table, documents, text_field in ((ledger, receipts, 'vendor_name'), (statement, bank, 'description')):
+        assert len(table) == len(documents)
+        for row, doc in enumerate(documents):
+            assert table.transaction_id(row) == doc['transaction_id']
+            assert table.amount_cents[row] == round(doc['amount'] * 100)
+            assert table.texts[int(table.text_ids[row])] == doc[text_field].upper()
@@ -0,0 +1,35 @@
+import pytest
+from benchmarks.synthetic_ledger import generate_ledger
+from services.reconciliation import AdvancedReconciliationEngine
+from services.vendor_registry import VendorRegistry
+
+
+def _outcome(result):
+    return (
+        [(m['receipt']['transaction_id'], m['bank_transaction']['transaction_id'], m['confidence'], m['match_type'])
+         for m in result['matches']],
+        [r['transaction_id'] for r in result['unmatched_ledger']],
+        [b['transaction_id'] for b in result['unmatched_bank']],
+    )
+
+
+def _engine(scoring, strategy='greedy', **settings):
+    return AdvancedReconciliationEngine(scoring=scoring, tiers=('exact', 'fuzzy'), strategy=strategy,
+                                        vendor_registry=VendorRegistry(), **settings)
+
+
+@pytest.mark.parametrize('strategy', AdvancedReconciliationEngine.STRATEGIES)
+@pytest.mark.parametrize('seed', [0, 1])
+def test_vectorized_reconciliation_equals_scalar(strategy, seed):
+    receipts, bank, _ = generate_ledger(300, seed=seed)
+    scalar = _outcome(_engine('scalar', strategy).reconcile_transactions(receipts, bank))
+    assert scalar[0]
+    # A block size that does not divide the ledger exercises the last, short block.
+    for block_size in (256, 7):
+        vectorized = _engine('vectorized', strategy, score_block_size=block_size)
+        assert _outcome(vectorized.reconcile_transactions(receipts, bank)) == scalar
+
+
+def test_vectorized_ranking_equals_scalar():
+    receipts, bank, _ = generate_ledger(200, seed=2)
+    assert _engine('vectorized').rank_candidates(receipts, bank) == _engine('scalar').rank_candidates(receipts, bank)
@@ -0,0 +1,108 @@
+import pickle
+import random
+from services.vendor_registry import VendorAliasAutomaton, VendorRegistry
+
+
+def _reference_find(aliases, text):
+    """Leftmost, then longest, word-bounded alias by checking every position."""
+    best = None
+    for alias, vendor_id in aliases:
+        start = text.find(alias)
+        while start != -1:
+            end = start + len(alias)
+            left_ok = start == 0 or not (text[start - 1].isalnum() and text[start].isalnum())
+            right_ok = end == len(text) or not (text[end].isalnum() and text[end - 1].isalnum())
+            if left_ok and right_ok and (best is None or (start, -len(alias)) < best[:2]):
+                best = (start, -len(alias), vendor_id)
+            start = text.find(alias, start + 1)
+    return best[2] if best else None
+
+
+def test_automaton_prefers_leftmost_then_longest():
+    automaton = VendorAliasAutomaton([("SHELL", 1), ("SHELL OIL", 2), ("OIL", 3), ("TARGET", 4)])
+    assert automaton.find("SHELL OIL 5521") == 2
+    assert automaton.find("SHELL STATION OIL") == 1
+    assert automaton.find("TARGET SHELL OIL") == 4
+    assert automaton.find("OIL CHANGE AT SHELL") == 3
+
+
+def test_automaton_only_matches_on_word_boundaries():
+    automaton = VendorAliasAutomaton([("SHELL", 1), ("AMAZON.COM", 2), ("CVS", 3)])
+    assert automaton.find("EGGSHELL BAKERY") is None
+    assert automaton.find("SHELLFISH SHACK") is None
+    assert automaton.find("POS*SHELL#22") == 1
+    assert automaton.find("AMAZON.COM*MK1") == 2
+    assert automaton.find("CVS/PHARMACY 0042") == 3
+
+
+def test_automaton_agrees_with_reference_on_random_text():
+    rng = random.Random(16)
+    for _ in range(300):
+        aliases = list({"".join(rng.choice("AB .") for _ in range(rng.randint(1, 4))).strip() or "A": i
+                        for i in range(rng.randint(1, 6))}.items())
+        automaton = VendorAliasAutomaton(aliases)
+        for _ in range(10):
+            text = "".join(rng.choice("AB .") for _ in range(rng.randint(0, 15)))
+            assert automaton.find(text) == _reference_find(aliases, text), (aliases, text)
+
+
+def test_registry_resolves_seed_and_whole_text_aliases():
+    registry = VendorRegistry()
+    assert registry.resolve("amzn mktp us*2k3") == registry.resolve("Amazon.com") == 1
+    assert registry.resolve("TAX") == 2
+    assert registry.resolve("SALES TAX 4.20") is None
+
+
+def test_learn_strips_processor_prefixes():
+    registry = VendorRegistry()
+    learned = registry.learn([
+        ("Blue Bottle Coffee", "SQ *BLUE BOTTLE COFFEE 0451 OAKLAND"),
+        ("Joe's Pizza", "POS PURCHASE JOE'S PIZZA #12"),
+        ("Tartine", "PAYPAL *TARTINE"),
+    ])
+    aliases = {record["alias"] for record in learned}
+    assert "BLUE BOTTLE COFFEE" in aliases and "JOE'S PIZZA" in aliases and "TARTINE" in aliases
+    assert not any(alias.startswith(("SQ", "POS", "PAYPAL")) for alias in aliases)
+    assert registry.resolve("SQ *BLUE BOTTLE COFFEE 9999") == registry.resolve("Blue Bottle Coffee")
+
+
+def test_learn_skips_descriptions_that_do_not_resemble_the_vendor():
+    registry = VendorRegistry()
+    learned = registry.learn([("Corner Deli", "CHECKCARD 0412 VENMO")])
+    assert [record["alias"] for record in learned] == ["CORNER DELI"]
+    assert registry.resolve("VENMO") is None
+
+
+def test_learn_uses_allocated_vendor_ids():
+    registry = VendorRegistry()
+    calls = []
+
+    def allocate(name, highest_known_id):
+        calls.append((name, highest_known_id))
+        return 100
+
+    registry.learn([("Corner Deli", "CORNER DELI NYC")], allocate_vendor=allocate)
+    assert calls == [("CORNER DELI", 6)]
+    assert registry.resolve("CORNER DELI") == 100
+
+
+def test_resolve_cache_is_bounded_and_reset_by_learning(monkeypatch):
+    import services.vendor_registry as vendor_registry
+    monkeypatch.setattr(vendor_registry, '_RESOLVE_CACHE_SIZE', 4)
+    registry = VendorRegistry()
+    for store in range(20):
+        assert registry.resolve(f"SHELL OIL {store}") == 3
+    assert registry._resolve.cache_info().currsize == 4
+
+    assert registry.resolve("corner deli 12") is None
+    registry.learn([("Corner Deli", "CORNER DELI 12")])
+    assert registry.resolve("corner deli 12") == registry.resolve("CORNER DELI")
+
+
+def test_registry_survives_pickling_for_pool_workers():
+    registry = VendorRegistry()
+    registry.learn([("Corner Deli", "CORNER DELI 12")])
+    registry.resolve("SHELL OIL 5521")
+    copy = pickle.loads(pickle.dumps(registry))
+    assert copy.resolve("CORNER DELI 99") == registry.resolve("CORNER DELI 99")
+    assert copy.resolve("SHELL OIL 5521") == 3
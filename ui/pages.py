@@ -8,9 +8,10 @@ import json
 from services.email_pipeline import EmailProcessingPipeline
 from services.email_service import EmailServiceManager
 from services.pdf_processor import ReceiptPDFProcessor
-from database.operations import add_receipt_transaction, get_all_receipt_transactions, get_all_bank_transactions, add_bank_transaction
+from database.operations import add_receipt_transaction, get_all_receipt_transactions, get_all_bank_transactions, add_bank_transactions, get_reconciliation_summary, refresh_reconciliation_summary
 from models.schema import BankTransaction
 from utils.helpers import GeneralHelpers
+from config.settings import AppSettings
 from datetime import datetime
 import plotly.express as px
 
@@ -51,35 +52,33 @@ class ReceiptReconciliationApp:
     def dashboard_page(self):
         st.title("🏠 Dashboard")
         
-        try:
-            from services.reconciliation import AdvancedReconciliationEngine
-            receipts = get_all_receipt_transactions()
-            bank_transactions = get_all_bank_transactions()
-            
-            if receipts and bank_transactions:
-                receipts_list = [json.loads(r.to_json()) for r in receipts]
-                bank_list = [json.loads(b.to_json()) for b in bank_transactions]
-                engine = AdvancedReconciliationEngine()
-                results = engine.reconcile_transactions(receipts_list, bank_list)
-                matched_count = len(results["matches"])
-            else:
-                matched_count = 0
-        except:
-            matched_count = 0
-        
-        stats = {
-            'total_receipts': len(get_all_receipt_transactions()),
-            'total_bank_transactions': len(get_all_bank_transactions()),
-            'matched_transactions': matched_count
-        }
+        summary = get_reconciliation_summary() or {}
+        receipts = summary.get('receipts', 0)
+        bank_transactions = summary.get('bank_transactions', 0)
+        matched_receipts = summary.get('matched_receipts', 0)
 
         col1, col2, col3 = st.columns(3)
         with col1:
-            UIComponents.metric_card("Total Receipts", stats['total_receipts'])
+            UIComponents.metric_card("Total Receipts", receipts)
         with col2:
-            UIComponents.metric_card("Bank Transactions", stats['total_bank_transactions'])
+            UIComponents.metric_card("Bank Transactions", bank_transactions)
         with col3:
-            UIComponents.metric_card("Matched Transactions", stats['matched_transactions'])
+            UIComponents.metric_card("Matched Transactions", matched_receipts)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            UIComponents.metric_card("Unmatched Receipts", receipts - matched_receipts)
+        with col2:
+            UIComponents.metric_card("Unmatched Bank Transactions", bank_transactions - summary.get('matched_bank_transactions', 0))
+        with col3:
+            UIComponents.metric_card("Receipt Spending", f"${summary.get('receipt_amount', 0):,.2f}",
+                                     help_text=f"${summary.get('matched_receipt_amount', 0):,.2f} matched")
+
+        last_run_at = summary.get('last_run_at')
+        if last_run_at:
+            st.caption(f"Last reconciliation run {last_run_at:%Y-%m-%d %H:%M} UTC, {summary.get('last_run_matches', 0)} matches")
+        else:
+            st.caption("No reconciliation run yet.")
 
     def email_processing_page(self):
         st.title("📧 Email Processing")
@@ -207,9 +206,10 @@ class ReceiptReconciliationApp:
                     net_amount = df[amount_col].sum()
                     date_range = f"{pd.to_datetime(df[date_col]).min().date()} to {pd.to_datetime(df[date_col]).max().date()}"
 
+                    bank_records = []
                     for index, row in df.iterrows():
                         transaction_id = GeneralHelpers.generate_unique_id("bank")
-                        bank_data = {
+                        bank_records.append({
                             "transaction_id": transaction_id,
                             "transaction_date": pd.to_datetime(row[date_col]),
                             "description": row[desc_col],
@@ -217,8 +217,8 @@ class ReceiptReconciliationApp:
                             "transaction_type": row[type_col].lower(),
                             "account_number": "N/A",
                             "upload_batch_id": uploaded_file.name
-                        }
-                        add_bank_transaction(bank_data)
+                        })
+                    add_bank_transactions(bank_records)
                     
                     st.success("Bank statement processed successfully!")
                     
@@ -237,28 +237,86 @@ class ReceiptReconciliationApp:
     def reconciliation_page(self):
         st.title("🔄 Reconciliation")
 
+        mode = st.radio(
+            "Reconciliation Mode",
+            ["Full", "Streaming (date window)"],
+            horizontal=True,
+            help="Streaming reads the open transactions of both collections sorted by date and only keeps the date-tolerance window in memory."
+        )
+
+        full_rescan = st.checkbox(
+            "Ignore last run watermark",
+            help="Re-score every open transaction instead of only those added since the last run."
+        )
+
         if st.button("Run Reconciliation"):
             with st.spinner("Reconciling transactions..."):
                 from services.reconciliation import AdvancedReconciliationEngine
-                receipts = get_all_receipt_transactions()
-                bank_transactions = get_all_bank_transactions()
-                receipts_list = [json.loads(r.to_json()) for r in receipts]
-                bank_list = [json.loads(b.to_json()) for b in bank_transactions]
                 engine = AdvancedReconciliationEngine()
-                results = engine.reconcile_transactions(receipts_list, bank_list)
+                if mode == "Full":
+                    from services.incremental_reconciliation import IncrementalReconciliationService
+                    if AppSettings.RECONCILIATION_WORKERS > 1:
+                        from services.parallel_reconciliation import ParallelReconciliationEngine
+                        engine = ParallelReconciliationEngine(max_workers=AppSettings.RECONCILIATION_WORKERS)
+                    results = IncrementalReconciliationService(engine).run(full=full_rescan)
+                else:
+                    from services.incremental_reconciliation import IncrementalReconciliationService
+                    results = IncrementalReconciliationService(engine).run_stream()
                 self.display_reconciliation_results(results)
 
+        self.display_suggestions()
+
+    def display_suggestions(self):
+        from services.suggestions import SuggestionService
+        service = SuggestionService()
+
+        st.subheader("💡 Suggested Matches")
+        target = st.radio("Suggestions for", ["Receipts", "Bank Transactions"], horizontal=True)
+        direction = "receipt" if target == "Receipts" else "bank"
+
+        if st.button("Refresh Suggestions"):
+            with st.spinner("Scoring candidates..."):
+                stored = service.generate()
+            st.info(f"Stored {stored['receipt']} receipt and {stored['bank']} bank transaction suggestions")
+
+        total = service.count(direction)
+        if not total:
+            st.caption("No pending suggestions.")
+            return
+
+        page_size = 20
+        page_count = (total + page_size - 1) // page_size
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+        rows = service.page(direction, page=int(page) - 1, page_size=page_size)
+        suggestions_df = pd.DataFrame([
+            {
+                "Receipt": f"{(row['receipt'] or {}).get('vendor_name', 'Unknown')} ${(row['receipt'] or {}).get('amount', 0):.2f}",
+                "Bank Transaction": f"{(row['bank_transaction'] or {}).get('description', 'Unknown')} ${(row['bank_transaction'] or {}).get('amount', 0):.2f}",
+                "Rank": row['rank'],
+                "Confidence": f"{row['confidence']:.1%}",
+                "Vendor": f"{row['breakdown'].get('vendor_score', 0):.2f}",
+                "Amount": f"{row['breakdown'].get('amount_score', 0):.2f}",
+                "Days Apart": row['breakdown'].get('days_apart')
+            }
+            for row in rows
+        ])
+        st.dataframe(suggestions_df, use_container_width=True)
+        st.caption(f"Page {int(page)} of {page_count} ({total} suggestions)")
+
     def display_reconciliation_results(self, results):
         st.success("Reconciliation complete!")
         
-        # Summary metrics
+        # Summary metrics; streamed results only carry a sample of each list next to the full counts
+        counts = results.get("counts") or {key: len(results[key]) for key in ("matches", "unmatched_ledger", "unmatched_bank")}
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("🔗 Matches Found", len(results["matches"]))
+            st.metric("🔗 Matches Found", counts["matches"])
         with col2:
-            st.metric("📄 Unmatched Receipts", len(results["unmatched_ledger"]))
+            st.metric("📄 Unmatched Receipts", counts["unmatched_ledger"])
         with col3:
-            st.metric("🏦 Unmatched Bank Transactions", len(results["unmatched_bank"]))
+            st.metric("🏦 Unmatched Bank Transactions", counts["unmatched_bank"])
+        if any(counts[key] > len(results[key]) for key in ("matches", "unmatched_ledger", "unmatched_bank")):
+            st.caption(f"Showing the first {max(len(results[key]) for key in ('matches', 'unmatched_ledger', 'unmatched_bank'))} rows of each list.")
         
         # Enhanced matches display
         if results["matches"]:
@@ -292,6 +350,18 @@ class ReceiptReconciliationApp:
                     else:
                         st.error(f"❌ Poor Match ({confidence:.1%})")
         
+        if results.get("split_matches"):
+            st.subheader("🧾 Split Payments")
+            split_df = pd.DataFrame([
+                {
+                    "Receipts": ", ".join(f"{r.get('vendor_name', 'Unknown')} ${r.get('amount', 0):.2f}" for r in group["receipts"]),
+                    "Bank Transactions": ", ".join(f"{b['description']} ${b['amount']:.2f}" for b in group["bank_transactions"]),
+                    "Type": "Combined charge" if group["direction"] == "many_to_one" else "Instalments"
+                }
+                for group in results["split_matches"]
+            ])
+            st.dataframe(split_df, use_container_width=True)
+        
         # Show unmatched transactions in organized tables
         if results["unmatched_ledger"]:
             st.subheader("📄 Unmatched Receipts")
@@ -533,6 +603,7 @@ class ReceiptReconciliationApp:
         
         if duplicates:
             BankTransaction.objects(id__in=duplicates).delete()
+            refresh_reconciliation_summary()
             st.success(f"Cleaned {len(duplicates)} duplicate transactions")
         else:
             st.info("No duplicates found - database is clean!")
\ No newline at end of file
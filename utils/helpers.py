@@ -1,7 +1,7 @@
 import uuid
 import hashlib
-from datetime import datetime
-from typing import Any, Dict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
 
 class GeneralHelpers:    
     @staticmethod
@@ -20,6 +20,35 @@ class GeneralHelpers:
         except Exception:
             return ""
     
+    @staticmethod
+    def parse_amount(value: Any) -> Optional[float]:
+        if isinstance(value, dict) and '$numberDecimal' in value:
+            value = value['$numberDecimal']
+        elif hasattr(value, 'to_decimal'):  # bson Decimal128
+            value = value.to_decimal()
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def parse_date(value: Any) -> Optional[datetime]:
+        """A naive UTC datetime, as MongoDB returns them, from a datetime, ISO string or Extended JSON ``$date``."""
+        try:
+            if isinstance(value, dict) and '$date' in value:
+                value = value['$date']
+                if isinstance(value, dict) and '$numberLong' in value:  # canonical mode
+                    value = int(value['$numberLong'])
+                if isinstance(value, (int, float)):
+                    return datetime(1970, 1, 1) + timedelta(milliseconds=value)
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value if isinstance(value, datetime) else None
+    
     @staticmethod
     def safe_filename(filename: str) -> str:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")